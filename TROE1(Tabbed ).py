@@ -1,10 +1,13 @@
 import tkinter as tk  
-from tkinter import ttk, messagebox, simpledialog  
+from tkinter import ttk, messagebox, simpledialog
 from tkcalendar import DateEntry  
 import sqlite3  
-import os
 from datetime import datetime
-import hashlib
+from troe import db, desk, dialogs, schema
+from troe.binding import TableBinding
+from troe.paging import PagedTreeview
+from troe.repository import BookingRepository, RoomRepository
+from troe.backup import BackupManager
 
 class HotelManagementApp:  
     def __init__(self, root):  
@@ -36,6 +39,18 @@ class HotelManagementApp:
         self.db_file = "hotel_management.db"
         self.initialize_database()
 
+        # Background worker for the database work, or the booking server's
+        # requests when TROE_SERVER is set (troe.desk)
+        self.db_worker = desk.worker(self.db_file, self.root, on_busy=self.show_busy)
+        self.db_worker.start()
+
+        # Refresh open views when bookings or rooms change, from any connection
+        self.changes = desk.change_tracker(self.db_file, self.root)
+        self.changes.start()
+
+        # Bookings made or cancelled anywhere else reload the availability engine
+        self.changes.subscribe(('bookings',), self.availability.invalidate)
+
         # Configure styles
         self.setup_styles()
 
@@ -56,6 +71,15 @@ class HotelManagementApp:
         self.create_view_bookings_frame()
         self.create_customer_info_frame()
 
+        # Booking lists follow the database without a manual refresh
+        self.changes.subscribe(('bookings', 'rooms'), self.booking_pager.refresh)
+        self.changes.subscribe(('bookings', 'rooms'), self.refresh_customer_info)
+
+        # Load active bookings for fast availability searches
+        self.db_worker.submit(
+            self.availability.load,
+            errback=lambda e: print(f"Availability engine not loaded: {str(e)}"))
+
     def initialize_variables(self):
         """Initialize all variables needed for the application."""
         # Add Room variables
@@ -83,11 +107,25 @@ class HotelManagementApp:
 
         # Add current date
         date = datetime.now().strftime("%B %d, %Y")
-        date_label = ttk.Label(header, 
+        date_label = ttk.Label(header,
                              text=date,
                              style='HeaderDate.TLabel')
         date_label.pack(side='right')
 
+        # Busy indicator, shown while the database worker is running a query
+        self.busy_bar = ttk.Progressbar(header, mode='indeterminate', length=120)
+
+    def show_busy(self, busy):
+        """Show or hide the busy indicator."""
+        if busy:
+            self.busy_bar.pack(side='right', padx=20)
+            self.busy_bar.start(10)
+            self.root.configure(cursor='watch')
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.root.configure(cursor='')
+
     def setup_styles(self):
         """Configure ttk styles for the application"""
         self.style = ttk.Style()
@@ -186,25 +224,26 @@ class HotelManagementApp:
     def initialize_database(self):
         """Initialize database connection and create backup"""
         try:
-            # Create backup of existing database if it exists
-            if os.path.exists(self.db_file):
-                backup_time = datetime.now().strftime('%Y%m%d_%H%M%S')
-                backup_file = f"backup_{backup_time}.db"
-                try:
-                    with open(self.db_file, 'rb') as src, open(backup_file, 'wb') as dst:
-                        dst.write(src.read())
-                except IOError as e:
-                    print(f"Warning: Could not create backup: {str(e)}")
-
-            # Create or connect to database
-            self.conn = sqlite3.connect(self.db_file)
-            
-            # Enable foreign key support
-            self.conn.execute("PRAGMA foreign_keys = ON")
-            
-            # Create tables
-            self.create_tables()
-            
+            # With TROE_SERVER set the booking server (troe.server) owns the
+            # database and backs it up; this desk does not open the file
+            self.conn = None
+            server_url = desk.server_url()
+            if server_url:
+                print(f"Using the booking server at {server_url}")
+            else:
+                # Back up the existing database in the background
+                self.backup = BackupManager(self.db_file, backup_dir="backups", keep=10)
+                self.backup.start()
+
+                # Create or connect to database (WAL, foreign keys on)
+                self.conn = db.connect(self.db_file)
+
+                # Create tables
+                self.create_tables()
+
+            # Searches, bookings and cancellations use it on the worker thread
+            self.availability = desk.availability_engine(self.db_file)
+
             print("Database initialized successfully")
             
         except sqlite3.Error as e:
@@ -213,40 +252,10 @@ class HotelManagementApp:
             raise Exception("Database initialization failed")
 
     def create_tables(self):
-        """Create the SQLite tables with enhanced structure."""
+        """Create the shared tables, indexes and change triggers."""
         try:
-            cursor = self.conn.cursor()
-            
-            # Room table with capacity
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rooms (
-                room_number INTEGER PRIMARY KEY,
-                room_type TEXT NOT NULL,
-                ac_type TEXT NOT NULL,
-                price REAL NOT NULL CHECK (price > 0),
-                capacity INTEGER NOT NULL CHECK (capacity > 0 AND capacity <= 4),
-                wifi INTEGER NOT NULL,
-                status TEXT DEFAULT 'available' CHECK (status IN ('available', 'booked', 'maintenance'))
-            )
-            """)
-
-            # Booking table
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                person_name TEXT NOT NULL,
-                room_number INTEGER NOT NULL,
-                check_in_date DATE NOT NULL,
-                check_out_date DATE NOT NULL,
-                num_persons INTEGER NOT NULL,
-                children TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (room_number) REFERENCES rooms(room_number)
-            )
-            """)
-            
-            self.conn.commit()
+            # An upgrade waits for the startup backup to finish first
+            schema.create_tables(self.conn, self.backup)
             print("Tables created successfully")
             
         except sqlite3.Error as e:
@@ -346,7 +355,7 @@ class HotelManagementApp:
         button_frame.pack(fill='x', pady=20)
 
         # Configure button frame columns
-        button_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        button_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
 
         # Add Room Button
         ttk.Button(button_frame, text="Add Room",
@@ -363,6 +372,11 @@ class HotelManagementApp:
                   command=self.view_rooms,
                   style='Secondary.TButton', width=20).grid(row=0, column=2, padx=5)
 
+        # Import Rooms Button
+        ttk.Button(button_frame, text="Import Rooms",
+                  command=self.import_rooms,
+                  style='Secondary.TButton', width=20).grid(row=0, column=3, padx=5)
+
     def create_book_room_frame(self):
         """Create the frame for booking rooms with improved layout."""
         self.frame_book_room = ttk.Frame(self.notebook, style='Content.TFrame')
@@ -482,7 +496,7 @@ class HotelManagementApp:
         button_frame.pack(fill='x', pady=(0, 20))
         
         # Configure button frame columns
-        button_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        button_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
 
         # Buttons
         ttk.Button(button_frame, text="View All Bookings",
@@ -494,6 +508,12 @@ class HotelManagementApp:
         ttk.Button(button_frame, text="Cancel Booking",
                   command=self.cancel_booking,
                   style='Secondary.TButton', width=20).grid(row=0, column=2, padx=5)
+        ttk.Button(button_frame, text="Night Audit",
+                  command=self.run_night_audit,
+                  style='Secondary.TButton', width=20).grid(row=0, column=3, padx=5)
+        ttk.Button(button_frame, text="Booking History",
+                  command=self.view_booking_history,
+                  style='Secondary.TButton', width=20).grid(row=0, column=4, padx=5)
 
         # Create Treeview with scrollbar
         tree_frame = ttk.Frame(main_container, style='Content.TFrame')
@@ -521,13 +541,20 @@ class HotelManagementApp:
                                    command=self.booking_tree.yview)
         x_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, 
                                    command=self.booking_tree.xview)
-        self.booking_tree.configure(yscroll=y_scrollbar.set, xscroll=x_scrollbar.set)
+        self.booking_tree.configure(xscroll=x_scrollbar.set)
 
         # Pack elements
         self.booking_tree.pack(side='left', fill='both', expand=True)
         y_scrollbar.pack(side='right', fill='y')
         x_scrollbar.pack(side='bottom', fill='x')
 
+        # Load the booking history a page at a time as the list is scrolled
+        self.booking_pager = PagedTreeview(
+            self.booking_tree, self.db_worker,
+            BookingRepository.PAGE_SELECT, BookingRepository.PAGE_KEYS,
+            scrollbar=y_scrollbar,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to retrieve bookings: {str(e)}"))
+
     def create_customer_info_frame(self):
         """Create the frame for customer information with improved layout."""
         self.frame_customer_info = ttk.Frame(self.notebook, style='Content.TFrame')
@@ -591,6 +618,10 @@ class HotelManagementApp:
         y_scrollbar.pack(side='right', fill='y')
         x_scrollbar.pack(side='bottom', fill='x')
 
+        # Rows keyed by booking ID so a refresh only touches what changed
+        self.customer_binding = TableBinding(
+            self.customer_tree, format_row=lambda row: (row[1:], ()))
+
     def add_room(self):
         """Add a room with validation and error handling."""
         try:
@@ -617,25 +648,31 @@ class HotelManagementApp:
             except ValueError:
                 raise ValueError("Price must be a valid number")
 
-            def insert_room(cursor):
-                # Check if room number already exists
-                cursor.execute("SELECT room_number FROM rooms WHERE room_number = ?", 
-                             (room_number,))
-                if cursor.fetchone():
-                    raise ValueError("Room number already exists")
-
-                cursor.execute("""
-                    INSERT INTO rooms (room_number, room_type, ac_type, price, 
-                                     capacity, wifi, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (room_number, room_type, ac_type, price, capacity, wifi, status))
-
-            if self.execute_db_operation(insert_room):
+            def added(_):
                 messagebox.showinfo("Success", "Room added successfully!")
                 self.clear_room_fields()
+
+            self.db_worker.submit(
+                lambda conn: desk.rooms(conn).add(room_number, room_type, ac_type, price,
+                                                  capacity, wifi, status),
+                added, dialogs.errback("Input Error", "Database Error", "Operation failed"))
             
         except ValueError as e:
             messagebox.showerror("Input Error", str(e))
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Operation failed: {str(e)}")
+
+    def import_rooms(self):
+        """Add rooms in bulk from a CSV or JSON Lines file."""
+        dialogs.import_rooms(self.db_worker)
+
+    def run_night_audit(self):
+        """Complete checked-out stays and record today's figures."""
+        dialogs.run_night_audit(self.db_worker)
+
+    def view_booking_history(self):
+        """Search all bookings, including the ones moved to the archive file."""
+        dialogs.view_booking_history(self.root, self.db_worker, self.db_file)
 
     def check_availability(self):
         """Check room availability with improved error handling."""
@@ -652,41 +689,40 @@ class HotelManagementApp:
             if check_in >= check_out:
                 raise ValueError("Check-in date must be before check-out date")
 
-            def find_available_rooms(cursor):
-                cursor.execute(""" 
-                    SELECT r.room_number, r.room_type, r.ac_type, r.price,
-                           CASE WHEN r.wifi = 1 THEN 'Yes' ELSE 'No' END as wifi,
-                           (SELECT COUNT(*) FROM bookings b WHERE b.room_number = r.room_number AND b.status = 'active') as booked
-                    FROM rooms r
-                    WHERE r.room_type = ?
-                    AND r.status = 'available'
-                    AND r.room_number NOT IN (
-                        SELECT room_number
-                        FROM bookings
-                        WHERE status = 'active'
-                        AND (
-                            (check_in_date < ? AND check_out_date > ?)
-                        )
-                    )
-                """, (room_type, check_out.strftime('%Y-%m-%d'), 
-                     check_in.strftime('%Y-%m-%d')))
-                return cursor.fetchall()
-
-            available_rooms = self.execute_db_operation(find_available_rooms)
-
-            if not available_rooms:
-                messagebox.showinfo("No Rooms", 
-                                  "No rooms available for the selected dates.")
-                return
+            # Read the form now; the search finishes on the worker thread
+            check_in_date = check_in.strftime('%Y-%m-%d')
+            check_out_date = check_out.strftime('%Y-%m-%d')
+            person_name = self.person_name_entry.get()
+            num_persons = self.num_persons_var.get()
+            children = self.children_var.get()
+
+            def show_results(free_rooms):
+                available_rooms = [
+                    (number, rtype, ac, price, 'Yes' if wifi else 'No', booked)
+                    for number, rtype, ac, price, _, wifi, booked in free_rooms]
+
+                if not available_rooms:
+                    messagebox.showinfo("No Rooms",
+                                      "No rooms available for the selected dates.")
+                    return
+
+                self.show_available_rooms(
+                    available_rooms,
+                    person_name,
+                    check_in_date,
+                    check_out_date,
+                    num_persons,
+                    children
+                )
 
-            self.show_available_rooms(
-                available_rooms,
-                self.person_name_entry.get(),
-                check_in.strftime('%Y-%m-%d'),
-                check_out.strftime('%Y-%m-%d'),
-                self.num_persons_var.get(),
-                self.children_var.get()
-            )
+            # Date overlap is answered by the in-memory availability engine
+            self.db_worker.submit(
+                lambda conn: self.availability.filter_free(
+                    RoomRepository(conn).available_by_type(room_type),
+                    check_in_date, check_out_date),
+                show_results,
+                lambda e: messagebox.showerror("Database Error",
+                                               f"Database operation failed: {str(e)}"))
 
         except ValueError as e:
             messagebox.showerror("Input Error", str(e))
@@ -795,51 +831,12 @@ class HotelManagementApp:
                   command=confirm_window.destroy).pack(pady=20)
 
     def view_bookings(self):
-        """View all current bookings."""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT b.booking_id, b.person_name, b.room_number, 
-                       b.check_in_date, b.check_out_date, b.status
-                FROM bookings b
-                ORDER BY b.check_in_date
-            """)
-            bookings = cursor.fetchall()
-
-            # Clear existing items
-            for item in self.booking_tree.get_children():
-                self.booking_tree.delete(item)
-
-            # Insert new bookings with alternating colors
-            for i, booking in enumerate(bookings):
-                self.booking_tree.insert("", "end", values=booking,
-                                       tags=('evenrow' if i % 2 == 0 else 'oddrow'))
-
-            self.booking_tree.tag_configure('evenrow', background=self.COLORS['white'])
-            self.booking_tree.tag_configure('oddrow', background=self.COLORS['white'])
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to retrieve bookings: {str(e)}")
+        """View all current bookings, newest check-in first."""
+        self.booking_pager.reload()
 
     def view_rooms(self):
         """View all rooms in a new window with fixed column widths."""
         try:
-            def fetch_rooms(cursor):
-                cursor.execute("""
-                    SELECT room_number, room_type, ac_type, price, capacity,
-                           CASE WHEN wifi = 1 THEN 'Yes' ELSE 'No' END as wifi,
-                           status
-                    FROM rooms
-                    ORDER BY room_number
-                """)
-                return cursor.fetchall()
-
-            rooms = self.execute_db_operation(fetch_rooms)
-
-            if not rooms:
-                messagebox.showinfo("No Rooms", "No rooms are currently registered.")
-                return
-
             # Create a new window with fixed size
             room_window = tk.Toplevel(self.root)
             room_window.title("Room Details")
@@ -880,21 +877,25 @@ class HotelManagementApp:
                                       command=room_tree.yview)
             x_scrollbar = ttk.Scrollbar(main_container, orient=tk.HORIZONTAL, 
                                       command=room_tree.xview)
-            room_tree.configure(yscroll=y_scrollbar.set, xscroll=x_scrollbar.set)
+            room_tree.configure(xscroll=x_scrollbar.set)
             
             # Pack elements
             room_tree.pack(side='left', fill='both', expand=True)
             y_scrollbar.pack(side='right', fill='y')
             x_scrollbar.pack(side='bottom', fill='x')
 
-            # Insert room data with alternating colors
-            for i, room in enumerate(rooms):
-                room_tree.insert("", "end", values=room,
-                               tags=('evenrow' if i % 2 == 0 else 'oddrow'))
+            def no_rooms():
+                room_window.destroy()
+                messagebox.showinfo("No Rooms", "No rooms are currently registered.")
 
-            # Configure row colors
-            room_tree.tag_configure('evenrow', background=self.COLORS['white'])
-            room_tree.tag_configure('oddrow', background=self.COLORS['white'])
+            # Rooms are paged by room number like the booking list
+            room_window.pager = PagedTreeview(
+                room_tree, self.db_worker,
+                RoomRepository.PAGE_SELECT, RoomRepository.PAGE_KEYS,
+                scrollbar=y_scrollbar, descending=False,
+                on_empty=no_rooms,
+                on_error=lambda e: messagebox.showerror("Error", f"Failed to view rooms: {str(e)}"))
+            room_window.pager.reload()
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to view rooms: {str(e)}")
@@ -910,64 +911,32 @@ class HotelManagementApp:
 
             booking_data = self.booking_tree.item(selected_item[0])['values']
             booking_id = booking_data[0]
-            room_number = booking_data[2]
 
             confirm = messagebox.askyesno("Confirm Cancellation", 
                 f"Are you sure you want to cancel booking ID {booking_id}?")
             
             if confirm:
-                cursor = self.conn.cursor()
-                # Update booking status
-                cursor.execute("""
-                    UPDATE bookings 
-                    SET status = 'cancelled' 
-                    WHERE booking_id = ?
-                """, (booking_id,))
-
-                # Update room status
-                cursor.execute("""
-                    UPDATE rooms 
-                    SET status = 'available' 
-                    WHERE room_number = ?
-                """, (room_number,))
-
-                self.conn.commit()
-                messagebox.showinfo("Success", "Booking cancelled successfully!")
-                self.view_bookings()
-                self.refresh_customer_info()
+                def cancelled(was_active):
+                    if not was_active:
+                        messagebox.showinfo("Info", "This booking is not active.")
+                        return
+                    messagebox.showinfo("Success", "Booking cancelled successfully!")
+                    self.changes.poll()  # Refresh the booking views now
+
+                self.db_worker.submit(
+                    lambda conn: desk.bookings(conn, self.availability).cancel(booking_id),
+                    cancelled,
+                    lambda e: messagebox.showerror("Error", f"Failed to cancel booking: {str(e)}"))
 
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Failed to cancel booking: {str(e)}")
-            self.conn.rollback()
 
     def refresh_customer_info(self):
         """Refresh the customer information display."""
-        try:
-            # Clear existing items
-            for item in self.customer_tree.get_children():
-                self.customer_tree.delete(item)
-
-            # Fetch current bookings
-            cursor = self.conn.cursor()
-            cursor.execute(""" 
-                SELECT b.person_name, b.room_number, r.price, 
-                       b.check_in_date, b.check_out_date, b.status
-                FROM bookings b
-                JOIN rooms r ON b.room_number = r.room_number
-                WHERE b.status = 'active'
-                ORDER BY b.check_in_date
-            """)
-            
-            # Insert into treeview with alternating colors
-            for i, booking in enumerate(cursor.fetchall()):
-                self.customer_tree.insert("", "end", values=booking,
-                                        tags=('evenrow' if i % 2 == 0 else 'oddrow'))
-
-            self.customer_tree.tag_configure('evenrow', background=self.COLORS['white'])
-            self.customer_tree.tag_configure('oddrow', background=self.COLORS['white'])
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to refresh customer info: {str(e)}")
+        self.db_worker.submit(
+            lambda conn: BookingRepository(conn).active_customers(),
+            self.customer_binding.update,
+            lambda e: messagebox.showerror("Error", f"Failed to refresh customer info: {str(e)}"))
 
     def clear_room_fields(self):
         """Clear all room input fields."""
@@ -991,6 +960,12 @@ class HotelManagementApp:
     def cleanup(self):
         """Clean up resources before closing."""
         try:
+            if hasattr(self, 'changes'):
+                self.changes.stop()
+            if hasattr(self, 'db_worker'):
+                # The occupancy snapshot is saved on the worker's connection
+                self.db_worker.submit(lambda conn: self.availability.save())
+                self.db_worker.stop()
             if hasattr(self, 'conn') and self.conn:
                 self.conn.commit()
                 self.conn.close()
@@ -1008,83 +983,6 @@ class HotelManagementApp:
             messagebox.showerror("Error", f"Error while closing: {str(e)}")
             self.root.destroy()
 
-    def execute_db_operation(self, operation_func):
-        """Safely execute a database operation with error handling."""
-        if not hasattr(self, 'conn') or self.conn is None:
-            self.initialize_database()
-            
-        cursor = self.conn.cursor()
-        try:
-            result = operation_func(cursor)
-            self.conn.commit()
-            return result
-        except sqlite3.Error as e:
-            self.conn.rollback()
-            print(f"Database operation error: {str(e)}")
-            messagebox.showerror("Database Error", f"Operation failed: {str(e)}")
-            return None
-
-    def verify_database_structure(self):
-        """Verify that all required tables and columns exist."""
-        try:
-            cursor = self.conn.cursor()
-            
-            # Check rooms table structure
-            cursor.execute("PRAGMA table_info(rooms)")
-            rooms_columns = {row[1] for row in cursor.fetchall()}
-            required_rooms_columns = {
-                'room_number', 'room_type', 'ac_type', 
-                'price', 'wifi', 'status'
-            }
-            
-            # Check bookings table structure
-            cursor.execute("PRAGMA table_info(bookings)")
-            bookings_columns = {row[1] for row in cursor.fetchall()}
-            required_bookings_columns = {
-                'booking_id', 'person_name', 'room_number',
-                'check_in_date', 'check_out_date', 'num_persons',
-                'children', 'status', 'booking_date'
-            }
-            
-            # If any required columns are missing, recreate the tables
-            if not (required_rooms_columns.issubset(rooms_columns) and 
-                    required_bookings_columns.issubset(bookings_columns)):
-                print("Database structure mismatch, recreating tables...")
-                
-                # Drop existing tables
-                cursor.execute("DROP TABLE IF EXISTS bookings")
-                cursor.execute("DROP TABLE IF EXISTS rooms")
-                
-                # Recreate tables
-                self.create_tables()
-                
-            self.conn.commit()
-            return True
-            
-        except sqlite3.Error as e:
-            print(f"Error verifying database structure: {str(e)}")
-            return False
-
-    def debug_database(self):
-        """Print current database structure for debugging."""
-        try:
-            cursor = self.conn.cursor()
-            
-            # Print rooms table structure
-            print("\nRooms table structure:")
-            cursor.execute("PRAGMA table_info(rooms)")
-            for row in cursor.fetchall():
-                print(row)
-            
-            # Print bookings table structure
-            print("\nBookings table structure:")
-            cursor.execute("PRAGMA table_info(bookings)")
-            for row in cursor.fetchall():
-                print(row)
-            
-        except sqlite3.Error as e:
-            print(f"Error debugging database: {str(e)}")
-
     def book_selected_room(self, room_tree, room_select_window, person_name,
                            check_in_date, check_out_date, num_persons, children):
         """Book the selected room."""
@@ -1096,20 +994,15 @@ class HotelManagementApp:
         room_data = room_tree.item(selected_item[0])['values']
         room_number = room_data[0]  # Assuming the first column is Room Number
 
-        try:
-            def insert_booking(cursor):
-                cursor.execute(""" 
-                    INSERT INTO bookings (person_name, room_number, check_in_date, 
-                                          check_out_date, num_persons, children)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (person_name, room_number, check_in_date, check_out_date, 
-                      num_persons, children))
-
-            self.execute_db_operation(insert_booking)
+        def booked(_):
             messagebox.showinfo("Success", f"Room {room_number} booked successfully!")
             room_select_window.destroy()
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to book room: {str(e)}")
+
+        # Re-checks capacity and overlap in case the room went in the meantime
+        self.db_worker.submit(
+            lambda conn: desk.bookings(conn, self.availability).book(
+                person_name, room_number, check_in_date, check_out_date, num_persons, children),
+            booked, dialogs.errback("Booking Error", "Database Error", "Failed to book room"))
 
 class LoginWindow:
     def __init__(self, root):
@@ -1124,28 +1017,23 @@ class LoginWindow:
         # Create login form
         self.create_login_form()
 
-        # Database connection
+        # Logins are checked on a worker thread, by the booking server if
+        # TROE_SERVER is set
         self.db_file = "hotel_management.db"
-        self.conn = sqlite3.connect(self.db_file)
-        self.conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key support
+        self.db_worker = desk.worker(self.db_file, self.root)
+        self.db_worker.start()
 
         # Ensure emp table exists
         self.create_emp_table()
 
     def create_emp_table(self):
         """Create the emp table if it doesn't exist."""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS emp (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL UNIQUE,
-                    password TEXT NOT NULL
-                )
-            """)
-            self.conn.commit()
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Error creating emp table: {str(e)}")
+        if desk.server_url():
+            return  # The booking server keeps the schema up to date
+        self.db_worker.submit(
+            lambda conn: conn.execute(schema.TABLES['emp']),
+            errback=lambda e: messagebox.showerror("Database Error",
+                                                   f"Error creating emp table: {str(e)}"))
 
     def create_login_form(self):
         """Create the login form"""
@@ -1185,23 +1073,19 @@ class LoginWindow:
             messagebox.showerror("Error", "Please enter both username and password")
             return
 
-        # Hash the password for comparison
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-
-        # Check the username and password against the database
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM emp WHERE username = ? AND password = ?", (username, hashed_password))
-            user = cursor.fetchone()
-
-            if user:
+        def checked(valid):
+            if valid:
                 messagebox.showinfo("Success", "Login successful!")
+                self.cleanup()
                 self.root.destroy()  # Close the login window
                 self.open_main_app()  # Open the main application
             else:
                 messagebox.showerror("Error", "Invalid username or password")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Error during login: {str(e)}")
+
+        # Check the username and password against the database
+        self.db_worker.submit(
+            lambda conn: desk.employees(conn).verify(username, password), checked,
+            lambda e: messagebox.showerror("Database Error", f"Error during login: {str(e)}"))
 
     def open_main_app(self):
         """Open the main application window"""
@@ -1236,23 +1120,21 @@ class LoginWindow:
             messagebox.showerror("Error", "Please enter both username and password")
             return
 
-        # Hash the password
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "Username already exists. Please choose a different username.")
+            else:
+                messagebox.showerror("Database Error", f"Error during registration: {str(e)}")
 
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO emp (username, password) VALUES (?, ?)", (username, hashed_password))
-            self.conn.commit()
-            messagebox.showinfo("Success", "Registration successful! You can now log in.")
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Username already exists. Please choose a different username.")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Error during registration: {str(e)}")
+        self.db_worker.submit(
+            lambda conn: desk.employees(conn).create(username, password),
+            lambda _: messagebox.showinfo("Success", "Registration successful! You can now log in."),
+            failed)
 
     def cleanup(self):
         """Clean up resources before closing."""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        if hasattr(self, 'db_worker'):
+            self.db_worker.stop()
 
     def on_closing(self):
         """Handle application closing."""
@@ -1,9 +1,13 @@
 import tkinter as tk  
-from tkinter import ttk, messagebox, simpledialog  
+from tkinter import ttk, messagebox, simpledialog
 from tkcalendar import DateEntry  
 import sqlite3  
 import os
 from datetime import datetime
+from troe import db, desk, dialogs, schema
+from troe.binding import TableBinding
+from troe.paging import PagedTreeview
+from troe.repository import BookingRepository, RoomRepository
 
 class DashboardButton(tk.Frame):
     """Custom button widget for dashboard"""
@@ -211,20 +215,25 @@ class LoginWindow(tk.Frame):
                 messagebox.showerror("Error", "Please enter both username and password")
                 return
             
-            cursor = self.parent.conn.cursor()
-            cursor.execute("SELECT * FROM emp WHERE username = ? AND password = ?", 
-                         (username, password))
-            user = cursor.fetchone()
-            
-            if user:
-                messagebox.showinfo("Success", "Login successful!")
-                self.destroy()  # Remove login frame
-                self.parent.setup_main_window()  # Show main window
-            else:
-                messagebox.showerror("Error", "Invalid username or password")
-                self.username_entry.delete(0, tk.END)
-                self.password_entry.delete(0, tk.END)
-                self.username_entry.focus()
+            def checked(valid):
+                if valid:
+                    messagebox.showinfo("Success", "Login successful!")
+                    self.destroy()  # Remove login frame
+                    self.parent.setup_main_window()  # Show main window
+                else:
+                    messagebox.showerror("Error", "Invalid username or password")
+                    self.username_entry.delete(0, tk.END)
+                    self.password_entry.delete(0, tk.END)
+                    self.username_entry.focus()
+
+            def failed(e):
+                if isinstance(e, sqlite3.Error):
+                    messagebox.showerror("Database Error", f"Failed to login: {str(e)}")
+                else:
+                    messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
+
+            self.parent.db_worker.submit(
+                lambda conn: desk.employees(conn).verify(username, password), checked, failed)
                 
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to login: {str(e)}")
@@ -246,22 +255,25 @@ class LoginWindow(tk.Frame):
                         messagebox.showerror("Error", "Password must be at least 4 characters long")
                         return
                         
-                    try:
-                        cursor = self.parent.conn.cursor()
-                        cursor.execute("INSERT INTO emp (username, password) VALUES (?, ?)",
-                                     (username, password))
-                        self.parent.conn.commit()
-                        messagebox.showinfo("Success", "Registration successful! You can now login.")
-                    except sqlite3.IntegrityError:
-                        messagebox.showerror("Error", "Username already exists")
-                    except sqlite3.Error as e:
-                        messagebox.showerror("Error", f"Failed to register: {str(e)}")
-                        self.parent.conn.rollback()
+                    def failed(e):
+                        if isinstance(e, sqlite3.IntegrityError):
+                            messagebox.showerror("Error", "Username already exists")
+                        else:
+                            messagebox.showerror("Error", f"Failed to register: {str(e)}")
+
+                    self.parent.db_worker.submit(
+                        lambda conn: desk.employees(conn).create(username, password),
+                        lambda _: messagebox.showinfo(
+                            "Success", "Registration successful! You can now login."),
+                        failed)
                         
         except Exception as e:
             messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
 
 class HotelManagementApp(tk.Frame):  
+    # Pause in typing before the customer search runs
+    SEARCH_DELAY_MS = 250
+
     def __init__(self, master):  
         super().__init__(master)
         self.root = master
@@ -286,7 +298,30 @@ class HotelManagementApp(tk.Frame):
         # Database initialization
         self.db_file = "hotel_management.db"
         self.initialize_database()
-        
+
+        # Background worker for the database work, or the booking server's
+        # requests when TROE_SERVER is set (troe.desk)
+        self.db_worker = desk.worker(self.db_file, self.root, on_busy=self.show_busy)
+        self.db_worker.start()
+
+        # Load active bookings for fast availability searches
+        self.db_worker.submit(
+            self.availability.load,
+            errback=lambda e: print(f"Availability engine not loaded: {str(e)}"))
+
+        # Create default admin user if not exists
+        self.db_worker.submit(
+            lambda conn: desk.employees(conn).ensure_admin(),
+            errback=lambda e: messagebox.showerror("Database Error",
+                                                   f"Failed to create the admin user: {str(e)}"))
+
+        # Refresh open views when bookings or rooms change, from any connection
+        self.changes = desk.change_tracker(self.db_file, self.root)
+        self.changes.start()
+
+        # Bookings made or cancelled anywhere else reload the availability engine
+        self.changes.subscribe(('bookings',), self.availability.invalidate)
+
         # Show login window
         self.show_login_window()
 
@@ -350,6 +385,27 @@ class HotelManagementApp(tk.Frame):
                           fg=self.colors['text'])
         subtitle.pack()
 
+        # Busy indicator, filled in while the database worker is running a query
+        self.busy_label = tk.Label(header_frame, text="",
+                                 font=('Helvetica', 10, 'italic'),
+                                 bg=self.colors['bg'],
+                                 fg=self.colors['secondary'])
+        self.busy_label.pack()
+
+    def show_busy(self, busy):
+        """Show a wait cursor on every open window while a query is running"""
+        cursor = 'watch' if busy else ''
+        windows = [self.root] + [w for w in self.root.winfo_children()
+                                 if isinstance(w, tk.Toplevel)]
+        for window in windows:
+            try:
+                window.configure(cursor=cursor)
+            except tk.TclError:
+                pass
+
+        if hasattr(self, 'busy_label') and self.busy_label.winfo_exists():
+            self.busy_label.configure(text="Loading..." if busy else "")
+
     def create_dashboard(self):
         """Create main dashboard with 4 buttons"""
         # Create grid container with padding
@@ -414,77 +470,35 @@ class HotelManagementApp(tk.Frame):
     def initialize_database(self):
         """Initialize database connection and create backup"""
         try:
-            # Create database directory if it doesn't exist
-            db_dir = os.path.dirname(self.db_file)
-            if db_dir and not os.path.exists(db_dir):
-                os.makedirs(db_dir)
+            # With TROE_SERVER set the booking server (troe.server) owns the
+            # database; this desk does not open the file
+            self.conn = None
+            server_url = desk.server_url()
+            if server_url:
+                print(f"Using the booking server at {server_url}")
+            else:
+                # Create database directory if it doesn't exist
+                db_dir = os.path.dirname(self.db_file)
+                if db_dir and not os.path.exists(db_dir):
+                    os.makedirs(db_dir)
 
-            # Create a new connection
-            self.conn = sqlite3.connect(self.db_file)
-            
-            # Enable foreign key support
-            self.conn.execute("PRAGMA foreign_keys = ON")
-            
-            # Create tables
-            self.create_tables()
-            
-            # Create default admin user if not exists
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM emp WHERE username = 'admin'")
-            if not cursor.fetchone():
-                cursor.execute("INSERT INTO emp (username, password) VALUES (?, ?)", 
-                             ('admin', 'admin123'))
-                self.conn.commit()
+                # Create a new connection (WAL, foreign keys on)
+                self.conn = db.connect(self.db_file)
+
+                # Create tables
+                self.create_tables()
+
+            # Searches, bookings and cancellations use it on the worker thread
+            self.availability = desk.availability_engine(self.db_file)
             
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to initialize database: {str(e)}")
             raise  # Re-raise to be caught by main error handler
 
     def create_tables(self):
-        """Create the necessary database tables"""
+        """Create the shared tables, indexes and change triggers"""
         try:
-            cursor = self.conn.cursor()
-            
-            # Create tables with proper constraints
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS emp (
-                username TEXT PRIMARY KEY,
-                password TEXT NOT NULL
-            )
-            """)
-            
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rooms (
-                room_number INTEGER PRIMARY KEY,
-                room_type TEXT NOT NULL,
-                ac_type TEXT NOT NULL,
-                price REAL NOT NULL CHECK (price > 0),
-                capacity INTEGER NOT NULL CHECK (capacity > 0 AND capacity <= 4),
-                wifi INTEGER NOT NULL,
-                status TEXT DEFAULT 'available' 
-                CHECK (status IN ('available', 'booked', 'maintenance'))
-            )
-            """)
-            
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                person_name TEXT NOT NULL,
-                room_number INTEGER NOT NULL,
-                check_in_date DATE NOT NULL,
-                check_out_date DATE NOT NULL,
-                num_persons INTEGER NOT NULL CHECK (num_persons > 0),
-                children TEXT NOT NULL,
-                status TEXT DEFAULT 'active' 
-                CHECK (status IN ('active', 'completed', 'cancelled')),
-                booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (room_number) REFERENCES rooms(room_number)
-                ON DELETE RESTRICT
-                ON UPDATE CASCADE
-            )
-            """)
-            
-            self.conn.commit()
+            schema.create_tables(self.conn)
             
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to create tables: {str(e)}")
@@ -557,23 +571,20 @@ class HotelManagementApp(tk.Frame):
                     if capacity < 1 or capacity > 4:
                         raise ValueError("Capacity must be between 1 and 4")
 
-                    cursor = self.conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO rooms (room_number, room_type, ac_type, price, wifi, capacity, status)
-                        VALUES (?, ?, ?, ?, ?, ?, 'available')
-                    """, (room_num, room_type_var.get(), ac_var.get(), price, wifi_var.get(), capacity))
-                    
-                    self.conn.commit()
-                    messagebox.showinfo("Success", "Room added successfully!")
-                    window.destroy()
+                    def added(_):
+                        messagebox.showinfo("Success", "Room added successfully!")
+                        window.destroy()
+
+                    room_type, ac_type, wifi = room_type_var.get(), ac_var.get(), wifi_var.get()
+                    self.db_worker.submit(
+                        lambda conn: desk.rooms(conn).add(room_num, room_type, ac_type, price,
+                                                          capacity, wifi),
+                        added, dialogs.errback("Error", "Database Error", "Failed to add room"))
                     
                 except ValueError as e:
                     messagebox.showerror("Error", str(e))
-                except sqlite3.IntegrityError:
-                    messagebox.showerror("Error", "Room number already exists")
                 except sqlite3.Error as e:
                     messagebox.showerror("Database Error", f"Failed to add room: {str(e)}")
-                    self.conn.rollback()
 
             # Add Button
             tk.Button(form, text="Add Room",
@@ -583,9 +594,29 @@ class HotelManagementApp(tk.Frame):
                      padx=20, pady=10,
                      command=add_room_action).grid(row=6, column=0, columnspan=2, pady=30)
 
+            # Bulk import from a file
+            tk.Button(form, text="Import Rooms from File",
+                     bg=self.colors['accent1'],
+                     fg='white',
+                     font=('Helvetica', 11),
+                     padx=10, pady=5,
+                     command=self.import_rooms).grid(row=7, column=0, columnspan=2)
+
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open Add Room window: {str(e)}")
 
+    def import_rooms(self):
+        """Add rooms in bulk from a CSV or JSON Lines file."""
+        dialogs.import_rooms(self.db_worker)
+
+    def run_night_audit(self):
+        """Complete checked-out stays and record today's figures."""
+        dialogs.run_night_audit(self.db_worker)
+
+    def view_booking_history(self):
+        """Search all bookings, including the ones moved to the archive file."""
+        dialogs.view_booking_history(self.root, self.db_worker, self.db_file)
+
     def open_book_room_window(self):
         """Open window for booking rooms"""
         try:
@@ -702,35 +733,34 @@ class HotelManagementApp(tk.Frame):
             room_list.tag_configure('evenrow', background='white')
 
             def check_availability():
-                try:
-                    cursor = self.conn.cursor()
-                    cursor.execute("""
-                        SELECT room_number, room_type, price FROM rooms 
-                        WHERE room_type = ? AND status = 'available'
-                        AND room_number NOT IN (
-                            SELECT room_number FROM bookings 
-                            WHERE (check_in_date <= ? AND check_out_date >= ?)
-                            AND status = 'active'
-                        )
-                    """, (room_type_var.get(), check_out_date.get(), check_in_date.get()))
-                    
+                room_type = room_type_var.get()
+                check_in = check_in_date.get_date()
+                check_out = check_out_date.get_date()
+
+                def show_rooms(rooms):
+                    if not room_list.winfo_exists():
+                        return
+
                     # Clear existing items
                     for item in room_list.get_children():
                         room_list.delete(item)
-                    
+
                     # Insert available rooms with alternating colors
-                    rooms = cursor.fetchall()
                     if not rooms:
                         messagebox.showinfo("Info", "No rooms available for selected criteria")
-                    
+
                     for i, room in enumerate(rooms):
                         tag = 'evenrow' if i % 2 == 0 else 'oddrow'
                         # Format price with 2 decimal places
-                        formatted_room = (room[0], room[1], f"₹{room[2]:.2f}")
+                        formatted_room = (room[0], room[1], f"₹{room[3]:.2f}")
                         room_list.insert("", "end", values=formatted_room, tags=(tag,))
-                    
-                except sqlite3.Error as e:
-                    messagebox.showerror("Error", f"Failed to check availability: {str(e)}")
+
+                # Date overlap is answered by the in-memory availability engine
+                self.db_worker.submit(
+                    lambda conn: self.availability.filter_free(
+                        RoomRepository(conn).available_by_type(room_type), check_in, check_out),
+                    show_rooms,
+                    lambda e: messagebox.showerror("Error", f"Failed to check availability: {str(e)}"))
 
             def book_room():
                 try:
@@ -749,31 +779,22 @@ class HotelManagementApp(tk.Frame):
                     
                     selected_room = room_list.item(room_list.selection()[0])['values'][0]
                     
-                    # Check room capacity
-                    cursor = self.conn.cursor()
-                    cursor.execute("SELECT capacity FROM rooms WHERE room_number = ?", (selected_room,))
-                    room_capacity = cursor.fetchone()[0]
-                    
-                    if num_persons > room_capacity:
-                        raise ValueError(f"Selected room has a capacity of {room_capacity} persons only")
-                    
-                    cursor.execute("""
-                        INSERT INTO bookings 
-                        (person_name, room_number, check_in_date, check_out_date, 
-                         num_persons, children, status)
-                        VALUES (?, ?, ?, ?, ?, ?, 'active')
-                    """, (name_entry.get(), selected_room, check_in_date.get(),
-                         check_out_date.get(), num_persons, children_var.get()))
-                    
-                    self.conn.commit()
-                    messagebox.showinfo("Success", "Room booked successfully!")
-                    window.destroy()
+                    def booked(_):
+                        messagebox.showinfo("Success", "Room booked successfully!")
+                        window.destroy()
+
+                    # Checks capacity and overlapping stays before inserting
+                    name, children = name_entry.get(), children_var.get()
+                    check_in, check_out = check_in_date.get_date(), check_out_date.get_date()
+                    self.db_worker.submit(
+                        lambda conn: desk.bookings(conn, self.availability).book(
+                            name, selected_room, check_in, check_out, num_persons, children),
+                        booked, dialogs.errback("Error", "Error", "Failed to book room"))
                     
                 except ValueError as e:
                     messagebox.showerror("Error", str(e))
                 except sqlite3.Error as e:
                     messagebox.showerror("Error", f"Failed to book room: {str(e)}")
-                    self.conn.rollback()
 
             # Add Book Now button in the form section
             book_now_btn = tk.Button(form, 
@@ -854,29 +875,17 @@ class HotelManagementApp(tk.Frame):
             
             tree.pack(fill=tk.BOTH, expand=True, pady=20)
 
+            # Newest check-in first, fetched a page at a time as the list scrolls
+            window.pager = PagedTreeview(
+                tree, self.db_worker,
+                BookingRepository.PAGE_SELECT, BookingRepository.PAGE_KEYS,
+                format_row=lambda row: ((row[0], row[2], row[1]) + tuple(row[3:]), ()),
+                on_empty=lambda: messagebox.showinfo("Info", "No bookings found"),
+                on_error=lambda e: messagebox.showerror("Error", f"Failed to load bookings: {str(e)}"))
+
             def load_bookings():
-                try:
-                    # Clear existing items
-                    for item in tree.get_children():
-                        tree.delete(item)
-                    
-                    cursor = self.conn.cursor()
-                    cursor.execute("""
-                        SELECT booking_id, room_number, person_name, 
-                               check_in_date, check_out_date, status
-                        FROM bookings
-                        ORDER BY check_in_date DESC
-                    """)
-                    
-                    bookings = cursor.fetchall()
-                    if not bookings:
-                        messagebox.showinfo("Info", "No bookings found")
-                    
-                    for booking in bookings:
-                        tree.insert("", "end", values=booking)
-                        
-                except sqlite3.Error as e:
-                    messagebox.showerror("Error", f"Failed to load bookings: {str(e)}")
+                # Diff the loaded rows against the database, keeping the scroll position
+                window.pager.refresh()
 
             def cancel_booking():
                 if not tree.selection():
@@ -886,20 +895,18 @@ class HotelManagementApp(tk.Frame):
                 booking_id = tree.item(tree.selection()[0])['values'][0]
                 
                 if messagebox.askyesno("Confirm", "Are you sure you want to cancel this booking?"):
-                    try:
-                        cursor = self.conn.cursor()
-                        cursor.execute("""
-                            UPDATE bookings SET status = 'cancelled'
-                            WHERE booking_id = ?
-                        """, (booking_id,))
-                        
-                        self.conn.commit()
+                    def cancelled(was_active):
+                        if not was_active:
+                            messagebox.showinfo("Info", "This booking is not active")
+                            return
                         messagebox.showinfo("Success", "Booking cancelled successfully!")
-                        load_bookings()  # Refresh the list
-                        
-                    except sqlite3.Error as e:
-                        messagebox.showerror("Error", f"Failed to cancel booking: {str(e)}")
-                        self.conn.rollback()
+                        self.changes.poll()  # Refresh the list
+
+                    self.db_worker.submit(
+                        lambda conn: desk.bookings(conn, self.availability).cancel(booking_id),
+                        cancelled,
+                        lambda e: messagebox.showerror("Error",
+                                                       f"Failed to cancel booking: {str(e)}"))
 
             # Buttons Frame
             button_frame = tk.Frame(window.container, bg='white')
@@ -915,10 +922,23 @@ class HotelManagementApp(tk.Frame):
                      bg=self.colors['secondary'],
                      fg='white',
                      font=('Helvetica', 12),
-                     command=load_bookings).pack(side=tk.LEFT, padx=5)
+                     command=self.changes.poll).pack(side=tk.LEFT, padx=5)
 
-            # Load bookings initially
-            load_bookings()
+            tk.Button(button_frame, text="Night Audit",
+                     bg=self.colors['accent4'],
+                     fg='white',
+                     font=('Helvetica', 12),
+                     command=self.run_night_audit).pack(side=tk.LEFT, padx=5)
+
+            tk.Button(button_frame, text="Booking History",
+                     bg=self.colors['secondary'],
+                     fg='white',
+                     font=('Helvetica', 12),
+                     command=self.view_booking_history).pack(side=tk.LEFT, padx=5)
+
+            # Load bookings initially, then again whenever bookings change
+            window.pager.reload()
+            self.changes.subscribe(('bookings',), load_bookings, widget=tree)
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open View Bookings window: {str(e)}")
@@ -946,30 +966,29 @@ class HotelManagementApp(tk.Frame):
             
             tree.pack(fill=tk.BOTH, expand=True, pady=20)
 
-            def load_customer_info():
-                try:
-                    # Clear existing items
-                    for item in tree.get_children():
-                        tree.delete(item)
-                    
-                    cursor = self.conn.cursor()
-                    cursor.execute("""
-                        SELECT person_name, room_number, check_in_date, 
-                               check_out_date, status
-                        FROM bookings
-                        WHERE status = 'active'
-                        ORDER BY check_in_date DESC
-                    """)
-                    
-                    customers = cursor.fetchall()
-                    if not customers:
-                        messagebox.showinfo("Info", "No active customers found")
-                    
-                    for customer in customers:
-                        tree.insert("", "end", values=customer)
-                        
-                except sqlite3.Error as e:
-                    messagebox.showerror("Error", f"Failed to load customer information: {str(e)}")
+            # Rows keyed by booking ID so a refresh only touches what changed
+            binding = TableBinding(
+                tree, format_row=lambda row: ((row[1], row[2]) + tuple(row[4:]), ()))
+
+            def show_customers(customers, empty_message):
+                if not tree.winfo_exists():
+                    return
+
+                binding.update(customers)
+
+                if not customers and empty_message:
+                    messagebox.showinfo("Info", empty_message)
+
+            # Search text of the rows on screen; None for all active customers
+            shown = {'query': None}
+
+            def load_customer_info(empty_message="No active customers found"):
+                shown['query'] = None
+
+                self.db_worker.submit(
+                    lambda conn: BookingRepository(conn).active_customers(),
+                    lambda customers: show_customers(customers, empty_message),
+                    lambda e: messagebox.showerror("Error", f"Failed to load customer information: {str(e)}"))
 
             # Search frame
             search_frame = tk.Frame(window.container, bg='white')
@@ -981,35 +1000,21 @@ class HotelManagementApp(tk.Frame):
             search_entry = ttk.Entry(search_frame, width=30)
             search_entry.pack(side=tk.LEFT, padx=5)
 
-            def search_customers():
-                query = search_entry.get().strip()
+            def search_customers(query=None, empty_message="No matching customers found"):
+                if query is None:
+                    query = search_entry.get().strip()
                 if not query:
-                    load_customer_info()
+                    if empty_message:
+                        load_customer_info()
+                    else:
+                        load_customer_info(empty_message=None)
                     return
+                shown['query'] = query
 
-                try:
-                    cursor = self.conn.cursor()
-                    cursor.execute("""
-                        SELECT person_name, room_number, check_in_date, 
-                               check_out_date, status
-                        FROM bookings
-                        WHERE person_name LIKE ? AND status = 'active'
-                        ORDER BY check_in_date DESC
-                    """, (f"%{query}%",))
-                    
-                    # Clear existing items
-                    for item in tree.get_children():
-                        tree.delete(item)
-                    
-                    customers = cursor.fetchall()
-                    if not customers:
-                        messagebox.showinfo("Info", "No matching customers found")
-                    
-                    for customer in customers:
-                        tree.insert("", "end", values=customer)
-                        
-                except sqlite3.Error as e:
-                    messagebox.showerror("Error", f"Failed to search customers: {str(e)}")
+                self.db_worker.submit(
+                    lambda conn: BookingRepository(conn).search(query),
+                    lambda customers: show_customers(customers, empty_message),
+                    lambda e: messagebox.showerror("Error", f"Failed to search customers: {str(e)}"))
 
             tk.Button(search_frame, text="Search",
                      bg=self.colors['secondary'],
@@ -1017,15 +1022,48 @@ class HotelManagementApp(tk.Frame):
                      font=('Helvetica', 12),
                      command=search_customers).pack(side=tk.LEFT, padx=5)
 
+            # Search as you type, once typing pauses for SEARCH_DELAY_MS
+            pending = {'after_id': None}
+
+            def run_typed_search():
+                pending['after_id'] = None
+                if not tree.winfo_exists():
+                    return
+                if search_entry.get().strip() != (shown['query'] or ''):
+                    search_customers(empty_message=None)
+
+            def on_search_key(event):
+                if pending['after_id'] is not None:
+                    search_entry.after_cancel(pending['after_id'])
+                pending['after_id'] = search_entry.after(self.SEARCH_DELAY_MS, run_typed_search)
+
+            search_entry.bind('<KeyRelease>', on_search_key)
+            search_entry.bind('<Return>', lambda event: search_customers())
+
+            def refresh_view():
+                # Re-run whatever is on screen, without popups
+                if shown['query'] is None:
+                    load_customer_info(empty_message=None)
+                else:
+                    search_customers(shown['query'], empty_message=None)
+
+            def refresh_button():
+                # The full list only needs a query if bookings changed
+                if shown['query'] is None:
+                    self.changes.poll()
+                else:
+                    load_customer_info()
+
             # Refresh button
             tk.Button(window.container, text="Refresh",
                      bg=self.colors['secondary'],
                      fg='white',
                      font=('Helvetica', 12),
-                     command=load_customer_info).pack(pady=20)
+                     command=refresh_button).pack(pady=20)
 
-            # Load customer info initially
+            # Load customer info initially, then again whenever bookings change
             load_customer_info()
+            self.changes.subscribe(('bookings',), refresh_view, widget=tree)
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open Customer Info window: {str(e)}")
@@ -1033,7 +1071,13 @@ class HotelManagementApp(tk.Frame):
     def on_closing(self):
         """Handle application closing"""
         try:
-            if hasattr(self, 'conn'):
+            if hasattr(self, 'changes'):
+                self.changes.stop()
+            if hasattr(self, 'db_worker'):
+                # The occupancy snapshot is saved on the worker's connection
+                self.db_worker.submit(lambda conn: self.availability.save())
+                self.db_worker.stop()
+            if hasattr(self, 'conn') and self.conn:
                 try:
                     self.conn.commit()
                     self.conn.close()
@@ -1045,23 +1089,16 @@ class HotelManagementApp(tk.Frame):
             import os
             os._exit(1)
 
-    def create_user(self, username, password):  
-        """Create a new user in the database."""  
-        cursor = self.conn.cursor()  
-        cursor.execute("INSERT INTO emp (username, password) VALUES (?, ?)", (username, password))  
-        self.conn.commit()
-
     def register_user(self):  
         """Register a new user."""  
         username = simpledialog.askstring("Register", "Enter username:")  
         password = simpledialog.askstring("Register", "Enter password:", show='*')  
 
         if username and password:  
-            try:  
-                self.create_user(username, password)  
-                messagebox.showinfo("Success", "User registered successfully!")  
-            except sqlite3.Error as e:  
-                messagebox.showerror("Error", f"Failed to register user: {str(e)}")  
+            self.db_worker.submit(
+                lambda conn: desk.employees(conn).create(username, password),
+                lambda _: messagebox.showinfo("Success", "User registered successfully!"),
+                lambda e: messagebox.showerror("Error", f"Failed to register user: {str(e)}"))
         else:  
             messagebox.showerror("Error", "Username and password cannot be empty.")
 
@@ -1,9 +1,13 @@
 import tkinter as tk  
-from tkinter import ttk, messagebox, simpledialog  
+from tkinter import ttk, messagebox, simpledialog
 from tkcalendar import DateEntry  
 import sqlite3  
-import os
 from datetime import datetime
+from troe import db, desk, dialogs, schema
+from troe.binding import TableBinding
+from troe.paging import PagedTreeview
+from troe.repository import BookingRepository, RoomRepository
+from troe.backup import BackupManager
 
 class DarkTheme:
     BG_COLOR = "#2b2b2b"
@@ -123,6 +127,14 @@ class HotelManagementApp:
                               background=DarkTheme.SECONDARY_BG,
                               justify=tk.CENTER)
         title_label.pack(pady=10)
+
+        # Shown while the database worker is running a query
+        self.busy_label = ttk.Label(self.sidebar,
+                                    text="",
+                                    font=("Helvetica", 10),
+                                    foreground=DarkTheme.ACCENT_COLOR,
+                                    background=DarkTheme.SECONDARY_BG)
+        self.busy_label.pack(side=tk.BOTTOM, pady=10)
         
         # Create content frame
         self.content_frame = ttk.Frame(self.main_container, padding=20)
@@ -142,9 +154,41 @@ class HotelManagementApp:
         # Database initialization
         self.db_file = "hotel_management.db"
         self.initialize_database()
+
+        # Background thread for the database work, or the booking server's
+        # requests when TROE_SERVER is set (troe.desk); results come back via after()
+        self.db_worker = desk.worker(self.db_file, self.root, on_busy=self.show_busy)
+        self.db_worker.start()
+
+        # Load active bookings for fast availability searches
+        self.db_worker.submit(
+            self.availability.load,
+            errback=lambda e: print(f"Availability engine not loaded: {str(e)}"))
+
+        # Add test rooms if database is empty
+        def sample_rooms_added(added):
+            if added:
+                print(f"No rooms found, added {added} test rooms")
+            else:
+                print("Rooms already exist in database")
+
+        self.db_worker.submit(
+            lambda conn: desk.rooms(conn).add_sample_rooms(), sample_rooms_added,
+            lambda e: print(f"Database Error: {str(e)}"))
+
+        # Refresh open views when bookings or rooms change, from any connection
+        self.changes = desk.change_tracker(self.db_file, self.root)
+        self.changes.start()
+
+        # Bookings made or cancelled anywhere else reload the availability engine
+        self.changes.subscribe(('bookings',), self.availability.invalidate)
         
         # Create all frames
         self.create_all_frames()
+
+        # Booking lists follow the database without a manual refresh
+        self.changes.subscribe(('bookings', 'rooms'), lambda: self.bookings_pager.refresh())
+        self.changes.subscribe(('bookings', 'rooms'), lambda: self.refresh_customer_info())
         
         # Create navigation buttons
         self.create_nav_buttons()
@@ -152,67 +196,37 @@ class HotelManagementApp:
         # Show login frame first
         self.show_frame("Login")
 
+    def show_busy(self, busy):
+        """Show or hide the busy indicator while the database worker runs."""
+        self.busy_label.configure(text="Loading..." if busy else "")
+        self.root.configure(cursor="watch" if busy else "")
+
     def initialize_database(self):
         """Initialize database connection and create backup"""
         try:
-            # Create backup of existing database if it exists
-            if os.path.exists(self.db_file):
-                backup_dir = "backups"
-                if not os.path.exists(backup_dir):
-                    os.makedirs(backup_dir)
-                backup_file = os.path.join(backup_dir, f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-                with open(self.db_file, 'rb') as src, open(backup_file, 'wb') as dst:
-                    dst.write(src.read())
-                print(f"Database backup created: {backup_file}")
-
-            # Connect to database with foreign key support
-            self.conn = sqlite3.connect(self.db_file)
-            self.conn.execute("PRAGMA foreign_keys = ON")
-            
-            # Create tables
-            self.create_tables()
-            
-            # Check if we need to add test rooms
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM rooms")
-            room_count = cursor.fetchone()[0]
-            print(f"Current room count: {room_count}")
-
-            if room_count == 0:
-                print("No rooms found, adding test rooms...")
-                # Add test rooms if database is empty
-                test_rooms = [
-                    (101, 'Deluxe', 'AC', 2500, 2, 1, 'available'),
-                    (102, 'Normal', 'Non-AC', 1500, 2, 1, 'available'),
-                    (103, 'Premium', 'AC', 3500, 3, 1, 'available'),
-                    (104, 'Suite', 'AC', 5000, 4, 1, 'available'),
-                    (201, 'Deluxe', 'AC', 2800, 2, 1, 'available'),
-                    (202, 'Premium', 'AC', 3800, 3, 1, 'available')
-                ]
-                
-                for room in test_rooms:
-                    try:
-                        cursor.execute("""
-                            INSERT INTO rooms (room_number, room_type, ac_type, price, capacity, wifi, status)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """, room)
-                        print(f"Added room {room[0]} successfully")
-                    except sqlite3.Error as e:
-                        print(f"Error adding room {room[0]}: {str(e)}")
-                
-                self.conn.commit()
-                
-                # Verify rooms were added
-                cursor.execute("SELECT COUNT(*) FROM rooms")
-                new_room_count = cursor.fetchone()[0]
-                print(f"New room count after adding test rooms: {new_room_count}")
-                
+            # With TROE_SERVER set the booking server (troe.server) owns the
+            # database and backs it up; this desk does not open the file
+            self.conn = None
+            server_url = desk.server_url()
+            if server_url:
+                print(f"Using the booking server at {server_url}")
             else:
-                print("Rooms already exist in database")
+                # Back up the existing database in the background
+                self.backup = BackupManager(self.db_file, backup_dir="backups", keep=10)
+                self.backup.start()
+
+                # Connect to database with foreign key support and WAL
+                self.conn = db.connect(self.db_file)
+
+                # Create tables
+                self.create_tables()
+
+            # Searches, bookings and cancellations use it on the worker thread
+            self.availability = desk.availability_engine(self.db_file)
                 
         except sqlite3.Error as e:
             print(f"Database Error: {str(e)}")
-            if hasattr(self, 'conn'):
+            if hasattr(self, 'conn') and self.conn:
                 self.conn.rollback()
             messagebox.showerror("Database Error", f"Failed to initialize database: {str(e)}")
             raise
@@ -222,41 +236,9 @@ class HotelManagementApp:
             raise
 
     def create_tables(self):  
-        """Create the SQLite tables."""  
-        cursor = self.conn.cursor()  
-        cursor.execute("""  
-        CREATE TABLE IF NOT EXISTS emp (  
-            username TEXT PRIMARY KEY,  
-            password TEXT NOT NULL  
-        )  
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rooms (
-                room_number INTEGER PRIMARY KEY,
-                room_type TEXT NOT NULL,
-                ac_type TEXT NOT NULL,
-                price REAL NOT NULL CHECK (price > 0),
-                capacity INTEGER NOT NULL CHECK (capacity > 0 AND capacity <= 4),
-                wifi INTEGER NOT NULL,
-                status TEXT DEFAULT 'available' CHECK (status IN ('available', 'booked', 'maintenance'))
-            )
-            """)
-        # Booking table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                person_name TEXT NOT NULL,
-                room_number INTEGER NOT NULL,
-                check_in_date DATE NOT NULL,
-                check_out_date DATE NOT NULL,
-                num_persons INTEGER NOT NULL,
-                children TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (room_number) REFERENCES rooms(room_number)
-            )
-            """)
-        self.conn.commit()  
+        """Create the shared tables, indexes and change triggers."""  
+        # An upgrade waits for the startup backup to finish first
+        schema.create_tables(self.conn, self.backup)
 
     def create_nav_buttons(self):
         """Create navigation buttons in sidebar"""
@@ -471,6 +453,10 @@ class HotelManagementApp:
         # Clear button
         ttk.Button(button_frame, text="Clear Fields",
                   command=self.clear_room_fields).pack(side=tk.LEFT, padx=5)
+
+        # Bulk import from a file
+        ttk.Button(button_frame, text="Import Rooms",
+                  command=self.import_rooms).pack(side=tk.LEFT, padx=5)
         
         # Add Room button with accent style
         style.configure("Accent.TButton",
@@ -530,6 +516,14 @@ class HotelManagementApp:
         self.available_rooms_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Gray out rooms that cannot be booked
+        self.available_rooms_tree.tag_configure('booked', foreground='gray')
+        self.available_rooms_tree.tag_configure('unavailable', foreground='gray')
+
+        # Rows are (room number, values, tags), keyed by room number
+        self.room_binding = TableBinding(
+            self.available_rooms_tree, format_row=lambda row: (row[1], row[2]))
+
         # Right Panel - Booking Form
         right_panel = ttk.Frame(main_container)
         right_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0))
@@ -616,6 +610,10 @@ class HotelManagementApp:
                   command=self.view_bookings).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Cancel Booking",
                   command=self.cancel_booking).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Night Audit",
+                  command=self.run_night_audit).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Booking History",
+                  command=self.view_booking_history).pack(side=tk.LEFT, padx=5)
 
         # Bookings List Card
         bookings_card = ttk.Frame(self.frames["View Bookings"], style="Card.TFrame", padding="15")
@@ -638,9 +636,20 @@ class HotelManagementApp:
         # Add scrollbar
         scrollbar = ttk.Scrollbar(bookings_card, orient=tk.VERTICAL, 
                                 command=self.bookings_tree.yview)
-        self.bookings_tree.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Configure tag colors
+        self.bookings_tree.tag_configure('cancelled', foreground='gray')
+        self.bookings_tree.tag_configure('active', foreground=DarkTheme.FG_COLOR)
+
+        # Load the booking history a page at a time as the list is scrolled
+        self.bookings_pager = PagedTreeview(
+            self.bookings_tree, self.db_worker,
+            BookingRepository.PAGE_SELECT, BookingRepository.PAGE_KEYS,
+            format_row=self.format_booking_row,
+            scrollbar=scrollbar,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to retrieve bookings: {str(e)}"))
+
     def create_customer_info_frame(self):  
         """Create the frame for customer info."""  
         self.frames["Customer Info"] = ttk.Frame(self.content_frame, padding="20")  
@@ -682,6 +691,10 @@ class HotelManagementApp:
         self.customer_tree.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Rows keyed by booking ID so a refresh only touches what changed
+        self.customer_binding = TableBinding(
+            self.customer_tree, format_row=lambda row: (row[1:6], ()))
+
     def add_room(self):  
         """Add a room to the database."""  
         try:
@@ -704,23 +717,31 @@ class HotelManagementApp:
             if capacity < 1 or capacity > 4:
                 raise ValueError("Capacity must be between 1 and 4")
 
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT INTO rooms (room_number, room_type, ac_type, price, wifi, capacity, status)
-                VALUES (?, ?, ?, ?, ?, ?, 'available')
-            """, (room_number, room_type, ac_type, price, wifi, capacity))
-            
-            self.conn.commit()
-            messagebox.showinfo("Success", "Room added successfully!")
-            self.clear_room_fields()
+            def added(_):
+                messagebox.showinfo("Success", "Room added successfully!")
+                self.clear_room_fields()
+
+            self.db_worker.submit(
+                lambda conn: desk.rooms(conn).add(room_number, room_type, ac_type, price,
+                                                  capacity, wifi),
+                added, dialogs.errback("Error", "Database Error", "Failed to add room"))
             
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Room number already exists")
         except ValueError as e:
             messagebox.showerror("Error", str(e))
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to add room: {str(e)}")
-            self.conn.rollback()
+
+    def import_rooms(self):
+        """Add rooms in bulk from a CSV or JSON Lines file."""
+        dialogs.import_rooms(self.db_worker)
+
+    def run_night_audit(self):
+        """Complete checked-out stays and record today's figures."""
+        dialogs.run_night_audit(self.db_worker)
+
+    def view_booking_history(self):
+        """Search all bookings, including the ones moved to the archive file."""
+        dialogs.view_booking_history(self.root, self.db_worker, self.db_file)
 
     def check_availability(self):
         """Check room availability and display available rooms."""
@@ -766,59 +787,40 @@ class HotelManagementApp:
             # Format dates for SQLite
             check_in_str = check_in.strftime('%Y-%m-%d')
             check_out_str = check_out.strftime('%Y-%m-%d')
-
-            # Clear existing items in the treeview
-            for item in self.available_rooms_tree.get_children():
-                self.available_rooms_tree.delete(item)
-
-            # Search for available rooms
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT r.room_number, r.room_type, r.ac_type, r.price, r.capacity, r.wifi
-                FROM rooms r
-                WHERE r.room_type = ? 
-                AND r.ac_type = ?
-                AND r.price <= ?
-                AND r.capacity >= ?
-                AND r.status = 'available'
-                AND r.room_number NOT IN (
-                    SELECT room_number 
-                    FROM bookings 
-                    WHERE status = 'active'
-                    AND (
-                        (check_in_date <= ? AND check_out_date >= ?) OR
-                        (check_in_date <= ? AND check_out_date >= ?) OR
-                        (check_in_date >= ? AND check_out_date <= ?)
-                    )
-                )
-                ORDER BY r.price ASC
-            """, (
-                required_fields['Room Type'],
-                required_fields['AC Type'],
-                budget,
-                num_persons,
-                check_in_str, check_in_str,
-                check_out_str, check_out_str,
-                check_in_str, check_out_str
-            ))
-            
-            available_rooms = cursor.fetchall()
-
-            if not available_rooms:
-                messagebox.showinfo("No Rooms", "No rooms available matching your criteria.")
+            room_type = required_fields['Room Type']
+            ac_type = required_fields['AC Type']
+
+            def show_results(available_rooms):
+                if not available_rooms:
+                    self.room_binding.clear()
+                    messagebox.showinfo("No Rooms", "No rooms available matching your criteria.")
+                    self.book_room_btn.configure(state='disabled')
+                    return
+
+                # Show available rooms, updating only the rows that changed
+                rows = []
+                for room in available_rooms:
+                    # Convert wifi boolean to Yes/No
+                    wifi_status = "Yes" if room[5] else "No"
+                    values = (room[0], room[1], room[2], f"₹{room[3]}", room[4], wifi_status)
+                    rows.append((room[0], values, ()))
+                self.room_binding.update(rows)
+
+                # Enable the book room button
+                self.book_room_btn.configure(state='normal')
+                messagebox.showinfo("Success", f"Found {len(available_rooms)} available rooms matching your criteria.")
+
+            def show_error(e):
+                messagebox.showerror("Database Error", f"Failed to check availability: {str(e)}")
                 self.book_room_btn.configure(state='disabled')
-                return
 
-            # Insert available rooms into treeview
-            for room in available_rooms:
-                # Convert wifi boolean to Yes/No
-                wifi_status = "Yes" if room[5] else "No"
-                values = (room[0], room[1], room[2], f"₹{room[3]}", room[4], wifi_status)
-                self.available_rooms_tree.insert("", "end", values=values)
-
-            # Enable the book room button
-            self.book_room_btn.configure(state='normal')
-            messagebox.showinfo("Success", f"Found {len(available_rooms)} available rooms matching your criteria.")
+            # Search for matching rooms on the worker thread; date overlap is
+            # answered by the in-memory availability engine
+            self.db_worker.submit(
+                lambda conn: self.availability.filter_free(
+                    RoomRepository(conn).matching(room_type, ac_type, budget, num_persons),
+                    check_in_str, check_out_str),
+                show_results, show_error)
 
         except ValueError as e:
             messagebox.showerror("Validation Error", str(e))
@@ -826,58 +828,30 @@ class HotelManagementApp:
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to check availability: {str(e)}")
             self.book_room_btn.configure(state='disabled')
-            self.conn.rollback()
 
     def view_bookings(self):
-        """View all current bookings."""
-        try:
-            # Clear existing items
-            for item in self.bookings_tree.get_children():
-                self.bookings_tree.delete(item)
-
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT b.booking_id, b.person_name, b.room_number, 
-                       b.check_in_date, b.check_out_date, b.status,
-                       r.price, r.room_type, r.ac_type
-                FROM bookings b
-                JOIN rooms r ON b.room_number = r.room_number
-                ORDER BY 
-                    CASE b.status 
-                        WHEN 'active' THEN 1 
-                        WHEN 'cancelled' THEN 2 
-                    END,
-                    b.check_in_date DESC
-            """)
-            bookings = cursor.fetchall()
-
-            # Insert into treeview with formatted dates
-            for booking in bookings:
-                # Convert date strings to datetime objects for formatting
-                check_in = datetime.strptime(booking[3], '%Y-%m-%d').strftime('%d-%m-%Y')
-                check_out = datetime.strptime(booking[4], '%Y-%m-%d').strftime('%d-%m-%Y')
-                
-                # Format values for display
-                display_values = (
-                    booking[0],  # Booking ID
-                    booking[1],  # Customer Name
-                    booking[2],  # Room Number
-                    check_in,    # Check-in Date
-                    check_out,   # Check-out Date
-                    booking[5]   # Status
-                )
-                
-                # Set tag for row color based on status
-                tags = ('cancelled',) if booking[5] == 'cancelled' else ('active',)
-                
-                self.bookings_tree.insert("", "end", values=display_values, tags=tags)
-            
-            # Configure tag colors
-            self.bookings_tree.tag_configure('cancelled', foreground='gray')
-            self.bookings_tree.tag_configure('active', foreground=DarkTheme.FG_COLOR)
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to retrieve bookings: {str(e)}")
+        """View all bookings, newest check-in first."""
+        self.bookings_pager.reload()
+
+    def format_booking_row(self, booking):
+        """Display values and status tag for one booking row."""
+        # Dates come back from the query as YYYY-MM-DD
+        check_in = datetime.strptime(booking[3], '%Y-%m-%d').strftime('%d-%m-%Y')
+        check_out = datetime.strptime(booking[4], '%Y-%m-%d').strftime('%d-%m-%Y')
+
+        # Format values for display
+        display_values = (
+            booking[0],  # Booking ID
+            booking[1],  # Customer Name
+            booking[2],  # Room Number
+            check_in,    # Check-in Date
+            check_out,   # Check-out Date
+            booking[5]   # Status
+        )
+
+        # Set tag for row color based on status
+        tags = ('cancelled',) if booking[5] == 'cancelled' else ('active',)
+        return display_values, tags
 
     def cancel_booking(self):
         """Cancel an existing booking."""
@@ -892,7 +866,6 @@ class HotelManagementApp:
             booking_values = self.bookings_tree.item(selected_item)['values']
             booking_id = booking_values[0]  # First column is booking ID
             customer_name = booking_values[1]  # Second column is customer name
-            room_number = booking_values[2]  # Third column is room number
             current_status = booking_values[5]  # Sixth column is status
 
             if current_status == 'cancelled':
@@ -903,72 +876,27 @@ class HotelManagementApp:
                 f"Are you sure you want to cancel booking for {customer_name}?")
             
             if confirm:
-                cursor = self.conn.cursor()
-                
-                # Start transaction
-                cursor.execute("BEGIN TRANSACTION")
-                try:
-                    # Update booking status
-                    cursor.execute("""
-                        UPDATE bookings 
-                        SET status = 'cancelled' 
-                        WHERE booking_id = ?
-                    """, (booking_id,))
-
-                    # Check if there are any active bookings for this room
-                    cursor.execute("""
-                        SELECT COUNT(*) 
-                        FROM bookings 
-                        WHERE room_number = ? 
-                        AND status = 'active'
-                        AND booking_id != ?
-                    """, (room_number, booking_id))
-                    
-                    active_bookings = cursor.fetchone()[0]
-
-                    # If no other active bookings, update room status to available
-                    if active_bookings == 0:
-                        cursor.execute("""
-                            UPDATE rooms 
-                            SET status = 'available' 
-                            WHERE room_number = ?
-                        """, (room_number,))
-
-                    self.conn.commit()
+                def cancelled(was_active):
+                    if not was_active:
+                        messagebox.showinfo("Info", "This booking is already cancelled.")
+                        return
                     messagebox.showinfo("Success", "Booking cancelled successfully!")
-                    self.view_bookings()  # Refresh the bookings list
-                    self.refresh_customer_info()  # Refresh customer info
-                except sqlite3.Error as e:
-                    self.conn.rollback()
-                    raise e
+                    self.changes.poll()  # Refresh bookings and customer info
+
+                self.db_worker.submit(
+                    lambda conn: desk.bookings(conn, self.availability).cancel(booking_id),
+                    cancelled,
+                    lambda e: messagebox.showerror("Error", f"Failed to cancel booking: {str(e)}"))
         
         except sqlite3.Error as e:
             messagebox.showerror("Error", f"Failed to cancel booking: {str(e)}")
 
     def refresh_customer_info(self):
         """Refresh the customer information display."""
-        try:
-            # Clear existing items
-            for item in self.customer_tree.get_children():
-                self.customer_tree.delete(item)
-
-            # Fetch current bookings
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT b.person_name, b.room_number, r.price, 
-                       b.check_in_date, b.check_out_date
-                FROM bookings b
-                JOIN rooms r ON b.room_number = r.room_number
-                WHERE b.status = 'active'
-                ORDER BY b.check_in_date
-            """)
-            
-            # Insert into treeview
-            for booking in cursor.fetchall():
-                self.customer_tree.insert("", "end", values=booking)
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"Failed to refresh customer info: {str(e)}")
+        self.db_worker.submit(
+            lambda conn: BookingRepository(conn).active_customers(),
+            self.customer_binding.update,
+            lambda e: messagebox.showerror("Error", f"Failed to refresh customer info: {str(e)}"))
 
     def clear_room_fields(self):
         """Clear all room input fields."""
@@ -999,6 +927,12 @@ class HotelManagementApp:
     def on_closing(self):
         """Handle application closing."""
         try:
+            if hasattr(self, 'changes'):
+                self.changes.stop()
+            if hasattr(self, 'db_worker'):
+                # The occupancy snapshot is saved on the worker's connection
+                self.db_worker.submit(lambda conn: self.availability.save())
+                self.db_worker.stop()
             if hasattr(self, 'conn') and self.conn:
                 self.conn.commit()
                 self.conn.close()
@@ -1016,20 +950,17 @@ class HotelManagementApp:
             messagebox.showerror("Error", "Please enter both username and password.")
             return
 
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM emp WHERE username = ? AND password = ?", 
-                         (username, password))
-            user = cursor.fetchone()
-
-            if user:
+        def checked(valid):
+            if valid:
                 self.logged_in = True
                 messagebox.showinfo("Success", "Login successful!")
                 self.show_frame("Add Room")  # Show main dashboard
             else:
                 messagebox.showerror("Error", "Invalid username or password.")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Login failed: {str(e)}")
+
+        self.db_worker.submit(
+            lambda conn: desk.employees(conn).verify(username, password), checked,
+            lambda e: messagebox.showerror("Database Error", f"Login failed: {str(e)}"))
 
     def create_main_application(self):
         """Create the main application interface after login."""
@@ -1039,12 +970,6 @@ class HotelManagementApp:
         self.create_view_bookings_frame()  
         self.create_customer_info_frame()  
 
-    def create_user(self, username, password):  
-        """Create a new user in the database."""  
-        cursor = self.conn.cursor()  
-        cursor.execute("INSERT INTO emp (username, password) VALUES (?, ?)", (username, password))  
-        self.conn.commit()
-
     def register_user(self):
         """Register a new user."""
         try:
@@ -1062,15 +987,19 @@ class HotelManagementApp:
             if len(password) < 6:
                 raise ValueError("Password must be at least 6 characters long")
 
-            self.create_user(username, password)
-            messagebox.showinfo("Success", "User registered successfully!")
+            def failed(e):
+                if isinstance(e, sqlite3.IntegrityError):
+                    messagebox.showerror("Error", "Username already exists")
+                else:
+                    messagebox.showerror("Database Error", f"Failed to register user: {str(e)}")
+
+            self.db_worker.submit(
+                lambda conn: desk.employees(conn).create(username, password),
+                lambda _: messagebox.showinfo("Success", "User registered successfully!"),
+                failed)
             
         except ValueError as e:
             messagebox.showerror("Validation Error", str(e))
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Username already exists")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to register user: {str(e)}")
 
     def book_selected_room(self):
         """Book the selected room."""
@@ -1087,10 +1016,9 @@ class HotelManagementApp:
             room_type = room_values[1]    # Second column is room type
             room_price = room_values[3]   # Fourth column is price
             room_capacity = room_values[4] # Fifth column is capacity
-            room_status = room_values[5]   # Sixth column is status
             
-            # Check if room is available
-            if room_status != 'available':
+            # Rooms shown for information only are tagged; they cannot be booked
+            if self.available_rooms_tree.item(selected_item)['tags']:
                 messagebox.showerror("Error", "This room is not available for booking.")
                 return
             
@@ -1143,23 +1071,6 @@ class HotelManagementApp:
             check_in_str = check_in.strftime('%Y-%m-%d')
             check_out_str = check_out.strftime('%Y-%m-%d')
 
-            # Check for overlapping bookings
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM bookings 
-                WHERE room_number = ? 
-                AND status = 'active'
-                AND (
-                    (check_in_date <= ? AND check_out_date >= ?) OR
-                    (check_in_date <= ? AND check_out_date >= ?) OR
-                    (check_in_date >= ? AND check_out_date <= ?)
-                )
-            """, (room_number, check_in_str, check_in_str, check_out_str, check_out_str, check_in_str, check_out_str))
-            
-            if cursor.fetchone()[0] > 0:
-                messagebox.showerror("Error", "This room is already booked for the selected dates.")
-                return
-
             # Calculate total price (number of days * room price)
             price = float(room_price.replace('₹', ''))
             days = (check_out - check_in).days
@@ -1178,139 +1089,98 @@ class HotelManagementApp:
                 f"Children: {children}")
 
             if confirm:
-                cursor = self.conn.cursor()
-                cursor.execute("BEGIN TRANSACTION")
-                try:
-                    # Insert booking record
-                    cursor.execute("""
-                        INSERT INTO bookings (
-                            person_name, room_number, check_in_date, check_out_date,
-                            num_persons, children, status
-                        ) VALUES (?, ?, ?, ?, ?, ?, 'active')
-                    """, (person_name, room_number, check_in_str, check_out_str,
-                          num_persons, children))
-                    
-                    # Update room status
-                    cursor.execute("""
-                        UPDATE rooms SET status = 'booked'
-                        WHERE room_number = ?
-                    """, (room_number,))
-
-                    self.conn.commit()
-                    messagebox.showinfo("Success", 
+                def booked(_):
+                    messagebox.showinfo("Success",
                         f"Room booked successfully!\n\n"
                         f"Total amount to be paid: ₹{total_price:.2f}")
-                    
+
                     # Clear form and refresh views
                     self.clear_booking_fields()
                     self.refresh_room_list()  # Refresh available rooms
-                    self.view_bookings()  # Refresh bookings view if visible
-                    
-                except sqlite3.Error as e:
-                    self.conn.rollback()
-                    print(f"Database Error in book_selected_room: {str(e)}")
-                    raise e
-                except ValueError as e:
-                    self.conn.rollback()
-                    messagebox.showerror("Error", str(e))
+                    self.changes.poll()  # Refresh bookings view if visible
+
+                def failed(e):
+                    if isinstance(e, ValueError):
+                        messagebox.showerror("Error", str(e))
+                    elif isinstance(e, sqlite3.Error):
+                        print(f"Database Error in book_selected_room: {str(e)}")
+                        messagebox.showerror("Database Error", f"Failed to book room: {str(e)}")
+                    else:
+                        print(f"Unexpected Error in book_selected_room: {str(e)}")
+                        messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
+
+                # The database rejects overlapping stays and over-capacity bookings
+                self.db_worker.submit(
+                    lambda conn: desk.bookings(conn, self.availability).book(
+                        person_name, room_number, check_in, check_out, num_persons, children),
+                    booked, failed)
 
         except ValueError as e:
             messagebox.showerror("Error", str(e))
         except sqlite3.Error as e:
             print(f"Database Error in book_selected_room: {str(e)}")
             messagebox.showerror("Database Error", f"Failed to book room: {str(e)}")
-            if 'cursor' in locals():
-                self.conn.rollback()
         except Exception as e:
             print(f"Unexpected Error in book_selected_room: {str(e)}")
             messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
-            if 'cursor' in locals():
-                self.conn.rollback()
-
-    def check_database_content(self):
-        """Check and print the content of the database tables"""
-        try:
-            cursor = self.conn.cursor()
-            
-            # Check rooms table
-            print("\n=== Checking Rooms Table ===")
-            cursor.execute("SELECT * FROM rooms")
-            rooms = cursor.fetchall()
-            if rooms:
-                print("Found rooms:")
-                for room in rooms:
-                    print(f"Room {room[0]}: Type={room[1]}, AC={room[2]}, Price={room[3]}, Capacity={room[4]}, WiFi={room[5]}, Status={room[6]}")
-            else:
-                print("No rooms found in database")
-            
-            # Check bookings table
-            print("\n=== Checking Bookings Table ===")
-            cursor.execute("SELECT * FROM bookings")
-            bookings = cursor.fetchall()
-            if bookings:
-                print("Found bookings:")
-                for booking in bookings:
-                    print(f"Booking {booking[0]}: Room={booking[2]}, Status={booking[7]}")
-            else:
-                print("No bookings found in database")
-                
-        except sqlite3.Error as e:
-            print(f"Error checking database: {str(e)}")
 
     def view_all_available_rooms(self):
         """Display all available rooms without filters."""
-        try:
-            # Clear existing items in the treeview
-            for item in self.available_rooms_tree.get_children():
-                self.available_rooms_tree.delete(item)
-
-            cursor = self.conn.cursor()
-            
-            # Get all rooms regardless of status
-            cursor.execute("""
-                SELECT room_number, room_type, ac_type, price, capacity, wifi, status
-                FROM rooms
-                ORDER BY room_type, price ASC
-            """)
-            
-            all_rooms = cursor.fetchall()
+        # Dates from the booking form, read on the Tk thread
+        check_in = self.check_in_entry.get_date().strftime('%Y-%m-%d')
+        check_out = self.check_out_entry.get_date().strftime('%Y-%m-%d')
+
+        def read_rooms(conn):
+            all_rooms = RoomRepository(conn).all()
+            # Rooms free for the dates in the booking form, from the occupancy bitmap
+            return all_rooms, set(self.availability.free_rooms(
+                [room[0] for room in all_rooms], check_in, check_out))
+
+        def show_all_rooms(result):
+            all_rooms, free_rooms = result
             print(f"\nTotal rooms found: {len(all_rooms)}")
-            
+
             if not all_rooms:
+                self.room_binding.clear()
                 print("No rooms found in database!")
                 messagebox.showinfo("No Rooms", "No rooms have been added to the system yet.")
                 return
 
-            # Insert all rooms into treeview
+            # Show all rooms, updating only the rows that changed
+            rows = []
             rooms_added = 0
             for room in all_rooms:
                 # Convert wifi boolean to Yes/No
                 wifi_status = "Yes" if room[5] else "No"
                 status = room[6]
-                
+                if status == 'available' and room[0] not in free_rooms:
+                    status = 'booked'
+
                 # Add all rooms to the view
                 values = (room[0], room[1], room[2], f"₹{room[3]}", room[4], wifi_status)
-                item = self.available_rooms_tree.insert("", "end", values=values)
-                
+
                 # If room is not available, gray it out
                 if status != 'available':
-                    self.available_rooms_tree.tag_configure('booked', foreground='gray')
-                    self.available_rooms_tree.item(item, tags=('booked',))
+                    rows.append((room[0], values, ('booked',)))
                 else:
+                    rows.append((room[0], values, ()))
                     rooms_added += 1
                 print(f"Added room {room[0]} with status: {status}")
 
+            self.room_binding.update(rows)
             print(f"Total available rooms: {rooms_added}")
-            
+
             if rooms_added == 0:
                 messagebox.showinfo("No Available Rooms", "All rooms are currently booked or under maintenance.")
 
-        except sqlite3.Error as e:
+        def show_error(e):
             print(f"Database Error in view_all_available_rooms: {str(e)}")
             messagebox.showerror("Database Error", f"Failed to retrieve rooms: {str(e)}")
-        finally:
-            # Always ensure book button is disabled when refreshing rooms
-            self.book_room_btn.configure(state='disabled')
+
+        # Always ensure book button is disabled when refreshing rooms
+        self.book_room_btn.configure(state='disabled')
+        # Get all rooms regardless of status
+        self.db_worker.submit(read_rooms, show_all_rooms, show_error)
 
     def on_room_select(self, event):
         """Enable book button when a room is selected"""
@@ -1322,32 +1192,17 @@ class HotelManagementApp:
 
     def refresh_room_list(self):
         """Refresh the room list with current data"""
-        try:
-            # Clear existing items
-            for item in self.available_rooms_tree.get_children():
-                self.available_rooms_tree.delete(item)
-
-            cursor = self.conn.cursor()
-            
-            # Simple query to get room details
-            cursor.execute("""
-                SELECT r.room_number, r.room_type, r.ac_type, r.price, r.capacity, 
-                       CASE WHEN b.status = 'active' THEN 'Booked' ELSE r.status END as current_status
-                FROM rooms r
-                LEFT JOIN bookings b ON r.room_number = b.room_number AND b.status = 'active'
-                ORDER BY r.room_type, r.price
-            """)
-            
-            rooms = cursor.fetchall()
-            
+        def show_room_list(rooms):
             if not rooms:
+                self.room_binding.clear()
                 messagebox.showinfo("No Rooms", "No rooms are available in the system.")
                 return
-            
-            # Add rooms to treeview
+
+            # Update the treeview, touching only the rows that changed
+            rows = []
             for room in rooms:
                 room_number, room_type, ac_type, price, capacity, status = room
-                
+
                 # Format the values for display
                 display_values = (
                     room_number,
@@ -1357,16 +1212,16 @@ class HotelManagementApp:
                     capacity,
                     status
                 )
-                
-                item = self.available_rooms_tree.insert("", "end", values=display_values)
-                
+
                 # Gray out non-available rooms
-                if status != 'available':
-                    self.available_rooms_tree.tag_configure('unavailable', foreground='gray')
-                    self.available_rooms_tree.item(item, tags=('unavailable',))
+                tags = ('unavailable',) if status != 'available' else ()
+                rows.append((room_number, display_values, tags))
 
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to refresh room list: {str(e)}")
+            self.room_binding.update(rows)
+
+        self.db_worker.submit(
+            lambda conn: RoomRepository(conn).listing(), show_room_list,
+            lambda e: messagebox.showerror("Database Error", f"Failed to refresh room list: {str(e)}"))
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,140 @@
+"""Compare the troe.db connection profiles on a scratch database.
+
+For each profile this measures:
+  * startup: connect, create the tables and indexes, load the
+    availability engine (what initialize_database does)
+  * bookings/s: single-row INSERT + commit, the way book_room does it
+  * read latency: p50/p95 of the availability query on a second
+    connection while the booking loop is running
+
+    python benchmarks/bench_connection.py [--bookings N] [--rooms N] [--profiles a,b]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from troe import availability, db, schema  # noqa: E402
+from troe.availability import AvailabilityEngine  # noqa: E402
+from troe.dates import day_number  # noqa: E402
+from troe.repository import BookingRepository  # noqa: E402
+
+ROOM_TYPES = ('Normal', 'Deluxe', 'Premium', 'Suite')
+
+
+def seed(db_file, rooms):
+    """Create a database with the given number of rooms."""
+    conn = sqlite3.connect(db_file)
+    schema.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO rooms VALUES (?, ?, 'AC', ?, 2, 1, 'available')",
+        [(100 + i, ROOM_TYPES[i % 4], 1500 + (i % 4) * 1000) for i in range(rooms)])
+    conn.commit()
+    conn.close()
+
+
+def stay(i):
+    """Deterministic check-in/check-out day numbers for booking number i."""
+    day = 1 + (i * 7) % 27
+    month = 1 + (i // 27) % 12
+    check_in = day_number(f"2025-{month:02d}-{day:02d}")
+    return check_in, check_in + 1
+
+
+def run_profile(profile, bookings, rooms, workdir):
+    """Return the measurements for one profile."""
+    db_file = os.path.join(workdir, f"{profile}.db")
+    seed(db_file, rooms)
+
+    started = time.perf_counter()
+    conn = db.connect(db_file, profile)
+    schema.create_tables(conn)
+    AvailabilityEngine(conn).load()
+    startup = time.perf_counter() - started
+
+    latencies = []
+    done = threading.Event()
+
+    def reader():
+        # Second connection, as the background worker would have
+        read_conn = db.connect(db_file, profile)
+        i = 0
+        while not done.is_set():
+            check_in, check_out = stay(i)
+            t = time.perf_counter()
+            try:
+                read_conn.execute(availability.BUSY_ROOMS_SQL, (check_out, check_in)).fetchall()
+                latencies.append(time.perf_counter() - t)
+            except sqlite3.OperationalError:
+                # "database is locked" under the rollback journal
+                latencies.append(time.perf_counter() - t)
+            i += 1
+        read_conn.close()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+
+    started = time.perf_counter()
+    for i in range(bookings):
+        check_in, check_out = stay(i)
+        conn.execute(BookingRepository.INSERT_SQL,
+                     (f"Guest {i}", 100 + i % rooms, check_in, check_out, 2, 'No'))
+        conn.commit()
+    elapsed = time.perf_counter() - started
+
+    done.set()
+    thread.join()
+    conn.close()
+
+    latencies.sort()
+    return {
+        'profile': profile,
+        'startup_ms': startup * 1000,
+        'bookings_per_s': bookings / elapsed,
+        'read_p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'read_p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        'reads': len(latencies),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=2000)
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--profiles', default=','.join(db.PROFILES))
+    parser.add_argument('--dir', help="directory for the scratch databases "
+                                      "(default: a temporary one; use a real disk for fsync costs)")
+    args = parser.parse_args(argv)
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="troe_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = [run_profile(profile, args.bookings, args.rooms, workdir)
+                   for profile in args.profiles.split(',')]
+    finally:
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'profile':<10} {'startup ms':>11} {'bookings/s':>11} "
+          f"{'read p50 ms':>12} {'read p95 ms':>12} {'reads':>7}")
+    for r in results:
+        print(f"{r['profile']:<10} {r['startup_ms']:>11.1f} {r['bookings_per_s']:>11.0f} "
+              f"{r['read_p50_ms']:>12.3f} {r['read_p95_ms']:>12.3f} {r['reads']:>7}")
+
+    baseline = results[0]
+    for r in results[1:]:
+        print(f"{r['profile']}: {r['bookings_per_s'] / baseline['bookings_per_s']:.1f}x "
+              f"bookings/s vs {baseline['profile']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Time the booking workload's SQL against a generated database.
+
+Each entry below is what one of the front-ends runs through the shared
+repositories (see the comment on it), with parameters drawn at random from the database so
+runs are not served from a single cached page.  Writes run inside a
+savepoint that is rolled back, so the database is left unchanged.
+
+    python benchmarks/generate_data.py bench.db
+    python benchmarks/bench_queries.py bench.db --json before.json
+    python benchmarks/bench_queries.py bench.db --compare before.json
+
+--compare exits with status 1 if any query's median got slower than
+the baseline by more than --tolerance (default 25%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from troe import availability, db, nights  # noqa: E402
+from troe.availability import AvailabilityEngine  # noqa: E402
+from troe.dates import day_number  # noqa: E402
+from troe.repository import BookingRepository, RoomRepository  # noqa: E402
+
+
+class Workload:
+    """Random parameters for the queries, drawn from the database."""
+
+    def __init__(self, conn, rng):
+        self.rng = rng
+        self.rooms = [row[0] for row in conn.execute("SELECT room_number FROM rooms")]
+        self.names = [row[0] for row in conn.execute(
+            "SELECT DISTINCT person_name FROM bookings LIMIT 500")]
+        low, high = conn.execute(
+            "SELECT MIN(booking_id), MAX(booking_id) FROM bookings").fetchone()
+        self.booking_ids = (low or 1, high or 1)
+
+    def stay(self):
+        """Day numbers of a check-in in the next few months and a short stay."""
+        check_in = day_number(date.today()) + self.rng.randrange(0, 120)
+        return check_in, check_in + self.rng.randint(1, 5)
+
+    def room_type(self):
+        return self.rng.choice(('Normal', 'Deluxe', 'Premium', 'Suite'))
+
+    def room(self):
+        return self.rng.choice(self.rooms)
+
+    def booking_id(self):
+        return self.rng.randint(*self.booking_ids)
+
+    def name_fragment(self):
+        name = self.rng.choice(self.names) if self.names else 'Guest'
+        return name.split()[-1][:4].lower()
+
+    def misspelt_name(self):
+        """A guest's first name with two neighbouring letters swapped."""
+        word = (self.rng.choice(self.names) if self.names else 'Guest').split()[0].lower()
+        i = self.rng.randrange(len(word) - 1)
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def check_availability_troe1(conn, w):
+    # TROE1 check_availability: candidates, then the busy rooms for the dates
+    check_in, check_out = w.stay()
+    RoomRepository(conn).available_by_type(w.room_type())
+    conn.execute(availability.BUSY_ROOMS_SQL, (check_out, check_in)).fetchall()
+
+
+def check_availability_troe2(conn, w):
+    # TROE2 check_availability shares TROE1's candidate query
+    check_availability_troe1(conn, w)
+
+
+def check_availability_troe3(conn, w):
+    # TROE3 check_availability
+    check_in, check_out = w.stay()
+    RoomRepository(conn).matching(w.room_type(), 'AC', 5000, 2)
+    conn.execute(availability.BUSY_ROOMS_SQL, (check_out, check_in)).fetchall()
+
+
+# The repositories commit, so the write paths replay their statements instead
+
+def book_selected_room(conn, w):
+    # BookingRepository.book: one insert, checked by the booking rule triggers
+    check_in, check_out = w.stay()
+    room = w.room()
+    conn.execute("SAVEPOINT bench")
+    try:
+        conn.execute(BookingRepository.INSERT_SQL,
+                     ('Bench Guest', room, check_in, check_out, 1, 'No'))
+    except sqlite3.IntegrityError:
+        pass  # rejected as a conflict, which is part of the cost
+    finally:
+        conn.execute("ROLLBACK TO bench")
+        conn.execute("RELEASE bench")
+
+
+def cancel_booking(conn, w):
+    # BookingRepository.cancel in all three apps
+    booking_id = w.booking_id()
+    conn.execute("SAVEPOINT bench")
+    try:
+        conn.execute(BookingRepository.CANCEL_SQL, (booking_id,))
+    finally:
+        conn.execute("ROLLBACK TO bench")
+        conn.execute("RELEASE bench")
+
+
+def search_customers(conn, w):
+    # TROE2 open_customer_info_window search_customers (FTS5 guest index)
+    BookingRepository(conn).search(w.name_fragment())
+
+
+def search_customers_fuzzy(conn, w):
+    # search_customers when nothing starts with what was typed (trigram lookup)
+    BookingRepository(conn).fuzzy_search(w.misspelt_name())
+
+
+def search_customers_like(conn, w):
+    # The substring scan search_customers falls back to without FTS5
+    conn.execute(BookingRepository.LIKE_SEARCH_SQL,
+                 (f"%{w.name_fragment()}%", 500)).fetchall()
+
+
+def refresh_customer_info(conn, w):
+    # refresh_customer_info / load_customer_info in all three apps
+    BookingRepository(conn).active_customers()
+
+
+def in_house(conn, w):
+    # Who is staying on one night, from room_nights
+    nights.in_house(conn, w.stay()[0])
+
+
+def occupancy_week(conn, w):
+    # Rooms sold per night over a week, from room_nights
+    check_in, _ = w.stay()
+    nights.occupancy(conn, check_in, check_in + 7)
+
+
+def booking_page(conn, w):
+    # PagedTreeview: one page of the booking history from a random point
+    check_in, _ = w.stay()
+    conn.execute(BookingRepository.PAGE_SELECT + """
+        WHERE (b.check_in_date, b.booking_id) < (?, ?)
+        ORDER BY b.check_in_date DESC, b.booking_id DESC LIMIT ?
+    """, (check_in, w.booking_id(), 100)).fetchall()
+
+
+BENCHMARKS = {
+    'check_availability (TROE1)': check_availability_troe1,
+    'check_availability (TROE2)': check_availability_troe2,
+    'check_availability (TROE3)': check_availability_troe3,
+    'book_selected_room': book_selected_room,
+    'cancel_booking': cancel_booking,
+    'search_customers': search_customers,
+    'search_customers (fuzzy)': search_customers_fuzzy,
+    'search_customers (LIKE)': search_customers_like,
+    'refresh_customer_info': refresh_customer_info,
+    'in_house': in_house,
+    'occupancy (week)': occupancy_week,
+    'booking_page': booking_page,
+}
+
+
+def time_runs(func, runs, warmup=3):
+    """Median, p95 and min of runs calls, in milliseconds."""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        'median_ms': round(statistics.median(times), 4),
+        'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))], 4),
+        'min_ms': round(times[0], 4),
+        'runs': runs,
+    }
+
+
+def run(db_file, runs=50, seed=1, only=None):
+    """Run every benchmark (or those named in only) and return the report."""
+    conn = db.connect(db_file)
+    rng = random.Random(seed)
+    w = Workload(conn, rng)
+    counts = dict(zip(('rooms', 'bookings'), (
+        conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0],
+        conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0])))
+
+    results = {}
+    for name, func in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        results[name] = time_runs(lambda: func(conn, w), runs)
+        print(f"{name:<30} median {results[name]['median_ms']:>9.3f} ms"
+              f"   p95 {results[name]['p95_ms']:>9.3f} ms")
+
+    # The in-memory engine that now answers the date overlap in the apps
+    if not only or 'AvailabilityEngine.free_rooms' in only:
+        started = time.perf_counter()
+        engine = AvailabilityEngine(conn)
+        engine.load()
+        load_ms = (time.perf_counter() - started) * 1000
+        results['AvailabilityEngine.free_rooms'] = time_runs(
+            lambda: engine.free_rooms(w.rooms, *w.stay()), runs)
+        results['AvailabilityEngine.free_rooms']['load_ms'] = round(load_ms, 2)
+        print(f"{'AvailabilityEngine.free_rooms':<30} median "
+              f"{results['AvailabilityEngine.free_rooms']['median_ms']:>9.3f} ms"
+              f"   (load {load_ms:.0f} ms)")
+    conn.close()
+
+    return {
+        'db_file': os.path.abspath(db_file),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'counts': counts,
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Print slowdowns against baseline; return True if any exceed tolerance."""
+    regressed = False
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{name:<30} {before['median_ms']:>9.3f} -> {result['median_ms']:>9.3f} ms"
+              f"  ({ratio:.2f}x){flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('db_file')
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', action='append', help="benchmark name (repeatable)")
+    parser.add_argument('--json', help="write the report to this file")
+    parser.add_argument('--compare', help="baseline report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db_file):
+        print(f"{args.db_file} not found; create it with benchmarks/generate_data.py")
+        return 2
+
+    report = run(args.db_file, args.runs, args.seed, args.only)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Generate a realistic hotel database for benchmarks.
+
+Rooms get a type mix weighted towards Normal and Deluxe, with prices,
+capacities and AC/WiFi that follow the type.  Each room's calendar is
+then filled from a start date: stays are 1-14 nights (mostly short) and
+the gap before the next stay shrinks in peak months (December, May-June)
+and at weekends, so occupancy is seasonal.  Stays in one room never
+overlap; about 8% are cancelled and stays that ended before today are
+marked completed.
+
+    python benchmarks/generate_data.py bench.db --rooms 1000 --bookings 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from troe import db, schema  # noqa: E402
+from troe.dates import day_number  # noqa: E402
+from troe.repository import EmployeeRepository  # noqa: E402
+
+# room type: (share of rooms, base price, capacities, share with AC)
+ROOM_TYPES = {
+    'Normal': (0.50, 1500, (1, 2), 0.5),
+    'Deluxe': (0.30, 2800, (2, 3), 0.9),
+    'Premium': (0.15, 3800, (2, 3, 4), 1.0),
+    'Suite': (0.05, 5500, (3, 4), 1.0),
+}
+
+# Relative demand per month, January first
+SEASON = (0.9, 0.7, 0.8, 1.0, 1.3, 1.4, 1.1, 1.0, 0.8, 0.9, 1.1, 1.5)
+
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Diya', 'Ananya', 'Ishaan', 'Kavya',
+               'Rohan', 'Priya', 'Arjun', 'Meera', 'Sara', 'John', 'Emma', 'Liam',
+               'Olivia', 'Noah', 'Sofia', 'Ravi', 'Neha', 'Karan', 'Pooja')
+LAST_NAMES = ('Sharma', 'Patel', 'Mehta', 'Shah', 'Iyer', 'Reddy', 'Gupta',
+              'Singh', 'Kapoor', 'Desai', 'Smith', 'Brown', 'Wilson', 'Taylor',
+              'Nair', 'Joshi', 'Rao', 'Das', 'Khan', 'Bose')
+
+
+def make_rooms(count, rng):
+    """Room rows, numbered by floor like the apps' sample rooms (101, 102, ...)."""
+    types = list(ROOM_TYPES)
+    weights = [ROOM_TYPES[t][0] for t in types]
+    per_floor = 50 if count > 500 else 20
+    rooms = []
+    for i in range(count):
+        room_type = rng.choices(types, weights)[0]
+        _, base, capacities, ac_share = ROOM_TYPES[room_type]
+        room_number = (i // per_floor + 1) * 100 + i % per_floor + 1
+        rooms.append((
+            room_number,
+            room_type,
+            'AC' if rng.random() < ac_share else 'Non-AC',
+            base + rng.randrange(0, 8) * 100,
+            rng.choice(capacities),
+            1 if rng.random() < 0.85 else 0,
+            'maintenance' if rng.random() < 0.01 else 'available',
+        ))
+    return rooms
+
+
+def stay_length(rng):
+    """Nights per stay: mostly 1-3, occasionally up to two weeks."""
+    return min(14, 1 + int(rng.expovariate(1 / 2.0)))
+
+
+def room_bookings(room, quota, start, today, rng):
+    """Non-overlapping stays for one room, walking its calendar from start."""
+    room_number, capacity = room[0], room[4]
+    day = start + timedelta(days=rng.randrange(0, 7))
+    for _ in range(quota):
+        # Fewer empty nights between guests in busy months and at weekends
+        demand = SEASON[day.month - 1] * (1.3 if day.weekday() >= 4 else 1.0)
+        day += timedelta(days=int(rng.expovariate(demand / 1.5)))
+        check_out = day + timedelta(days=stay_length(rng))
+
+        if rng.random() < 0.08:
+            status = 'cancelled'
+        elif check_out <= today:
+            status = 'completed'
+        else:
+            status = 'active'
+        yield (
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            room_number,
+            day_number(day),
+            day_number(check_out),
+            rng.randint(1, capacity),
+            'Yes' if rng.random() < 0.3 else 'No',
+            status,
+            f"{(day - timedelta(days=rng.randrange(1, 60))).isoformat()} 12:00:00",
+        )
+        # A cancelled stay leaves the room free for the next guest
+        if status != 'cancelled':
+            day = check_out
+
+
+def generate(db_file, rooms=1000, bookings=1000000, start=None, seed=42, batch=50000):
+    """Create db_file with the given number of rooms and bookings."""
+    rng = random.Random(seed)
+    today = date.today()
+    per_room = max(1, bookings // rooms)
+    if start is None:
+        # Roughly 3.7 nights per booking including gaps; end about a year ahead
+        start = today - timedelta(days=int(per_room * 3.7) - 365)
+
+    conn = db.connect(db_file, 'bulk')
+    for sql in schema.TABLES.values():
+        conn.execute(sql)
+    room_rows = make_rooms(rooms, rng)
+    conn.executemany("INSERT OR REPLACE INTO rooms VALUES (?, ?, ?, ?, ?, ?, ?)", room_rows)
+    EmployeeRepository(conn).ensure_admin()
+
+    def all_bookings():
+        remaining = bookings
+        for index, room in enumerate(room_rows):
+            quota = min(remaining, per_room + (1 if index < bookings % rooms else 0))
+            remaining -= quota
+            yield from room_bookings(room, quota, start, today, rng)
+
+    insert = """
+        INSERT INTO bookings (person_name, room_number, check_in_date, check_out_date,
+                              num_persons, children, status, booking_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    rows = all_bookings()
+    written = 0
+    while True:
+        chunk = [row for _, row in zip(range(batch), rows)]
+        if not chunk:
+            break
+        conn.executemany(insert, chunk)
+        conn.commit()
+        written += len(chunk)
+        print(f"  {written} bookings", end="\r")
+    print()
+
+    # Room nights, views, indexes, triggers and guest search after the bulk load,
+    # as the apps would have them
+    schema.migrate(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return len(room_rows), written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('db_file')
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="replace an existing file")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db_file):
+        if not args.force:
+            print(f"{args.db_file} already exists (use --force to replace it)")
+            return 2
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db_file + suffix):
+                os.remove(args.db_file + suffix)
+
+    started = time.perf_counter()
+    rooms, bookings = generate(args.db_file, args.rooms, args.bookings, seed=args.seed)
+    print(f"Created {args.db_file}: {rooms} rooms, {bookings} bookings "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
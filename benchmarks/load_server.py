@@ -0,0 +1,172 @@
+"""Load-test the booking server (troe.server) and report requests per second.
+
+Starts the server on a scratch database (or --db), then runs --clients
+processes that each keep one connection open and send requests back to
+back for --seconds.  --writes of them are bookings of random short stays
+in the same few weeks, so many collide and are turned away by the
+booking rules; the rest are availability searches.  At the end the
+database is checked for overlapping active bookings, as in
+stress_booking.py.
+
+    python benchmarks/load_server.py --clients 8 --seconds 10
+    python benchmarks/load_server.py --writes 1.0        # bookings only
+    python benchmarks/load_server.py --db bench.db --writes 0.05
+
+Each client is a separate process, so the server is measured rather
+than the GIL of the load generator.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from troe import db, schema  # noqa: E402
+from troe.client import ServerClient  # noqa: E402
+from troe.repository import BookingConflict  # noqa: E402
+
+OVERLAPS_SQL = """
+    SELECT COUNT(*)
+    FROM bookings a
+    JOIN bookings b ON b.room_number = a.room_number AND b.booking_id > a.booking_id
+    WHERE a.status = 'active' AND b.status = 'active'
+    AND a.check_in_date < b.check_out_date
+    AND b.check_in_date < a.check_out_date
+"""
+
+
+def seed(db_file, rooms):
+    """Create the scratch database with the given number of rooms."""
+    conn = db.connect(db_file)
+    schema.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO rooms VALUES (?, 'Normal', 'AC', 1500, 4, 1, 'available')",
+        [(101 + i,) for i in range(rooms)])
+    conn.commit()
+    conn.close()
+
+
+def start_server(db_file, readers):
+    """Start python -m troe.server on a free port; return (process, url)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "troe.server", db_file, "--port", "0", "--readers", str(readers),
+         "--no-backup"],
+        cwd=root, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith("Serving"):
+            return process, line.split()[-1]
+    process.wait()
+    raise RuntimeError(f"Server exited with status {process.returncode}")
+
+
+def client(args):
+    """One desk: send requests for the given time; return (counts, latencies in ms)."""
+    url, worker, seconds, writes, rooms, days = args
+    rng = random.Random(worker)
+    api = ServerClient(url)
+    first = date.today() + timedelta(days=1)
+    counts = {'booked': 0, 'conflicts': 0, 'searches': 0, 'errors': 0}
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        check_in = first + timedelta(days=rng.randrange(days))
+        check_out = check_in + timedelta(days=rng.randint(1, 4))
+        try:
+            if rng.random() < writes:
+                api.book(f"Desk {worker} Guest {i}", 101 + rng.randrange(rooms),
+                         check_in, check_out, 1, 'No')
+                counts['booked'] += 1
+            else:
+                api.available(check_in, check_out, persons=rng.randint(1, 4))
+                counts['searches'] += 1
+        except BookingConflict:
+            counts['conflicts'] += 1
+        except Exception as e:
+            counts['errors'] += 1
+            if counts['errors'] == 1:
+                print(f"client {worker}: {str(e)}", file=sys.stderr)
+        latencies.append((time.perf_counter() - started) * 1000)
+        i += 1
+    api.close()
+    return counts, latencies
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--writes', type=float, default=0.2, help="share of requests that book")
+    parser.add_argument('--rooms', type=int, default=50, help="rooms in the scratch database")
+    parser.add_argument('--days', type=int, default=60, help="check-in window in days")
+    parser.add_argument('--readers', type=int, default=4, help="server read connections")
+    parser.add_argument('--db', help="serve this database instead of a scratch one")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    if args.db:
+        db_file = args.db
+        conn = db.connect(db_file)
+        rooms = conn.execute("SELECT MAX(room_number) - 100 FROM rooms").fetchone()[0] or 1
+        conn.close()
+    else:
+        workdir = tempfile.mkdtemp(prefix="troe_load_")
+        db_file = os.path.join(workdir, "load.db")
+        rooms = args.rooms
+        seed(db_file, rooms)
+
+    process, url = start_server(db_file, args.readers)
+    try:
+        jobs = [(url, worker, args.seconds, args.writes, rooms, args.days)
+                for worker in range(args.clients)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, jobs)
+        elapsed = time.perf_counter() - started
+        health = ServerClient(url).health()
+    finally:
+        process.terminate()
+        process.wait()
+
+    counts = {name: sum(r[0][name] for r in results) for name in results[0][0]}
+    latencies = sorted(ms for r in results for ms in r[1])
+    conn = db.connect(db_file)
+    overlaps = conn.execute(OVERLAPS_SQL).fetchone()[0] if workdir else 0
+    conn.close()
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.clients} clients for {args.seconds:.0f}s against {url}, "
+          f"{args.writes:.0%} bookings, {args.readers} readers")
+    print(f"  {len(latencies)} requests, {len(latencies) / elapsed:.0f} requests/s")
+    print(f"  latency ms: p50 {percentile(latencies, 50):.2f}  p95 {percentile(latencies, 95):.2f}"
+          f"  p99 {percentile(latencies, 99):.2f}  max {latencies[-1]:.2f}")
+    print(f"  booked {counts['booked']}, conflicts {counts['conflicts']}, "
+          f"searches {counts['searches']}, errors {counts['errors']}")
+    if health['batches']:
+        print(f"  {health['writes']} writes in {health['batches']} transactions "
+              f"({health['writes'] / health['batches']:.1f} per commit)")
+    if overlaps:
+        print(f"  DOUBLE BOOKINGS: {overlaps} overlapping pairs")
+        return 1
+    return 1 if counts['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Hammer one database file with concurrent bookers and check for double bookings.
+
+Each booker is a separate process with its own connection, like a
+front desk running one of the apps.  They all book random short stays
+in the same few rooms over the same few weeks, so most attempts collide.
+At the end every pair of active bookings in the same room is checked
+for overlapping nights.
+
+    python benchmarks/stress_booking.py --workers 8 --attempts 200
+    python benchmarks/stress_booking.py --unsafe   # check, then insert separately
+
+--unsafe drops the booking rule triggers and books the way the apps
+used to: look for a conflict, then insert in a separate transaction
+(with --gap-ms between the two, the time a confirmation dialog stays
+open).  It is expected to let double bookings through; the default
+path is not.  Exits with status 1 if any overlap is found.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from troe import db, schema  # noqa: E402
+from troe.dates import day_number  # noqa: E402
+from troe.repository import BookingConflict, BookingRepository  # noqa: E402
+
+# The check the apps used to run before inserting
+IS_FREE_SQL = """
+    SELECT 1 FROM bookings
+    WHERE room_number = ? AND status = 'active'
+    AND check_in_date < ? AND check_out_date > ?
+    LIMIT 1
+"""
+
+OVERLAPS_SQL = """
+    SELECT a.booking_id, b.booking_id, a.room_number
+    FROM bookings a
+    JOIN bookings b ON b.room_number = a.room_number AND b.booking_id > a.booking_id
+    WHERE a.status = 'active' AND b.status = 'active'
+    AND a.check_in_date < b.check_out_date
+    AND b.check_in_date < a.check_out_date
+"""
+
+
+def seed(db_file, rooms, unsafe=False):
+    """Create the database with the given number of rooms."""
+    conn = db.connect(db_file)
+    schema.create_tables(conn)
+    if unsafe:
+        for name in schema.TRIGGERS:
+            conn.execute(f"DROP TRIGGER {name}")
+    conn.executemany(
+        "INSERT INTO rooms VALUES (?, 'Normal', 'AC', 1500, 4, 1, 'available')",
+        [(101 + i,) for i in range(rooms)])
+    conn.commit()
+    conn.close()
+
+
+def unsafe_book(conn, stay, gap):
+    """The old path: overlap check and insert in separate transactions."""
+    person_name, room_number, check_in, check_out = stay
+    if conn.execute(IS_FREE_SQL, (room_number, check_out, check_in)).fetchone():
+        raise BookingConflict("This room is already booked for the selected dates.")
+    time.sleep(gap)
+    conn.execute(BookingRepository.INSERT_SQL,
+                 (person_name, room_number, check_in, check_out, 1, 'No'))
+    conn.commit()
+
+
+def booker(args):
+    """Run one desk's attempts; return (booked, conflicts, busy, seconds)."""
+    db_file, worker, attempts, rooms, days, unsafe, gap, timeout = args
+    rng = random.Random(worker)
+    conn = db.connect(db_file, timeout=timeout)
+    repo = BookingRepository(conn)
+    first = date.today() + timedelta(days=1)
+    booked = conflicts = busy = 0
+    started = time.perf_counter()
+    for i in range(attempts):
+        check_in = first + timedelta(days=rng.randrange(days))
+        check_out = check_in + timedelta(days=rng.randint(1, 4))
+        stay = (f"Desk {worker} Guest {i}", 101 + rng.randrange(rooms),
+                day_number(check_in), day_number(check_out))
+        try:
+            if unsafe:
+                unsafe_book(conn, stay, gap)
+            else:
+                repo.book(stay[0], stay[1], stay[2], stay[3], 1, 'No')
+            booked += 1
+        except BookingConflict:
+            conflicts += 1
+        except sqlite3.OperationalError as e:
+            if not db.is_busy(e):
+                raise
+            if conn.in_transaction:
+                conn.rollback()
+            busy += 1
+    conn.close()
+    return booked, conflicts, busy, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=200, help="bookings tried per worker")
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--days', type=int, default=30, help="check-in window in days")
+    parser.add_argument('--timeout', type=float, default=5.0, help="connection busy timeout (s)")
+    parser.add_argument('--unsafe', action='store_true', help="use the old check-then-insert path")
+    parser.add_argument('--gap-ms', type=float, default=2.0,
+                        help="pause between check and insert with --unsafe")
+    parser.add_argument('--dir', help="directory for the scratch database (default: temporary)")
+    args = parser.parse_args(argv)
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="troe_stress_")
+    os.makedirs(workdir, exist_ok=True)
+    db_file = os.path.join(workdir, "stress.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    try:
+        seed(db_file, args.rooms, args.unsafe)
+        jobs = [(db_file, worker, args.attempts, args.rooms, args.days,
+                 args.unsafe, args.gap_ms / 1000, args.timeout)
+                for worker in range(args.workers)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.workers) as pool:
+            results = pool.map(booker, jobs)
+        elapsed = time.perf_counter() - started
+
+        conn = db.connect(db_file)
+        overlaps = conn.execute(OVERLAPS_SQL).fetchall()
+        active = conn.execute(
+            "SELECT COUNT(*) FROM bookings WHERE status = 'active'").fetchone()[0]
+        conn.close()
+    finally:
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    booked = sum(r[0] for r in results)
+    conflicts = sum(r[1] for r in results)
+    busy = sum(r[2] for r in results)
+    attempts = args.workers * args.attempts
+    print(f"{'unsafe' if args.unsafe else 'trigger-checked'} path, "
+          f"{args.workers} workers x {args.attempts} attempts on {args.rooms} rooms")
+    print(f"  booked {booked}, rejected as conflicts {conflicts}, gave up busy {busy}")
+    print(f"  {attempts / elapsed:.0f} attempts/s, {active} active bookings")
+    if overlaps:
+        print(f"  DOUBLE BOOKINGS: {len(overlaps)} overlapping pairs, e.g. "
+              f"bookings {overlaps[0][0]} and {overlaps[0][1]} in room {overlaps[0][2]}")
+        return 1
+    print("  no overlapping bookings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
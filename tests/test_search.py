@@ -0,0 +1,60 @@
+"""Fuzzy guest search against a realistic number of distinct guest words."""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from troe import db, schema, search  # noqa: E402
+from troe.repository import BookingRepository, RoomRepository  # noqa: E402
+
+
+class FuzzySearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="troe_search_")
+        self.conn = db.connect(os.path.join(self.workdir, "search.db"))
+        schema.create_tables(self.conn)
+        if not search.available(self.conn):
+            self.skipTest("this SQLite has no FTS5")
+        RoomRepository(self.conn).add_sample_rooms()
+
+        # Thousands of guest words, many of them starting with j, so "john"
+        # is one of a crowd sharing the "  j" trigram with "jhon"
+        rng = random.Random(1)
+        vocabulary = set()
+        while len(vocabulary) < 3000:
+            vocabulary.add(rng.choice('jjjjjabcdmst') + "".join(
+                rng.choice('aeiouhnrsl') for _ in range(rng.randint(2, 7))))
+        for word in sorted(vocabulary - {'john', 'jon', 'jason', 'doe'}):
+            search.add_words(self.conn, word)
+        self.conn.commit()
+
+        bookings = BookingRepository(self.conn)
+        rooms = [room[0] for room in RoomRepository(self.conn).all()]
+        for room, name in zip(rooms, ("Jon Doe", "Jason Doe", "John Doe")):
+            bookings.book(name, room, '2030-01-01', '2030-01-03', 1, 'No')
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_swapped_letters_find_the_word(self):
+        self.assertIn('john', search.similar_words(self.conn, 'jhon'))
+
+    def test_misspelt_name_finds_the_guest(self):
+        names = [row[1] for row in BookingRepository(self.conn).search('Jhon')]
+        self.assertIn("John Doe", names)
+        names = [row[1] for row in BookingRepository(self.conn).search('Jhon Deo')]
+        self.assertIn("John Doe", names)
+
+    def test_queries_use_indexes(self):
+        self.assertEqual(schema.check_query_plans(self.conn), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+"""Shared database code for the Troe Hotel front-ends."""
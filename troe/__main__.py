@@ -0,0 +1,7 @@
+"""python -m troe: the command line (troe.cli)."""
+
+import sys
+
+from troe.cli import main
+
+sys.exit(main())
@@ -0,0 +1,225 @@
+"""Archive of closed bookings in a separate database file.
+
+archive() moves completed and cancelled stays that checked out more than
+N months ago (24 by default) out of the bookings table and into the
+archive file next to the database (hotel_management.db ->
+hotel_management_archive.db).  The apps never open the archive, so
+their queries, triggers and backups only deal with the bookings that
+can still change.  Booking IDs are AUTOINCREMENT, so they are never
+reused after a booking has moved.
+
+Old data is read only when asked for: history() ATTACHes the archive for
+the one query and reads both files with UNION ALL.  The nightly figures
+of archived days stay in night_audits; their room_nights rows go with
+the bookings.
+
+Bookings are moved in batches, each its own transaction: copied into
+the archive, then deleted from the database.  Two files in WAL mode do
+not commit as one, so an interrupted move can leave a booking in both.
+The copy replaces, running archive() again finishes the move, and
+history() reads such a booking from the database only.
+
+    python -m troe.archive hotel_management.db [--months N] [--vacuum]
+    python -m troe.archive hotel_management.db --history [NAME]
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from troe import db
+from troe.dates import day_number, iso_sql
+
+ARCHIVE_MONTHS = 24
+BATCH_SIZE = 20000
+
+COLUMNS = ("booking_id, person_name, room_number, check_in_date, check_out_date, "
+           "num_persons, children, status, booking_date")
+
+ARCHIVE_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS archive.bookings (
+        booking_id INTEGER PRIMARY KEY,
+        person_name TEXT NOT NULL,
+        room_number INTEGER NOT NULL,
+        check_in_date INTEGER NOT NULL,
+        check_out_date INTEGER NOT NULL,
+        num_persons INTEGER NOT NULL,
+        children TEXT NOT NULL,
+        status TEXT NOT NULL,
+        booking_date TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS archive.idx_archive_checkin_id
+    ON bookings (check_in_date, booking_id)
+    """,
+)
+
+# Booking IDs of the closed stays that checked out before :cutoff; the
+# check-in bound keeps the search on idx_bookings_status_dates
+RANGE_SQL = """
+    SELECT MIN(booking_id), MAX(booking_id) FROM main.bookings
+    WHERE status IN ('completed', 'cancelled')
+    AND check_in_date < :cutoff
+    AND check_out_date < :cutoff
+"""
+
+# The same stays within one range of booking IDs.  Moving the table a
+# range at a time reads and deletes it in page order, several times
+# faster than picking the rows off an index.
+MOVE_WHERE = """
+    booking_id >= :first AND booking_id < :first + :batch
+    AND status IN ('completed', 'cancelled')
+    AND check_out_date < :cutoff
+"""
+COPY_SQL = f"""
+    INSERT OR REPLACE INTO archive.bookings ({COLUMNS})
+    SELECT {COLUMNS} FROM main.bookings WHERE {MOVE_WHERE}
+"""
+DELETE_SQL = f"DELETE FROM main.bookings WHERE {MOVE_WHERE}"
+
+HISTORY_COLUMNS = (f"booking_id, person_name, room_number, {iso_sql('check_in_date')}, "
+                   f"{iso_sql('check_out_date')}, status")
+
+
+def archive_path(db_file):
+    """The archive file kept next to db_file."""
+    return os.path.splitext(db_file)[0] + "_archive.db"
+
+
+def months_ago(months, today=None):
+    """The date months calendar months before today (day clamped to 28)."""
+    today = today or date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return date(year, month + 1, min(today.day, 28))
+
+
+@contextmanager
+def attached(conn, archive_file):
+    """ATTACH archive_file as 'archive' for the duration of a with block."""
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_file,))
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("DETACH DATABASE archive")
+
+
+def archive(conn, archive_file, months=ARCHIVE_MONTHS, batch_size=BATCH_SIZE):
+    """Move closed stays that checked out over months ago to archive_file; return how many."""
+    cutoff = day_number(months_ago(months))
+    first, last = conn.execute(RANGE_SQL, {'cutoff': cutoff}).fetchone()
+    if first is None:
+        return 0
+
+    def move(conn, params):
+        moved = conn.execute(COPY_SQL, params).rowcount
+        conn.execute(DELETE_SQL, params)
+        return moved
+
+    moved = 0
+    with attached(conn, archive_file):
+        # WAL like the database, so each batch commits without a rollback journal
+        conn.execute("PRAGMA archive.journal_mode = WAL")
+        for sql in ARCHIVE_TABLES:
+            conn.execute(sql)
+        conn.commit()
+        for start in range(first, last + 1, batch_size):
+            params = {'first': start, 'batch': batch_size, 'cutoff': cutoff}
+            moved += db.write_transaction(conn, lambda conn: move(conn, params))
+    return moved
+
+
+def history(conn, archive_file, name=None, first=None, last=None, limit=1000):
+    """Bookings from the database and the archive, newest check-in first.
+
+    Rows are (booking_id, name, room, check-in, check-out, status, source)
+    with source 'live' or 'archive'.  name matches part of the guest name;
+    first and last bound the check-in date.
+    """
+    conditions, params = [], []
+    if name:
+        conditions.append("person_name LIKE ?")
+        params.append(f"%{name}%")
+    if first is not None:
+        conditions.append("check_in_date >= ?")
+        params.append(day_number(first))
+    if last is not None:
+        conditions.append("check_in_date < ?")
+        params.append(day_number(last))
+    where = " AND ".join(conditions) or "1"
+
+    live = f"SELECT {HISTORY_COLUMNS}, 'live', check_in_date AS day FROM main.bookings WHERE {where}"
+    if not os.path.exists(archive_file):
+        sql = f"{live} ORDER BY day DESC, booking_id DESC LIMIT ?"
+        return [row[:-1] for row in conn.execute(sql, params + [limit])]
+
+    old = f"""
+        SELECT {HISTORY_COLUMNS}, 'archive', check_in_date AS day FROM archive.bookings a
+        WHERE {where}
+        AND NOT EXISTS (SELECT 1 FROM main.bookings m WHERE m.booking_id = a.booking_id)
+    """
+    sql = f"{live} UNION ALL {old} ORDER BY day DESC, booking_id DESC LIMIT ?"
+    with attached(conn, archive_file):
+        return [row[:-1] for row in conn.execute(sql, params + params + [limit])]
+
+
+def main(argv=None):
+    """Archive old bookings of a database file, or search its history."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    usage = "usage: python -m troe.archive DB_FILE [--months N] [--vacuum] | --history [NAME]"
+    vacuum = "--vacuum" in argv
+    if vacuum:
+        argv.remove("--vacuum")
+    months = ARCHIVE_MONTHS
+    if "--months" in argv:
+        index = argv.index("--months")
+        try:
+            months = int(argv[index + 1])
+        except (IndexError, ValueError):
+            months = -1
+        if months < 0:
+            print(usage)
+            return 2
+        del argv[index:index + 2]
+    if not argv:
+        print(usage)
+        return 2
+    db_file = argv[0]
+    if not os.path.exists(db_file):
+        print(f"Cannot archive {db_file}: file not found")
+        return 2
+
+    conn = db.connect(db_file)
+    try:
+        if argv[1:2] == ['--history']:
+            rows = history(conn, archive_path(db_file), " ".join(argv[2:]) or None)
+            for booking_id, name, room, check_in, check_out, status, source in rows:
+                print(f"{booking_id:>8}  {name:<30} room {room:<5} {check_in} - {check_out}  "
+                      f"{status:<9} {source}")
+            print(f"{len(rows)} bookings")
+            return 0
+        started = time.perf_counter()
+        moved = archive(conn, archive_path(db_file), months)
+        print(f"Moved {moved} bookings that checked out before "
+              f"{months_ago(months).isoformat()} to {archive_path(db_file)} "
+              f"in {time.perf_counter() - started:.1f}s")
+        if vacuum and moved:
+            conn.execute("VACUUM")
+            print(f"Compacted {db_file}")
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Cannot archive {db_file}: {str(e)}")
+        return 2
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
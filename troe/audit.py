@@ -0,0 +1,164 @@
+"""Night audit: close a business day.
+
+run() marks every active booking whose check-out date has been reached
+as completed, in one UPDATE, and records the day's figures in the
+night_audits table: rooms sold and occupancy for the night, room revenue
+at the rooms' current prices, guests in house and how many stays it
+completed.  Everything happens in one transaction, so the day is either
+closed and recorded or left as it was.
+
+With past stays completed, the active bookings are only the guests in
+house and the ones still to come, so every status = 'active' lookup
+stays small however long the hotel has been running.
+
+Running it again for a day that was already audited completes any
+stragglers, refreshes the figures and adds to the completed count.
+
+    python -m troe.audit hotel_management.db [DAY]
+    python -m troe.audit hotel_management.db --history [N]
+"""
+
+import sqlite3
+import sys
+from datetime import date
+
+from troe import db, search
+from troe.dates import as_date, day_number, iso, iso_sql
+
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS night_audits (
+        audit_date INTEGER PRIMARY KEY,
+        completed INTEGER NOT NULL,
+        rooms_sold INTEGER NOT NULL,
+        rooms_available INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        guests INTEGER NOT NULL,
+        run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Stays that have checked out by :day; check_in_date < check_out_date, so
+# the check-in bound lets idx_bookings_status_dates narrow the search
+COMPLETE_SQL = """
+    UPDATE bookings SET status = 'completed'
+    WHERE status = 'active'
+    AND check_in_date < :day
+    AND check_out_date <= :day
+"""
+
+# Rooms sold, room revenue and guests for the night of :day
+NIGHT_SQL = """
+    SELECT COUNT(DISTINCT n.room_number), COALESCE(SUM(r.price), 0),
+           COALESCE(SUM(b.num_persons), 0)
+    FROM room_nights n
+    JOIN rooms r ON r.room_number = n.room_number
+    JOIN bookings b ON b.booking_id = n.booking_id
+    WHERE n.night = :day
+"""
+
+ROOM_COUNT_SQL = "SELECT COUNT(*) FROM rooms WHERE status != 'maintenance'"
+
+RECORD_SQL = """
+    INSERT INTO night_audits (audit_date, completed, rooms_sold, rooms_available,
+                              revenue, guests)
+    VALUES (:day, :completed, :rooms_sold, :rooms_available, :revenue, :guests)
+    ON CONFLICT (audit_date) DO UPDATE SET
+        completed = completed + excluded.completed,
+        rooms_sold = excluded.rooms_sold,
+        rooms_available = excluded.rooms_available,
+        revenue = excluded.revenue,
+        guests = excluded.guests,
+        run_at = CURRENT_TIMESTAMP
+"""
+
+HISTORY_SQL = f"""
+    SELECT {iso_sql('audit_date')}, completed, rooms_sold, rooms_available,
+           revenue, guests, run_at
+    FROM night_audits
+    ORDER BY audit_date DESC
+    LIMIT ?
+"""
+
+
+def install(conn):
+    """Create the night_audits table; the caller commits."""
+    conn.execute(TABLE_SQL)
+
+
+def run(conn, day=None):
+    """Close the business day (default today); return its figures as a dict."""
+    day = day_number(day if day is not None else date.today())
+
+    def close(conn):
+        completed = conn.execute(COMPLETE_SQL, {'day': day}).rowcount
+        # Names of the completed stays left the guest index; drop their trigrams
+        if search.available(conn):
+            search.sync_words(conn)
+        rooms_sold, revenue, guests = conn.execute(NIGHT_SQL, {'day': day}).fetchone()
+        figures = {
+            'day': day,
+            'completed': completed,
+            'rooms_sold': rooms_sold,
+            'rooms_available': conn.execute(ROOM_COUNT_SQL).fetchone()[0],
+            'revenue': revenue,
+            'guests': guests,
+        }
+        conn.execute(RECORD_SQL, figures)
+        return figures
+
+    return db.write_transaction(conn, close)
+
+
+def history(conn, limit=30):
+    """The latest audits, newest first: (day, completed, sold, available, revenue, guests, run at)."""
+    return conn.execute(HISTORY_SQL, (limit,)).fetchall()
+
+
+def occupancy(figures):
+    """Percentage of bookable rooms sold on the audited night."""
+    if not figures['rooms_available']:
+        return 0.0
+    return 100.0 * figures['rooms_sold'] / figures['rooms_available']
+
+
+def summary(figures):
+    """One line describing an audit's figures."""
+    return (f"Night audit {iso(figures['day'])}: {figures['completed']} stays completed, "
+            f"{figures['rooms_sold']}/{figures['rooms_available']} rooms sold "
+            f"({occupancy(figures):.1f}%), revenue {figures['revenue']:.2f}, "
+            f"{figures['guests']} guests")
+
+
+def main(argv=None):
+    """Run the night audit on a database file, or show past audits."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python -m troe.audit DB_FILE [DAY] | --history [N]")
+        return 2
+
+    from troe import schema
+    conn = db.connect(argv[0])
+    try:
+        schema.create_tables(conn)
+        if argv[1:2] == ['--history']:
+            rows = history(conn, int(argv[2]) if len(argv) > 2 else 30)
+        else:
+            figures = run(conn, as_date(argv[1]) if len(argv) > 1 else None)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Cannot audit {argv[0]}: {str(e)}")
+        return 2
+    finally:
+        conn.close()
+
+    if argv[1:2] != ['--history']:
+        print(summary(figures))
+        return 0
+    for day, completed, sold, rooms, revenue, guests, run_at in rows:
+        percent = 100.0 * sold / rooms if rooms else 0.0
+        print(f"{day}  {completed:>6} completed  {sold:>5}/{rooms} rooms  {percent:5.1f}%  "
+              f"{revenue:>12.2f}  {guests:>5} guests  (run {run_at})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""In-memory availability engine.
+
+Active bookings are loaded once at startup and kept per room as a sorted
+list of merged, non-overlapping stays.  Whether a room is free for
+[check_in, check_out) is then two bisects instead of a NOT IN subquery
+over every active booking.  The bookings table stays the source of
+truth: the booking and cancel paths keep the engine in sync, and the
+SQL query is still available as a verification fallback.  Bookings
+made elsewhere (another desk, the command line, the night audit, the
+booking server) reach it through invalidate(), which the front-ends
+subscribe to ChangeTracker: the next search reloads from the database.
+ChangeTracker also sees the desk's own commits, so the engine keeps the
+bookings change counter it is in step with, and the search only reloads
+if the counter has moved past it.
+
+The front-ends create it without a connection and load it on their
+DatabaseWorker, so it lives on the worker's connection - a database
+connection, or the booking server's client.RemoteConnection - and every
+search, booking and cancellation that uses it runs on the worker thread.
+
+When an OccupancyBitmap is attached, searches are answered from the
+nightly bitsets and the interval lists are used to recompute a room's
+bits after a cancellation.
+
+Stays are kept as the day numbers the database stores (troe.dates);
+dates passed in are converted first, so callers may hand over date
+objects or text.
+"""
+
+from bisect import bisect_right
+
+from troe import changes
+from troe.dates import day_number
+
+# Rooms with an active stay overlapping [check_in, check_out)
+BUSY_ROOMS_SQL = """
+    SELECT DISTINCT room_number
+    FROM bookings
+    WHERE status = 'active'
+    AND check_in_date < ? AND check_out_date > ?
+"""
+
+
+def free_matching(conn, check_in, check_out, room_type=None, ac_type=None, persons=1,
+                  max_price=None):
+    """Bookable rooms matching the filters that are free for the stay, cheapest first.
+
+    Rows are the RoomRepository.all() columns.  Answered from the bookings
+    table, so it needs no loaded engine and is safe on any connection.
+    """
+    from troe.repository import RoomRepository
+    check_in, check_out = day_number(check_in), day_number(check_out)
+    if check_out <= check_in:
+        raise ValueError("Check-out date must be after check-in date")
+    candidates = [
+        room for room in RoomRepository(conn).all()
+        if room[6] != 'maintenance'
+        and (room_type is None or room[1] == room_type)
+        and (ac_type is None or room[2] == ac_type)
+        and (max_price is None or room[3] <= max_price)
+        and room[4] >= persons]
+    free = set(AvailabilityEngine(conn).free_rooms(
+        [room[0] for room in candidates], check_in, check_out))
+    return sorted((room for room in candidates if room[0] in free), key=lambda r: (r[3], r[0]))
+
+
+class AvailabilityEngine:
+    """Per-room interval lists of active bookings."""
+
+    def __init__(self, conn, occupancy=None, verify=False):
+        self.conn = conn
+        self.occupancy = occupancy
+        self.verify = verify
+        self.loaded = False
+        self.stale = False
+        self.version = None  # bookings change counter the engine is in step with
+        self.bookings = {}   # booking_id -> (room_number, check_in, check_out)
+        self._stays = {}     # room_number -> {booking_id: (check_in, check_out)}
+        self._starts = {}    # room_number -> merged stay starts (sorted)
+        self._ends = {}      # room_number -> merged stay ends (sorted)
+
+    def load(self, conn=None):
+        """(Re)load every active booking from the database.
+
+        conn, if given, becomes the engine's connection from now on.
+        """
+        if conn is not None:
+            self.conn = conn
+        self.bookings.clear()
+        self._stays.clear()
+        self._starts.clear()
+        self._ends.clear()
+
+        # Read first: a booking committed in between only means a reload too many
+        self.version = changes.version(self.conn, 'bookings')
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT booking_id, room_number, check_in_date, check_out_date
+            FROM bookings
+            WHERE status = 'active'
+        """)
+        for booking_id, room_number, check_in, check_out in cursor:
+            self.bookings[booking_id] = (room_number, check_in, check_out)
+            self._stays.setdefault(room_number, {})[booking_id] = (check_in, check_out)
+
+        for room_number in self._stays:
+            self._merge(room_number)
+        self.loaded = True
+        self.stale = False
+
+        if self.occupancy is not None:
+            self.occupancy.load_or_rebuild(self.conn)
+
+    def invalidate(self):
+        """Note that bookings may have changed; the next search checks and reloads."""
+        self.stale = True
+
+    def refresh(self):
+        """Reload unless the only changes since the last load were this engine's own."""
+        self.stale = False
+        if self.version is None or changes.version(self.conn, 'bookings') != self.version:
+            self.load()
+
+    def save(self):
+        """Persist the occupancy snapshot, if one is attached."""
+        if self.occupancy is not None and self.occupancy.loaded:
+            self.occupancy.save_snapshot(self.conn)
+
+    def add_booking(self, booking_id, room_number, check_in, check_out, versions=None):
+        """Record a new active booking.
+
+        versions is the bookings change counter (before, after) the
+        booking's own transaction, which keeps the engine in step.
+        """
+        check_in, check_out = day_number(check_in), day_number(check_out)
+        if booking_id in self.bookings:
+            self.remove_booking(booking_id)
+        self.bookings[booking_id] = (room_number, check_in, check_out)
+        self._stays.setdefault(room_number, {})[booking_id] = (check_in, check_out)
+        self._merge(room_number)
+        if self.occupancy is not None:
+            self.occupancy.set_room(room_number, self._stays[room_number].values())
+        self._advance(versions)
+
+    def remove_booking(self, booking_id, versions=None):
+        """Forget a booking that was cancelled or completed; versions as for add_booking()."""
+        self._advance(versions)
+        booking = self.bookings.pop(booking_id, None)
+        if booking is None:
+            return
+        room_number = booking[0]
+        stays = self._stays.get(room_number, {})
+        stays.pop(booking_id, None)
+        if stays:
+            self._merge(room_number)
+        else:
+            self._stays.pop(room_number, None)
+            self._starts.pop(room_number, None)
+            self._ends.pop(room_number, None)
+        if self.occupancy is not None:
+            self.occupancy.set_room(room_number, stays.values())
+
+    def is_free(self, room_number, check_in, check_out):
+        """Return True if the room has no active stay in [check_in, check_out)."""
+        check_in, check_out = day_number(check_in), day_number(check_out)
+        ends = self._ends.get(room_number)
+        if not ends:
+            return True
+        # First merged stay that ends after check_in; it overlaps if it
+        # starts before check_out
+        i = bisect_right(ends, check_in)
+        return i == len(ends) or self._starts[room_number][i] >= check_out
+
+    def free_rooms(self, room_numbers, check_in, check_out, verify=None):
+        """Return the rooms from room_numbers that are free for the dates."""
+        check_in, check_out = day_number(check_in), day_number(check_out)
+        if not self.loaded:
+            return self.free_rooms_sql(room_numbers, check_in, check_out)
+        if self.stale:
+            self.refresh()
+
+        if self.occupancy is not None and self.occupancy.loaded:
+            free = self.occupancy.free_rooms(room_numbers, check_in, check_out)
+        else:
+            free = [room for room in room_numbers
+                    if self.is_free(room, check_in, check_out)]
+
+        if self.verify if verify is None else verify:
+            expected = self.free_rooms_sql(room_numbers, check_in, check_out)
+            if expected != free:
+                print("Availability engine out of sync with bookings, reloading")
+                self.load()
+                return expected
+        return free
+
+    def filter_free(self, rooms, check_in, check_out):
+        """The rows of rooms, room number first, that are free for the dates."""
+        free = set(self.free_rooms([room[0] for room in rooms], check_in, check_out))
+        return [room for room in rooms if room[0] in free]
+
+    def free_rooms_sql(self, room_numbers, check_in, check_out):
+        """Answer the same question straight from the bookings table."""
+        cursor = self.conn.cursor()
+        cursor.execute(BUSY_ROOMS_SQL, (day_number(check_out), day_number(check_in)))
+        busy = {row[0] for row in cursor}
+        return [room for room in room_numbers if room not in busy]
+
+    def _advance(self, versions):
+        """Step over the engine's own change, if nothing else changed bookings first."""
+        if versions is not None and versions[0] == self.version:
+            self.version = versions[1]
+
+    def _merge(self, room_number):
+        """Rebuild the merged stay lists for one room."""
+        starts, ends = [], []
+        for check_in, check_out in sorted(self._stays[room_number].values()):
+            if ends and check_in <= ends[-1]:
+                ends[-1] = max(ends[-1], check_out)
+            else:
+                starts.append(check_in)
+                ends.append(check_out)
+        self._starts[room_number] = starts
+        self._ends[room_number] = ends
@@ -0,0 +1,194 @@
+"""Online backups of the hotel database.
+
+Backups are taken with the SQLite backup API a few pages at a time, so
+the apps can keep reading and writing while a copy is made and the file
+is never loaded into memory in one piece.  start() runs the backup on a
+background thread; startup does not wait for it.  Each copy is written
+under a temporary name and renamed when complete, then old backups are
+rotated out by count and age.  Backups that older versions of the apps
+left next to the database (backup_YYYYmmdd_HHMMSS.db) are first moved
+into the backup directory, so they are rotated out like the rest.
+
+    python -m troe.backup [db_file] [--gzip] [--keep N]
+"""
+
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from troe import db
+
+BACKUP_PREFIX = "backup_"
+
+# What TROE1 used to write into the working directory on every start
+LEGACY_NAME = re.compile(r"backup_\d{8}_\d{6}(_\d+)?\.db$")
+
+
+class BackupManager:
+    """Take, compress and rotate backups of one database file."""
+
+    def __init__(self, db_file, backup_dir="backups", keep=10, max_age_days=None,
+                 compress=False, pages=256, sleep=0.005):
+        self.db_file = db_file
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.max_age_days = max_age_days
+        self.compress = compress
+        self.pages = pages
+        self.sleep = sleep
+        self.thread = None
+
+    def start(self):
+        """Run a backup on a background thread and return immediately."""
+        self.thread = threading.Thread(target=self._run_quietly, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def wait(self, timeout=None):
+        """Wait for a backup started with start() to finish."""
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _run_quietly(self):
+        try:
+            self.run()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: Could not create backup: {str(e)}")
+
+    def run(self):
+        """Back up, compress and rotate; return the new backup's path."""
+        if not os.path.exists(self.db_file):
+            return None
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+        backup_file = self._new_name()
+        part_file = backup_file + ".part"
+        started = time.perf_counter()
+
+        source = db.connect(self.db_file)
+        try:
+            target = sqlite3.connect(part_file)
+            try:
+                # Copy in page steps; other connections may write in between
+                source.backup(target, pages=self.pages, sleep=self.sleep)
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        if self.compress:
+            with open(part_file, 'rb') as src, gzip.open(part_file + ".gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(part_file)
+            part_file += ".gz"
+            backup_file += ".gz"
+        os.replace(part_file, backup_file)
+
+        print(f"Database backup created: {backup_file} "
+              f"({time.perf_counter() - started:.2f}s)")
+        self.rotate()
+        return backup_file
+
+    def _new_name(self):
+        """backup_YYYYmmdd_HHMMSS.db, with a counter if that name is taken."""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{stamp}.db")
+        counter = 1
+        while os.path.exists(name) or os.path.exists(name + ".gz"):
+            name = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{stamp}_{counter}.db")
+            counter += 1
+        return name
+
+    def backups(self):
+        """Finished backups, oldest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [name for name in os.listdir(self.backup_dir)
+                 if name.startswith(BACKUP_PREFIX)
+                 and (name.endswith(".db") or name.endswith(".db.gz"))]
+        paths = [os.path.join(self.backup_dir, name) for name in names]
+        return sorted(paths, key=os.path.getmtime)
+
+    def adopt_legacy(self):
+        """Move old-style backups next to the database into backup_dir; return their new paths."""
+        legacy_dir = os.path.dirname(os.path.abspath(self.db_file))
+        if not os.path.isdir(self.backup_dir) or os.path.samefile(legacy_dir, self.backup_dir):
+            return []
+        moved = []
+        for name in os.listdir(legacy_dir):
+            target = os.path.join(self.backup_dir, name)
+            if not LEGACY_NAME.match(name) or os.path.exists(target):
+                continue
+            try:
+                # A move keeps the modification time the rotation sorts by
+                shutil.move(os.path.join(legacy_dir, name), target)
+                moved.append(target)
+            except OSError as e:
+                print(f"Warning: Could not move old backup {name}: {str(e)}")
+        if moved:
+            print(f"Moved {len(moved)} old backups into {self.backup_dir}")
+        return moved
+
+    def rotate(self):
+        """Delete backups beyond the retention policy; return the deleted paths."""
+        self.adopt_legacy()
+        backups = self.backups()
+        expired = []
+        if self.keep is not None and len(backups) > self.keep:
+            expired = backups[:len(backups) - self.keep]
+            backups = backups[len(backups) - self.keep:]
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            # Never delete the newest backup, however old it is
+            expired += [path for path in backups[:-1] if os.path.getmtime(path) < cutoff]
+
+        # Leftovers from a backup that was interrupted (not one still running)
+        for name in os.listdir(self.backup_dir):
+            path = os.path.join(self.backup_dir, name)
+            if (name.startswith(BACKUP_PREFIX) and ".part" in name
+                    and os.path.getmtime(path) < time.time() - 3600):
+                expired.append(path)
+
+        for path in expired:
+            try:
+                os.remove(path)
+                print(f"Removed old backup: {path}")
+            except OSError as e:
+                print(f"Warning: Could not remove backup {path}: {str(e)}")
+        return expired
+
+
+def main(argv=None):
+    """Take one backup in the foreground."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    compress = "--gzip" in argv
+    if compress:
+        argv.remove("--gzip")
+    keep = 10
+    if "--keep" in argv:
+        index = argv.index("--keep")
+        try:
+            keep = int(argv[index + 1])
+        except (IndexError, ValueError):
+            keep = 0
+        if keep < 1:
+            print("usage: python -m troe.backup [db_file] [--gzip] [--keep N]")
+            return 2
+        del argv[index:index + 2]
+    db_file = argv[0] if argv else "hotel_management.db"
+
+    if not os.path.exists(db_file):
+        print(f"Cannot back up {db_file}: file not found")
+        return 2
+    BackupManager(db_file, keep=keep, compress=compress).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
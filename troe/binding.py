@@ -0,0 +1,94 @@
+"""Keep a ttk.Treeview in step with query results by primary key.
+
+Refreshing a list by deleting every item and inserting the new rows
+costs two Tk calls per row and loses the selection and scroll position.
+TableBinding remembers what each item currently shows and, given a new
+result set, only inserts new keys, deletes missing ones, updates rows
+whose values changed and moves rows whose position changed.
+
+    binding = TableBinding(tree, key=lambda row: row[0])
+    binding.update(cursor.fetchall())
+"""
+
+
+class TableBinding:
+    """Apply query results to a Treeview as a minimal diff."""
+
+    def __init__(self, tree, key=None, format_row=None):
+        self.tree = tree
+        self.key = key or (lambda row: row[0])
+        self.format_row = format_row or (lambda row: (row, ()))
+        # iid -> (values, tags) as last written to the tree
+        self.shown = {}
+
+    def _item(self, row):
+        values, tags = self.format_row(row)
+        return str(self.key(row)), (tuple(values), tuple(tags))
+
+    def update(self, rows):
+        """Make the tree show rows, in order; return (inserted, updated, deleted, moved)."""
+        selection = self.tree.selection()
+        top = self.tree.yview()[0]
+
+        # First row wins if a query returns the same key twice
+        wanted = []
+        wanted_iids = set()
+        for row in rows:
+            iid, item = self._item(row)
+            if iid not in wanted_iids:
+                wanted.append((iid, item))
+                wanted_iids.add(iid)
+
+        # Items left over from earlier refreshes or inserted by other code
+        stale = [iid for iid in self.tree.get_children() if iid not in wanted_iids]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                self.shown.pop(iid, None)
+
+        order = list(self.tree.get_children())
+        present = set(order)
+        inserted = updated = moved = 0
+        for index, (iid, item) in enumerate(wanted):
+            if iid not in present:
+                self.tree.insert("", index, iid=iid, values=item[0], tags=item[1])
+                order.insert(index, iid)
+                present.add(iid)
+                inserted += 1
+            else:
+                if self.shown.get(iid) != item:
+                    self.tree.item(iid, values=item[0], tags=item[1])
+                    updated += 1
+                if order[index] != iid:
+                    self.tree.move(iid, "", index)
+                    order.remove(iid)
+                    order.insert(index, iid)
+                    moved += 1
+            self.shown[iid] = item
+
+        # Keep the user's place in the list
+        kept = [iid for iid in selection if iid in wanted_iids]
+        if kept:
+            self.tree.selection_set(kept)
+        self.tree.yview_moveto(top)
+        return inserted, updated, len(stale), moved
+
+    def insert(self, row, index="end"):
+        """Add one row without diffing; skips keys already shown."""
+        iid, item = self._item(row)
+        if self.tree.exists(iid):
+            return None
+        self.tree.insert("", index, iid=iid, values=item[0], tags=item[1])
+        self.shown[iid] = item
+        return iid
+
+    def delete(self, *iids):
+        """Remove rows by item id."""
+        if iids:
+            self.tree.delete(*iids)
+        for iid in iids:
+            self.shown.pop(iid, None)
+
+    def clear(self):
+        """Remove every row."""
+        self.delete(*self.tree.get_children())
@@ -0,0 +1,184 @@
+"""Change notifications for open views.
+
+install() adds a change_counters table and triggers that bump a counter
+for every row inserted, updated or deleted in a tracked table.
+ChangeTracker keeps its own connection and polls PRAGMA data_version
+from the Tk event loop.  data_version only moves when another
+connection - the app's main connection, the background worker or a
+different program - has committed, so an idle database costs one
+PRAGMA per poll.  When it moves, the counters say which tables changed
+and only the views subscribed to those tables are called back.
+
+    tracker = ChangeTracker(db_file, root)
+    tracker.subscribe(('bookings',), load_bookings, widget=tree)
+    tracker.start()
+
+Given a worker (a DatabaseWorker) instead, the tracker reads the
+counters on the worker's thread after every interval.  That is how a
+desk using the booking server (troe.desk) follows it without a request
+on the Tk thread; there is no data_version to check first.
+"""
+
+from troe import db
+
+TRACKED_TABLES = ('rooms', 'bookings')
+
+
+def install(conn, tables=TRACKED_TABLES):
+    """Create the counters table and the triggers that maintain it; the caller commits."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_counters (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in tables:
+        cursor.execute("INSERT OR IGNORE INTO change_counters (table_name) VALUES (?)",
+                       (table,))
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_changes
+                AFTER {operation} ON {table}
+                BEGIN
+                    UPDATE change_counters SET version = version + 1
+                    WHERE table_name = '{table}';
+                END
+            """)
+
+
+def read_versions(conn):
+    """{table: version} from the change counters."""
+    return dict(conn.execute("SELECT table_name, version FROM change_counters"))
+
+
+def version(conn, table):
+    """The change counter of one tracked table."""
+    return conn.execute("SELECT version FROM change_counters WHERE table_name = ?",
+                        (table,)).fetchone()[0]
+
+
+class ChangeTracker:
+    """Poll for committed changes and call the views that depend on them."""
+
+    def __init__(self, db_file, root, interval_ms=500, worker=None):
+        self.db_file = db_file
+        self.root = root
+        self.interval_ms = interval_ms
+        self.worker = worker
+        self.running = False
+        self.conn = None
+        self.data_version = None
+        self.versions = {}
+        # token -> (tables, callback, widget)
+        self.subscriptions = {}
+        self._next_token = 0
+        self._after_id = None
+
+    def start(self):
+        """Open the tracker's connection and start polling."""
+        self.running = True
+        if self.worker is not None:
+            # Polling starts once the first counters are in
+            self.worker.start()
+            self.worker.submit(read_versions, self._polled, self._poll_failed)
+            return
+        self.conn = db.connect(self.db_file)
+        self.data_version = self._data_version()
+        self.versions = self._versions()
+        self._schedule()
+
+    def stop(self):
+        """Stop polling and close the connection."""
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+        if self.worker is not None:
+            self.worker.stop()
+
+    def subscribe(self, tables, callback, widget=None):
+        """Call callback() after commits that change any of tables.
+
+        If widget is given the subscription ends when it is destroyed.
+        """
+        self._next_token += 1
+        self.subscriptions[self._next_token] = (tuple(tables), callback, widget)
+        return self._next_token
+
+    def unsubscribe(self, token):
+        self.subscriptions.pop(token, None)
+
+    def poll(self):
+        """Check for changes now; return the set of tables that changed.
+
+        With a worker the answer comes later: the views are called back
+        then and the set returned now is empty.
+        """
+        if self.worker is not None:
+            if self.running:
+                self.worker.submit(read_versions, self._compare, self._poll_failed)
+            return set()
+        if self.conn is None:
+            return set()
+        data_version = self._data_version()
+        if data_version == self.data_version:
+            return set()
+        self.data_version = data_version
+        return self._compare(self._versions())
+
+    def _compare(self, versions):
+        """Call back the views of the tables whose counters moved; return those tables."""
+        changed = {table for table, version in versions.items()
+                   if self.versions.get(table) != version}
+        self.versions = versions
+        if changed:
+            self._notify(changed)
+        return changed
+
+    def _notify(self, changed):
+        for token, (tables, callback, widget) in list(self.subscriptions.items()):
+            if widget is not None and not widget.winfo_exists():
+                del self.subscriptions[token]
+                continue
+            if changed.intersection(tables):
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Error refreshing view after change: {str(e)}")
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _versions(self):
+        return read_versions(self.conn)
+
+    def _schedule(self):
+        if self.running:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _polled(self, versions):
+        """Worker callback: note the changes, then wait for the next poll."""
+        if self.versions:
+            self._compare(versions)
+        else:
+            self.versions = versions
+        self._schedule()
+
+    def _poll_failed(self, error):
+        print(f"Change tracker error: {str(error)}")
+        self._schedule()
+
+    def _tick(self):
+        if self.worker is not None:
+            # The next poll is scheduled once this one has been answered
+            self.worker.submit(read_versions, self._polled, self._poll_failed)
+            return
+        try:
+            self.poll()
+        except Exception as e:
+            print(f"Change tracker error: {str(e)}")
+        self._schedule()
@@ -0,0 +1,162 @@
+"""Command line for the hotel database, without the GUI.
+
+Runs the same repositories as the three front-ends, so a booking made
+from a cron job or a script follows the same rules, but never imports
+tkinter or tkcalendar and needs no display.  Each command imports only
+the modules it uses, so starting up stays quick.
+
+    python -m troe rooms [--on DATE]
+    python -m troe available CHECK_IN CHECK_OUT [--type T] [--ac AC] [--persons N] [--max-price P]
+    python -m troe book NAME ROOM CHECK_IN CHECK_OUT [--persons N] [--children Yes|No]
+    python -m troe cancel BOOKING_ID
+
+These hand the rest of the line to the module that does the work:
+
+    python -m troe import rooms.csv            # troe.importer
+    python -m troe export bookings.csv.gz      # troe.exporter
+    python -m troe backup --gzip               # troe.backup
+    python -m troe occupancy 2025-06-01 7      # troe.nights
+    python -m troe search "jo sm"              # troe.search
+    python -m troe audit                       # troe.audit: close today
+    python -m troe archive --months 24         # troe.archive: move old stays out
+    python -m troe check                       # troe.schema: upgrade, check query plans
+    python -m troe serve --port 8765           # troe.server: JSON API for the desks
+
+--db FILE before the command picks the database (default: the apps').
+"""
+
+import argparse
+import importlib
+import sys
+
+DEFAULT_DB = "hotel_management.db"
+
+# Commands answered by another module's main(DB_FILE, ...)
+DELEGATED = {
+    'import': 'troe.importer',
+    'export': 'troe.exporter',
+    'backup': 'troe.backup',
+    'occupancy': 'troe.nights',
+    'search': 'troe.search',
+    'audit': 'troe.audit',
+    'archive': 'troe.archive',
+    'check': 'troe.schema',
+    'serve': 'troe.server',
+}
+
+
+def open_db(db_file):
+    """Connect and bring the schema up to date, as the apps do on startup."""
+    from troe import db, schema
+    conn = db.connect(db_file)
+    schema.create_tables(conn)
+    return conn
+
+
+def rooms(conn, args):
+    """List every room with its status on one night."""
+    from datetime import date
+    from troe.dates import as_date
+    from troe.repository import RoomRepository
+    repo = RoomRepository(conn)
+    status = repo.status_on(as_date(args.on) if args.on else date.today())
+    for number, room_type, ac_type, price, capacity, wifi, _ in repo.all():
+        print(f"{number:>6}  {room_type:<8} {ac_type:<7} {price:>9.2f}  "
+              f"{capacity} persons  {'WiFi' if wifi else '    '}  {status[number]}")
+    return 0
+
+
+def available(conn, args):
+    """List the rooms free for a stay, cheapest first."""
+    from troe.availability import free_matching
+    rows = free_matching(conn, args.check_in, args.check_out, args.type, args.ac,
+                         args.persons, args.max_price)
+    for number, room_type, ac_type, price, capacity, wifi, _ in rows:
+        print(f"{number:>6}  {room_type:<8} {ac_type:<7} {price:>9.2f}  "
+              f"{capacity} persons  {'WiFi' if wifi else ''}")
+    print(f"{len(rows)} rooms free", file=sys.stderr)
+    return 0 if rows else 1
+
+
+def book(conn, args):
+    """Book a room and print the booking ID."""
+    from troe.repository import BookingRepository
+    booking_id = BookingRepository(conn).book(
+        args.name, args.room, args.check_in, args.check_out, args.persons, args.children)
+    print(booking_id)
+    return 0
+
+
+def cancel(conn, args):
+    """Cancel an active booking."""
+    from troe.repository import BookingRepository
+    if not BookingRepository(conn).cancel(args.booking_id):
+        print(f"Booking {args.booking_id} is not active", file=sys.stderr)
+        return 1
+    print(f"Cancelled booking {args.booking_id}", file=sys.stderr)
+    return 0
+
+
+def parser():
+    """Argument parser for the commands run here."""
+    top = argparse.ArgumentParser(
+        prog="python -m troe", description=__doc__.splitlines()[0],
+        epilog=f"Also: {', '.join(DELEGATED)} (see python -m troe COMMAND --help)")
+    top.add_argument('--db', default=DEFAULT_DB, help=f"database file (default: {DEFAULT_DB})")
+    commands = top.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('rooms', help="list rooms and their status")
+    p.add_argument('--on', help="night to show the status for (default: today)")
+    p.set_defaults(run=rooms)
+
+    p = commands.add_parser('available', help="rooms free for a stay")
+    p.add_argument('check_in')
+    p.add_argument('check_out')
+    p.add_argument('--type', help="room type, e.g. Deluxe")
+    p.add_argument('--ac', help="AC or Non-AC")
+    p.add_argument('--persons', type=int, default=1)
+    p.add_argument('--max-price', type=float)
+    p.set_defaults(run=available)
+
+    p = commands.add_parser('book', help="book a room")
+    p.add_argument('name')
+    p.add_argument('room', type=int)
+    p.add_argument('check_in')
+    p.add_argument('check_out')
+    p.add_argument('--persons', type=int, default=1)
+    p.add_argument('--children', default='No', choices=('Yes', 'No'))
+    p.set_defaults(run=book)
+
+    p = commands.add_parser('cancel', help="cancel a booking")
+    p.add_argument('booking_id', type=int)
+    p.set_defaults(run=cancel)
+    return top
+
+
+def main(argv=None):
+    """Run one command; return its exit status."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    db_file = DEFAULT_DB
+    if argv[:1] == ['--db'] and len(argv) > 1:
+        db_file = argv[1]
+        argv = argv[2:]
+    if argv and argv[0] in DELEGATED:
+        return importlib.import_module(DELEGATED[argv[0]]).main([db_file] + argv[1:])
+
+    args = parser().parse_args(['--db', db_file] + argv)
+    import sqlite3
+    try:
+        conn = open_db(args.db)
+    except sqlite3.Error as e:
+        print(f"Cannot open {args.db}: {str(e)}", file=sys.stderr)
+        return 2
+    try:
+        return args.run(conn, args)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    except sqlite3.Error as e:
+        print(f"Database error: {str(e)}", file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
@@ -0,0 +1,306 @@
+"""Client for the booking server (troe.server).
+
+ServerClient speaks the server's JSON API over one kept-alive HTTP
+connection; use one per thread.  The rest is what the front-ends use in
+place of the database file when TROE_SERVER is set (see troe.desk):
+
+    TROE_SERVER=http://127.0.0.1:8765 python "TROE1(Tabbed ).py"
+
+- RemoteConnection stands in for a sqlite3 connection on the desk's
+  DatabaseWorker: each SELECT is sent to the server and answered by one
+  of its readers, so the repositories' reads, PagedTreeview and the
+  availability engine work on it unchanged.  It cannot write.
+- RemoteBookings, RemoteRooms and RemoteEmployees make the writes of
+  BookingRepository, RoomRepository and EmployeeRepository through the
+  server's endpoints.
+
+Failures come back as the exceptions the repositories raise, so the
+apps' error handling needs no changes: BookingConflict for a room that
+is taken, ValueError for bad input, sqlite3.IntegrityError for a user
+name that is taken and ServerError, a sqlite3.Error, when the server
+cannot be reached or fails.
+"""
+
+import http.client
+import json
+import os
+import select
+import sqlite3
+from itertools import islice
+from urllib.parse import quote, urlencode, urlsplit
+
+from troe.dates import iso
+from troe.repository import BookingConflict
+
+SERVER_ENV = "TROE_SERVER"
+DEFAULT_URL = "http://127.0.0.1:8765"
+# Sent again after a failure: they change nothing, so arriving twice is harmless
+IDEMPOTENT = ('GET', 'HEAD')
+
+
+class ServerError(sqlite3.OperationalError):
+    """The booking server could not be reached or could not answer."""
+
+
+class ServerClient:
+    """Requests to one booking server."""
+
+    def __init__(self, url=DEFAULT_URL, timeout=10.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.http = None
+        self.used = False
+
+    def close(self):
+        if self.http is not None:
+            self.http.close()
+            self.http = None
+
+    def dropped(self):
+        """Whether the server has closed the idle kept-alive connection."""
+        sock = self.http.sock
+        return sock is not None and bool(select.select([sock], [], [], 0)[0])
+
+    def request(self, method, path, params=None, body=None):
+        """Send one request and return the JSON reply, raising on an error status.
+
+        A GET is retried once on a new connection if a kept-alive one fails;
+        a booking or cancellation never is, as it may have reached the server.
+        """
+        if params:
+            path += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        payload = None if body is None else json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in range(2):
+            if self.http is not None and method not in IDEMPOTENT and self.dropped():
+                # The server restarted or timed the connection out: reconnect
+                # now rather than find out by sending the booking
+                self.close()
+            if self.http is None:
+                self.http = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self.used = False
+            try:
+                self.http.request(method, path, payload, headers)
+                response = self.http.getresponse()
+                status, data = response.status, response.read()
+                self.used = True
+                break
+            except (OSError, http.client.HTTPException) as e:
+                reused = self.used
+                self.close()
+                # A kept-alive connection the server has since dropped (say it
+                # was restarted) fails on its next use; try once more on a new one
+                if attempt or not reused or method not in IDEMPOTENT:
+                    raise ServerError(f"Booking server at {self.host}:{self.port} "
+                                      f"is not reachable: {str(e)}") from None
+
+        try:
+            reply = json.loads(data)
+        except ValueError:
+            raise ServerError(f"Booking server sent a reply that is not JSON ({status})") from None
+        if status < 400:
+            return reply
+        message = reply.get('error', f"HTTP {status}") if isinstance(reply, dict) else str(reply)
+        if status == 409:
+            raise BookingConflict(message)
+        if status < 500:
+            raise ValueError(message)
+        raise ServerError(message)
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def rooms(self, on=None):
+        """Every room with its status on the night of on (default today)."""
+        return self.request('GET', '/rooms', {'on': iso(on) if on else None})
+
+    def available(self, check_in, check_out, room_type=None, ac_type=None, persons=1,
+                  max_price=None):
+        """Bookable rooms free for the stay, cheapest first."""
+        return self.request('GET', '/available', {
+            'check_in': iso(check_in), 'check_out': iso(check_out), 'type': room_type,
+            'ac': ac_type, 'persons': persons, 'max_price': max_price})
+
+    def bookings(self, name=None):
+        """Active bookings, or those whose guest name matches name."""
+        return self.request('GET', '/bookings', {'q': name or None})
+
+    def book(self, person_name, room_number, check_in, check_out, num_persons=1, children='No'):
+        """Book a room; return the booking ID."""
+        reply = self.request('POST', '/bookings', body={
+            'name': person_name, 'room': room_number, 'check_in': iso(check_in),
+            'check_out': iso(check_out), 'persons': num_persons, 'children': children})
+        return reply['booking_id']
+
+    def cancel(self, booking_id):
+        """Cancel an active booking; return False if it was not active."""
+        try:
+            self.request('DELETE', f"/bookings/{quote(str(booking_id))}")
+        except BookingConflict:
+            return False
+        return True
+
+    def query(self, sql, params=()):
+        """Run one SELECT on the server; return (column names, rows)."""
+        if not isinstance(params, dict):
+            params = list(params)
+        reply = self.request('POST', '/query', body={'sql': sql, 'params': params})
+        return reply['columns'], [tuple(row) for row in reply['rows']]
+
+    def add_room(self, room_number, room_type, ac_type, price, capacity, wifi,
+                 status='available'):
+        self.request('POST', '/rooms', body={
+            'room_number': room_number, 'room_type': room_type, 'ac_type': ac_type,
+            'price': price, 'capacity': capacity, 'wifi': bool(wifi), 'status': status})
+
+    def add_sample_rooms(self):
+        """Add the sample rooms if there are no rooms yet; return how many were added."""
+        return self.request('POST', '/rooms/samples')['added']
+
+    def import_rooms(self, path):
+        """Send a CSV or JSON Lines room file to be imported; return (imported, rejected)."""
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            text = f.read()
+        reply = self.request('POST', '/rooms/import',
+                             body={'name': os.path.basename(path), 'text': text})
+        return reply['imported'], [tuple(row) for row in reply['rejected']]
+
+    def night_audit(self, day=None):
+        """Close the business day (default today); return its figures."""
+        return self.request('POST', '/audit', body={'day': iso(day) if day else None})
+
+    def history(self, name=None):
+        """Bookings from the database and its archive, newest check-in first."""
+        return [tuple(row) for row in self.request('GET', '/history', {'q': name or None})]
+
+    def login(self, username, password):
+        """True if the password is right for username."""
+        return self.request('POST', '/login',
+                            body={'username': username, 'password': password})['valid']
+
+    def add_employee(self, username, password):
+        try:
+            self.request('POST', '/employees',
+                         body={'username': username, 'password': password})
+        except BookingConflict as e:
+            # 409 here means the name is taken, which EmployeeRepository reports so
+            raise sqlite3.IntegrityError(str(e)) from None
+
+
+class RemoteCursor:
+    """The rows of one query, fetched from the server in full."""
+
+    rowcount = -1
+    lastrowid = None
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.rows = iter(())
+
+    def execute(self, sql, params=()):
+        columns, rows = self.conn.client.query(sql, params)
+        self.description = tuple((name,) + (None,) * 6 for name in columns)
+        self.rows = iter(rows)
+        return self
+
+    def fetchone(self):
+        return next(self.rows, None)
+
+    def fetchmany(self, size=1):
+        return list(islice(self.rows, size))
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return self.rows
+
+
+class RemoteConnection:
+    """A read-only stand-in for a sqlite3 connection, answered by the booking server.
+
+    Every execute() is one request, and there is no transaction to commit
+    or roll back.  client is the ServerClient for the server's other
+    endpoints.
+    """
+
+    in_transaction = False
+
+    def __init__(self, url=DEFAULT_URL):
+        self.client = ServerClient(url)
+
+    def execute(self, sql, params=()):
+        return RemoteCursor(self).execute(sql, params)
+
+    def cursor(self):
+        return RemoteCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.client.close()
+
+
+class RemoteBookings:
+    """BookingRepository's book() and cancel(), made by the booking server.
+
+    If an AvailabilityEngine is given it is kept up to date after each
+    booking or cancellation, as BookingRepository does.
+    """
+
+    def __init__(self, api, availability=None):
+        self.client = api
+        self.availability = availability
+
+    def book(self, person_name, room_number, check_in, check_out, num_persons, children):
+        booking_id = self.client.book(person_name, room_number, check_in, check_out,
+                                      num_persons, children)
+        if self.availability:
+            self.availability.add_booking(booking_id, room_number, check_in, check_out)
+        return booking_id
+
+    def cancel(self, booking_id):
+        if not self.client.cancel(booking_id):
+            return False
+        if self.availability:
+            self.availability.remove_booking(booking_id)
+        return True
+
+
+class RemoteRooms:
+    """RoomRepository's add() and add_sample_rooms(), made by the booking server."""
+
+    def __init__(self, api):
+        self.client = api
+
+    def add(self, room_number, room_type, ac_type, price, capacity, wifi, status='available'):
+        self.client.add_room(room_number, room_type, ac_type, price, capacity, wifi, status)
+
+    def add_sample_rooms(self):
+        return self.client.add_sample_rooms()
+
+
+class RemoteEmployees:
+    """EmployeeRepository, with the passwords checked by the booking server."""
+
+    def __init__(self, api):
+        self.client = api
+
+    def create(self, username, password):
+        self.client.add_employee(username, password)
+
+    def verify(self, username, password):
+        return self.client.login(username, password)
+
+    def ensure_admin(self, username='admin', password='admin123'):
+        try:
+            self.create(username, password)
+        except sqlite3.IntegrityError:
+            pass
@@ -0,0 +1,64 @@
+"""Dates as the database stores them: whole days since 1970-01-01.
+
+Check-in and check-out dates are kept as integer day numbers, so range
+checks and indexes compare small integers and a date can only be stored
+once it has been understood.  day_number() turns whatever the date
+pickers or old databases hand over into one; as_date() turns one back
+into a datetime.date.  Listings convert in SQL with iso_sql() so the
+front-ends keep getting YYYY-MM-DD text.
+
+    day_number('2025-01-01')    # 20089
+    as_date(20089)              # datetime.date(2025, 1, 1)
+"""
+
+from datetime import date, datetime
+
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# Formats the apps have stored dates in (ISO, and DateEntry's en_US default)
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%y', '%m/%d/%Y')
+
+
+def as_date(value):
+    """Convert a day number, stored text or widget date value to a datetime.date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, int):
+        return date.fromordinal(EPOCH_ORDINAL + value)
+    # YYYY-MM-DD is by far the most common and fromisoformat() is much
+    # cheaper than strptime()
+    if isinstance(value, str) and len(value) == 10 and value[4] == '-':
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+# Today's day number, for views and triggers
+TODAY_SQL = "CAST(julianday(date('now', 'localtime')) - 2440587.5 AS INTEGER)"
+
+
+def day_number(value):
+    """The integer day number stored for a date."""
+    if isinstance(value, int):
+        return value
+    return as_date(value).toordinal() - EPOCH_ORDINAL
+
+
+def iso(value):
+    """YYYY-MM-DD text for a day number or any date as_date() understands."""
+    return as_date(value).isoformat()
+
+
+def iso_sql(column):
+    """SQL expression giving a day-number column as YYYY-MM-DD text."""
+    return f"date({column} * 86400, 'unixepoch')"
@@ -0,0 +1,94 @@
+"""Where a front-end's database work goes: the database file or the booking server.
+
+Each app does its database work on a DatabaseWorker made by worker().
+Without TROE_SERVER that worker has a connection to the database file.
+With it set the desk does not open the file at all: the worker's
+connection is a client.RemoteConnection, the booking server (troe.server)
+migrates and backs up the database, and the ChangeTracker polls the
+server through a worker of its own, so no request is made on the Tk
+thread.
+
+    TROE_SERVER=http://127.0.0.1:8765 python "TROE1(Tabbed ).py"
+
+Reads are SQL and run on either connection.  Writes go through the
+functions below, which pick the repository, or its client.Remote*
+counterpart, for the worker's connection.
+"""
+
+import os
+
+from troe import archive, audit, client, importer
+from troe.availability import AvailabilityEngine
+from troe.changes import ChangeTracker
+from troe.occupancy import OccupancyBitmap
+from troe.repository import BookingRepository, EmployeeRepository, RoomRepository
+from troe.worker import DatabaseWorker
+
+
+def server_url():
+    """The booking server's URL from TROE_SERVER, or None to use the database file."""
+    return os.environ.get(client.SERVER_ENV) or None
+
+
+def worker(db_file, root, on_busy=None):
+    """A DatabaseWorker on the database file, or on the booking server."""
+    url = server_url()
+    connect = (lambda: client.RemoteConnection(url)) if url else None
+    return DatabaseWorker(db_file, root, on_busy=on_busy, connect=connect)
+
+
+def change_tracker(db_file, root):
+    """A ChangeTracker on the database file, or polling the booking server."""
+    if server_url():
+        return ChangeTracker(db_file, root, worker=worker(db_file, root))
+    return ChangeTracker(db_file, root)
+
+
+def availability_engine(db_file):
+    """An AvailabilityEngine for the worker to load.
+
+    The occupancy snapshot is kept next to the database file, so a desk
+    using the booking server goes without it.
+    """
+    occupancy = None if server_url() else OccupancyBitmap(db_file + ".occupancy.json")
+    return AvailabilityEngine(None, occupancy)
+
+
+def is_remote(conn):
+    return isinstance(conn, client.RemoteConnection)
+
+
+def rooms(conn):
+    """add() and add_sample_rooms() on the worker's connection."""
+    return client.RemoteRooms(conn.client) if is_remote(conn) else RoomRepository(conn)
+
+
+def bookings(conn, availability=None):
+    """book() and cancel() on the worker's connection."""
+    if is_remote(conn):
+        return client.RemoteBookings(conn.client, availability)
+    return BookingRepository(conn, availability)
+
+
+def employees(conn):
+    """create(), verify() and ensure_admin() on the worker's connection."""
+    return client.RemoteEmployees(conn.client) if is_remote(conn) else EmployeeRepository(conn)
+
+
+def import_file(conn, path):
+    """importer.import_file() on the worker's connection."""
+    if is_remote(conn):
+        return importer.result(path, *conn.client.import_rooms(path))
+    return importer.import_file(conn, path)
+
+
+def night_audit(conn):
+    """Close today on the worker's connection; return the audit's figures."""
+    return conn.client.night_audit() if is_remote(conn) else audit.run(conn)
+
+
+def history(conn, db_file, name=None):
+    """archive.history() of the database, archived bookings included."""
+    if is_remote(conn):
+        return conn.client.history(name)
+    return archive.history(conn, archive.archive_path(db_file), name)
@@ -0,0 +1,83 @@
+"""Dialogs shared by the three front-ends.
+
+Each takes the app's DatabaseWorker, so the database work runs on the
+worker thread (troe.desk) and only the widgets are touched on the Tk
+main loop.
+"""
+
+import tkinter as tk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+
+from troe import audit, desk, importer
+
+HISTORY_HEADINGS = ("Booking ID", "Customer", "Room", "Check-in", "Check-out", "Status", "Source")
+
+
+def errback(input_title, error_title, message):
+    """A worker errback: bad input (ValueError) shown as it is, other errors after message."""
+    def show(e):
+        if isinstance(e, ValueError):
+            messagebox.showerror(input_title, str(e))
+        else:
+            messagebox.showerror(error_title, f"{message}: {str(e)}")
+    return show
+
+
+def import_rooms(worker):
+    """Add rooms in bulk from a CSV or JSON Lines file the user picks."""
+    path = filedialog.askopenfilename(
+        title="Import Rooms",
+        filetypes=[("Room files", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")])
+    if not path:
+        return
+
+    def show_result(result):
+        if result[1]:
+            messagebox.showwarning("Import Finished", importer.result_message(*result))
+        else:
+            messagebox.showinfo("Success", importer.result_message(*result))
+
+    worker.submit(
+        lambda conn: desk.import_file(conn, path), show_result,
+        lambda e: messagebox.showerror("Import Error", f"Could not import {path}: {str(e)}"))
+
+
+def run_night_audit(worker):
+    """Complete checked-out stays and record today's figures, once confirmed."""
+    if not messagebox.askyesno(
+            "Night Audit",
+            "Close today? Stays that have checked out will be marked completed "
+            "and today's occupancy and revenue recorded."):
+        return
+    worker.submit(
+        lambda conn: audit.summary(desk.night_audit(conn)),
+        lambda text: messagebox.showinfo("Night Audit", text),
+        lambda e: messagebox.showerror("Database Error", f"Night audit failed: {str(e)}"))
+
+
+def view_booking_history(root, worker, db_file):
+    """Ask for a guest name and list their bookings, archived ones included."""
+    name = simpledialog.askstring(
+        "Booking History", "Guest name (leave empty for the latest bookings):", parent=root)
+    if name is None:
+        return
+
+    def show_history(rows):
+        window = tk.Toplevel(root)
+        window.title("Booking History")
+        window.geometry("900x500")
+        tree = ttk.Treeview(window, columns=HISTORY_HEADINGS, show="headings")
+        for col in HISTORY_HEADINGS:
+            tree.heading(col, text=col)
+            tree.column(col, width=120, anchor='center')
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        for row in rows:
+            tree.insert('', 'end', values=row)
+
+    worker.submit(
+        lambda conn: desk.history(conn, db_file, name.strip()),
+        show_history,
+        lambda e: messagebox.showerror("Error", f"Failed to read booking history: {str(e)}"))
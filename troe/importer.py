@@ -0,0 +1,223 @@
+"""Bulk room import from CSV or JSON Lines files.
+
+Each row is one room, with the columns of the rooms table:
+
+    room_number,room_type,ac_type,price,capacity,wifi,status
+    101,Normal,AC,1500,2,yes,available
+
+status may be left out (available) and wifi takes 1/0, yes/no or
+true/false.  A file ending in .jsonl or .ndjson holds one JSON object per
+line with the same keys; anything else is read as CSV.
+
+The file is read a row at a time and every row is checked against the
+rules of the rooms table (price above 0, capacity 1 to 4, a known status)
+before it reaches the database, so a bad row is reported instead of
+failing the import.  Good rows are inserted with executemany in batches,
+all inside one transaction: either every good row is added or none is.
+Room numbers that already exist, or appear twice in the file, are
+rejected rather than replaced.
+
+    python -m troe.importer hotel_management.db rooms.csv [--report rejected.csv]
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from troe import db, schema
+from troe.repository import RoomRepository
+
+COLUMNS = ('room_number', 'room_type', 'ac_type', 'price', 'capacity', 'wifi', 'status')
+REQUIRED = COLUMNS[:-1]
+STATUSES = ('available', 'maintenance')
+WIFI_VALUES = {'1': 1, 'yes': 1, 'y': 1, 'true': 1, '0': 0, 'no': 0, 'n': 0, 'false': 0}
+BATCH_SIZE = 500
+
+EXISTING_SQL = "SELECT room_number FROM rooms"
+
+
+def read_records(path):
+    """Yield (line number, record) for each row of a CSV or JSON Lines file."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from parse_records(f, path)
+
+
+def parse_records(f, name):
+    """read_records() for an open text file; name says which format it is in."""
+    if name.lower().endswith(('.jsonl', '.ndjson')):
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_no, line.strip()
+        return
+
+    reader = csv.DictReader(f)
+    missing = [column for column in REQUIRED if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"{name} has no {', '.join(missing)} column")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def validate(record):
+    """Return the rooms row for one record, or raise ValueError saying why not."""
+    if not isinstance(record, dict):
+        raise ValueError("Not a JSON object")
+    missing = [column for column in REQUIRED
+               if record.get(column) is None or str(record[column]).strip() == '']
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    try:
+        room_number = int(str(record['room_number']).strip())
+    except ValueError:
+        raise ValueError("Room number must be a whole number")
+    try:
+        price = float(record['price'])
+    except (TypeError, ValueError):
+        raise ValueError("Price must be a valid number")
+    if not price > 0:
+        raise ValueError("Price must be greater than 0")
+    try:
+        capacity = int(str(record['capacity']).strip())
+    except ValueError:
+        raise ValueError("Capacity must be a whole number")
+    if capacity < 1 or capacity > 4:
+        raise ValueError("Capacity must be between 1 and 4")
+    wifi = WIFI_VALUES.get(str(record['wifi']).strip().lower())
+    if wifi is None:
+        raise ValueError("WiFi must be yes or no")
+    status = str(record.get('status') or 'available').strip().lower()
+    if status not in STATUSES:
+        raise ValueError(f"Status must be {' or '.join(STATUSES)}")
+
+    return (room_number, str(record['room_type']).strip(), str(record['ac_type']).strip(),
+            price, capacity, wifi, status)
+
+
+def import_rooms(conn, path, batch_size=BATCH_SIZE):
+    """Add the rooms in path in one transaction; return (imported, rejected).
+
+    rejected lists (line number, reason, record) for every row left out.
+    """
+    return import_records(conn, read_records(path), batch_size)
+
+
+def import_records(conn, records, batch_size=BATCH_SIZE):
+    """import_rooms() for (line number, record) pairs, read as they are inserted."""
+    def load(conn):
+        seen = {row[0]: None for row in conn.execute(EXISTING_SQL)}
+        imported, rejected, batch = 0, [], []
+        for line_no, record in records:
+            try:
+                row = validate(record)
+                if row[0] in seen:
+                    if seen[row[0]] is None:
+                        raise ValueError("Room number already exists")
+                    raise ValueError(f"Room number repeats line {seen[row[0]]}")
+            except ValueError as e:
+                rejected.append((line_no, str(e), record))
+                continue
+            seen[row[0]] = line_no
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(RoomRepository.INSERT_SQL, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(RoomRepository.INSERT_SQL, batch)
+            imported += len(batch)
+        return imported, rejected
+
+    return db.write_transaction(conn, load)
+
+
+def import_file(conn, path):
+    """import_rooms() for the front-ends: return (imported, rejected, report).
+
+    rejected is a count; the rows themselves are written to report_path(path),
+    which is returned as report, or None when every row was imported.
+    """
+    return result(path, *import_rooms(conn, path))
+
+
+def result(path, imported, rejected):
+    """import_file()'s answer for an import of path, however it was made."""
+    report = write_report(rejected, report_path(path)) if rejected else None
+    return imported, len(rejected), report
+
+
+def result_message(imported, rejected, report):
+    """What to tell the user after import_file()."""
+    if not rejected:
+        return f"Imported {imported} rooms."
+    return (f"Imported {imported} rooms; {rejected} rows were rejected.\n\n"
+            f"The rejected rows and the reasons are in:\n{report}")
+
+
+def report_path(path):
+    """Where the rejected rows of path are written by default."""
+    return os.path.splitext(path)[0] + ".rejected.csv"
+
+
+def write_report(rejected, path):
+    """Write the rejected rows to a CSV file: line, reason and the row as read."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('line', 'reason') + COLUMNS)
+        for line_no, reason, record in rejected:
+            if isinstance(record, dict):
+                values = [record.get(column, '') for column in COLUMNS]
+            else:
+                values = [record]
+            writer.writerow([line_no, reason] + values)
+    return path
+
+
+def main(argv=None):
+    """Import a room file into a database and report the rejected rows."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    usage = "usage: python -m troe.importer DB_FILE ROOMS_FILE [--report REJECTED_CSV]"
+    report = None
+    if "--report" in argv:
+        index = argv.index("--report")
+        if index + 1 == len(argv):
+            print(usage)
+            return 2
+        report = argv[index + 1]
+        del argv[index:index + 2]
+    if len(argv) != 2:
+        print(usage)
+        return 2
+    db_file, path = argv
+
+    conn = db.connect(db_file)
+    try:
+        # Bring the schema up to date first, as the apps and the CLI do
+        schema.create_tables(conn)
+        started = time.perf_counter()
+        imported, rejected = import_rooms(conn, path)
+    except (OSError, UnicodeDecodeError, csv.Error, ValueError, sqlite3.Error) as e:
+        print(f"Cannot import {path}: {str(e)}")
+        return 2
+    finally:
+        conn.close()
+
+    print(f"Imported {imported} rooms from {path} in {time.perf_counter() - started:.2f}s")
+    if not rejected:
+        return 0
+    write_report(rejected, report or report_path(path))
+    for line_no, reason, _ in rejected[:10]:
+        print(f"  line {line_no}: {reason}")
+    print(f"{len(rejected)} rows rejected, see {report or report_path(path)}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Room nights: one row per room per night a guest stays.
+
+install() adds room_nights, filled from the bookings through a calendar
+table of every day number (troe.dates) from CALENDAR_START to
+CALENDAR_END.  Triggers on bookings keep it current: a booking's nights
+go in when it is made, move when its room or dates change and come out
+when it is cancelled or deleted.  Completed stays keep their nights so past days can still be
+reported on.
+
+With the nights laid out as rows, the usual questions are indexed
+lookups instead of date comparisons over the whole bookings table:
+
+    in_house(conn, '2025-06-01')                      # who sleeps here tonight
+    occupancy(conn, '2025-06-01', '2025-06-08')       # rooms sold per night
+    busy_rooms(conn, '2025-06-01', '2025-06-04')      # rooms taken for a stay
+
+The bookings table stays the source of truth; rebuild() throws the
+nights away and works them out again.
+
+    python -m troe.nights hotel_management.db 2025-06-01 7
+    python -m troe.nights hotel_management.db --rebuild
+"""
+
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from troe import db
+from troe.dates import as_date, day_number, iso, iso_sql
+
+CALENDAR_START = date(2000, 1, 1)
+CALENDAR_END = date(2099, 12, 31)
+
+# Nights are day numbers like the bookings' dates, so a stay's nights
+# are a range of the calendar's integer key
+TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS calendar (
+        night INTEGER PRIMARY KEY
+    )
+    """,
+    # booking_id is part of the key so old data with overlapping stays
+    # still loads; the booking rule triggers stop new overlaps
+    """
+    CREATE TABLE IF NOT EXISTS room_nights (
+        room_number INTEGER NOT NULL,
+        night INTEGER NOT NULL,
+        booking_id INTEGER NOT NULL,
+        PRIMARY KEY (room_number, night, booking_id)
+    ) WITHOUT ROWID
+    """,
+    # Nights first, for per-day reports and the in-house list
+    """
+    CREATE INDEX IF NOT EXISTS idx_room_nights_night
+    ON room_nights (night, booking_id)
+    """,
+)
+
+# Stays that use up a room: everything but cancelled bookings.  CROSS JOIN
+# keeps bookings as the outer loop, one calendar range search per stay.
+POPULATE_SQL = """
+    INSERT INTO room_nights (room_number, night, booking_id)
+    SELECT b.room_number, c.night, b.booking_id
+    FROM bookings b
+    CROSS JOIN calendar c ON c.night >= b.check_in_date AND c.night < b.check_out_date
+    WHERE b.status != 'cancelled'
+"""
+
+TRIGGERS = {
+    'trg_bookings_insert_nights': """
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_insert_nights
+        AFTER INSERT ON bookings
+        WHEN new.status != 'cancelled'
+        BEGIN
+            INSERT INTO room_nights (room_number, night, booking_id)
+            SELECT new.room_number, night, new.booking_id
+            FROM calendar
+            WHERE night >= new.check_in_date AND night < new.check_out_date;
+        END
+    """,
+    'trg_bookings_update_nights': """
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_update_nights
+        AFTER UPDATE OF room_number, check_in_date, check_out_date, status ON bookings
+        WHEN old.room_number IS NOT new.room_number
+        OR old.check_in_date IS NOT new.check_in_date
+        OR old.check_out_date IS NOT new.check_out_date
+        OR (old.status = 'cancelled') != (new.status = 'cancelled')
+        BEGIN
+            DELETE FROM room_nights
+            WHERE room_number = old.room_number
+            AND night >= old.check_in_date AND night < old.check_out_date
+            AND booking_id = old.booking_id;
+            INSERT INTO room_nights (room_number, night, booking_id)
+            SELECT new.room_number, night, new.booking_id
+            FROM calendar
+            WHERE night >= new.check_in_date AND night < new.check_out_date
+            AND new.status != 'cancelled';
+        END
+    """,
+    'trg_bookings_delete_nights': """
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_delete_nights
+        AFTER DELETE ON bookings
+        BEGIN
+            DELETE FROM room_nights
+            WHERE room_number = old.room_number
+            AND night >= old.check_in_date AND night < old.check_out_date
+            AND booking_id = old.booking_id;
+        END
+    """,
+}
+
+# Guests staying on the night of ?
+IN_HOUSE_SQL = f"""
+    SELECT b.booking_id, b.person_name, n.room_number,
+           {iso_sql('b.check_in_date')}, {iso_sql('b.check_out_date')}, b.num_persons
+    FROM room_nights n
+    JOIN bookings b ON b.booking_id = n.booking_id
+    WHERE n.night = ?
+    ORDER BY n.room_number
+"""
+
+# Rooms sold per night from ? up to (not including) ?
+OCCUPANCY_SQL = """
+    SELECT night, COUNT(DISTINCT room_number)
+    FROM room_nights
+    WHERE night >= ? AND night < ?
+    GROUP BY night
+"""
+
+# Rooms with any night taken in [?, ?)
+BUSY_ROOMS_SQL = """
+    SELECT DISTINCT room_number
+    FROM room_nights
+    WHERE night >= ? AND night < ?
+"""
+
+ROOM_COUNT_SQL = "SELECT COUNT(*) FROM rooms WHERE status != 'maintenance'"
+
+
+def install(conn):
+    """Create the calendar, room_nights and its triggers if needed; the caller commits."""
+    # Without the triggers the nights were never filled
+    installed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'trg_bookings_insert_nights'").fetchone()
+    for sql in TABLES:
+        conn.execute(sql)
+    fill_calendar(conn)
+    if not installed:
+        conn.execute("DELETE FROM room_nights")
+        conn.execute(POPULATE_SQL)
+    for sql in TRIGGERS.values():
+        conn.execute(sql)
+
+
+def fill_calendar(conn, start=CALENDAR_START, end=CALENDAR_END):
+    """Make sure the calendar has every day from start to end; the caller commits."""
+    first, last = day_number(start), day_number(end)
+    have = conn.execute("SELECT COUNT(*) FROM calendar WHERE night BETWEEN ? AND ?",
+                        (first, last)).fetchone()[0]
+    if have == last - first + 1:
+        return
+    conn.executemany("INSERT OR IGNORE INTO calendar (night) VALUES (?)",
+                     [(night,) for night in range(first, last + 1)])
+
+
+def rebuild(conn):
+    """Work every room night out again from the bookings; return how many."""
+    try:
+        fill_calendar(conn)
+        conn.execute("DELETE FROM room_nights")
+        conn.execute(POPULATE_SQL)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT COUNT(*) FROM room_nights").fetchone()[0]
+
+
+def in_house(conn, night):
+    """(booking_id, name, room, check-in, check-out, persons) staying on night."""
+    return conn.execute(IN_HOUSE_SQL, (day_number(night),)).fetchall()
+
+
+def occupancy(conn, first, last):
+    """[(night, rooms sold, percent of rooms)] for first .. last - 1."""
+    first, last = day_number(first), day_number(last)
+    rooms = conn.execute(ROOM_COUNT_SQL).fetchone()[0]
+    sold = dict(conn.execute(OCCUPANCY_SQL, (first, last)))
+    report = []
+    for night in range(first, last):
+        count = sold.get(night, 0)
+        report.append((iso(night), count, 100.0 * count / rooms if rooms else 0.0))
+    return report
+
+
+def busy_rooms(conn, check_in, check_out):
+    """Set of rooms with any night taken between check_in and check_out."""
+    return {row[0] for row in conn.execute(
+        BUSY_ROOMS_SQL, (day_number(check_in), day_number(check_out)))}
+
+
+def main(argv=None):
+    """Print occupancy per night, or rebuild room_nights."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python -m troe.nights DB_FILE [FIRST_NIGHT [DAYS]] | --rebuild")
+        return 2
+
+    conn = db.connect(argv[0])
+    try:
+        if argv[1:2] == ['--rebuild']:
+            started = time.perf_counter()
+            count = rebuild(conn)
+            print(f"Rebuilt {count} room nights in {time.perf_counter() - started:.1f}s")
+            return 0
+        first = as_date(argv[1]) if len(argv) > 1 else date.today()
+        days = int(argv[2]) if len(argv) > 2 else 7
+        report = occupancy(conn, first, first + timedelta(days=days))
+        guests = in_house(conn, first)
+    except (ValueError, sqlite3.OperationalError) as e:
+        print(f"Cannot report on {argv[0]}: {str(e)}")
+        return 2
+    finally:
+        conn.close()
+
+    for night, sold, percent in report:
+        print(f"{night}  {sold:>5} rooms  {percent:5.1f}%")
+    print(f"{len(guests)} stays in house on {first.isoformat()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
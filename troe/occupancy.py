@@ -0,0 +1,152 @@
+"""Nightly occupancy bitmaps.
+
+Each room gets one integer bitset per calendar year, bit n set when night
+n of that year (0 = 1 January) is taken by an active booking.  A room is
+free for a stay when the AND of its bitset and the stay's night mask is
+zero, which costs one or two integer operations regardless of how many
+bookings the room has.
+
+The bitmaps are rebuilt from the bookings table when needed and saved as
+a JSON snapshot next to the database, tagged with a signature of the
+active bookings so a stale snapshot is never trusted.
+"""
+
+import json
+import os
+from datetime import date
+
+from troe.dates import as_date
+
+SNAPSHOT_VERSION = 1
+
+SIGNATURE_SQL = """
+    SELECT COUNT(*), TOTAL(booking_id), MAX(booking_id)
+    FROM bookings
+    WHERE status = 'active'
+"""
+
+
+def night_masks(check_in, check_out):
+    """Yield (year, mask) covering the nights check_in .. check_out - 1."""
+    first = as_date(check_in).toordinal()
+    last = as_date(check_out).toordinal()  # exclusive
+    while first < last:
+        year = date.fromordinal(first).year
+        year_start = date(year, 1, 1).toordinal()
+        year_end = date(year + 1, 1, 1).toordinal()
+        stop = min(last, year_end)
+        yield year, ((1 << (stop - first)) - 1) << (first - year_start)
+        first = stop
+
+
+class OccupancyBitmap:
+    """Per-room, per-year bitsets of booked nights."""
+
+    def __init__(self, snapshot_file=None):
+        self.snapshot_file = snapshot_file
+        self.bits = {}  # room_number -> {year: int}
+        self.loaded = False
+
+    def mark(self, room_number, check_in, check_out):
+        """Set the nights of one stay."""
+        years = self.bits.setdefault(room_number, {})
+        for year, mask in night_masks(check_in, check_out):
+            years[year] = years.get(year, 0) | mask
+
+    def set_room(self, room_number, stays):
+        """Replace a room's bitsets with the given (check_in, check_out) stays."""
+        self.bits.pop(room_number, None)
+        for check_in, check_out in stays:
+            try:
+                self.mark(room_number, check_in, check_out)
+            except ValueError:
+                continue
+
+    def is_free(self, room_number, check_in, check_out):
+        """Return True if none of the stay's nights are taken."""
+        years = self.bits.get(room_number)
+        if not years:
+            return True
+        for year, mask in night_masks(check_in, check_out):
+            if years.get(year, 0) & mask:
+                return False
+        return True
+
+    def free_rooms(self, room_numbers, check_in, check_out):
+        """Return the rooms from room_numbers that are free for the dates."""
+        masks = list(night_masks(check_in, check_out))
+        free = []
+        for room in room_numbers:
+            years = self.bits.get(room)
+            if not years or not any(years.get(year, 0) & mask
+                                    for year, mask in masks):
+                free.append(room)
+        return free
+
+    def rebuild(self, conn):
+        """Rebuild every bitset from the active bookings."""
+        self.bits.clear()
+        skipped = 0
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT room_number, check_in_date, check_out_date
+            FROM bookings
+            WHERE status = 'active'
+        """)
+        for room_number, check_in, check_out in cursor:
+            try:
+                self.mark(room_number, check_in, check_out)
+            except ValueError:
+                skipped += 1
+        if skipped:
+            print(f"Occupancy bitmap: skipped {skipped} bookings with unreadable dates")
+        self.loaded = True
+
+    def load_or_rebuild(self, conn):
+        """Load the snapshot if it matches the database, otherwise rebuild."""
+        if not self.load_snapshot(conn):
+            self.rebuild(conn)
+            self.save_snapshot(conn)
+
+    def signature(self, conn):
+        """Fingerprint of the active bookings the bitmaps were built from."""
+        return list(conn.execute(SIGNATURE_SQL).fetchone())
+
+    def load_snapshot(self, conn):
+        """Load the saved bitsets; return False if missing or stale."""
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return False
+        try:
+            with open(self.snapshot_file, 'r') as f:
+                snapshot = json.load(f)
+            if (snapshot.get('version') != SNAPSHOT_VERSION or
+                    snapshot.get('signature') != self.signature(conn)):
+                return False
+            bits = {}
+            for room, year, value in snapshot['bits']:
+                bits.setdefault(room, {})[int(year)] = int(value, 16)
+            self.bits = bits
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: Could not load occupancy snapshot: {str(e)}")
+            return False
+        self.loaded = True
+        return True
+
+    def save_snapshot(self, conn):
+        """Write the bitsets to the snapshot file."""
+        if not self.snapshot_file:
+            return
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signature': self.signature(conn),
+            'bits': [[room, year, format(value, 'x')]
+                     for room, years in self.bits.items()
+                     for year, value in years.items() if value],
+        }
+        tmp_file = self.snapshot_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_file, self.snapshot_file)
+        except OSError as e:
+            print(f"Warning: Could not save occupancy snapshot: {str(e)}")
@@ -0,0 +1,213 @@
+"""Keyset-paged Treeview for long lists such as the booking history.
+
+PagedTreeview loads a query one page at a time through the background
+DatabaseWorker as the user scrolls.  Pages are fetched with keyset
+pagination, e.g. WHERE (check_in_date, booking_id) < (?, ?), so each
+page costs one index range scan however deep into the history it is.
+Only max_pages pages stay in the Treeview: scrolling down drops rows
+from the top and scrolling back up fetches them again, so memory does
+not grow with the size of the table.  refresh() re-reads the rows
+currently loaded, from the top of the list when the first page is
+loaded, and applies only the differences, keeping the selection and
+scroll position.
+
+The query must select the key columns first; they are not shown.  The
+last key column must be unique and is used as the Treeview item id.
+"""
+
+from troe.binding import TableBinding
+
+
+class PagedTreeview:
+    """Show a query in a ttk.Treeview, a few pages at a time."""
+
+    def __init__(self, tree, worker, select_sql, key_columns, format_row=None,
+                 scrollbar=None, where=None, params=(), descending=True,
+                 page_size=100, max_pages=3, on_empty=None, on_error=None):
+        self.tree = tree
+        self.worker = worker
+        self.select_sql = select_sql
+        self.key_columns = tuple(key_columns)
+        self.format_row = format_row or (lambda row: (row, ()))
+        n = len(self.key_columns)
+        self.binding = TableBinding(
+            tree, key=lambda row: row[n - 1],
+            format_row=lambda row: self.format_row(row[n:]))
+        self.scrollbar = scrollbar
+        self.where = where
+        self.params = tuple(params)
+        self.descending = descending
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.on_empty = on_empty
+        self.on_error = on_error
+
+        # Keys of the materialized rows, in display order
+        self.keys = []
+        self.at_start = True
+        self.at_end = False
+        self.loading = False
+        self.generation = 0
+
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+
+    def reload(self):
+        """Drop every row and load the first page again."""
+        self.generation += 1
+        self.binding.clear()
+        self.keys = []
+        self.at_start = True
+        self.at_end = False
+        self.loading = False
+        self._fetch('next', None)
+
+    def refresh(self):
+        """Re-read the loaded rows and update only what changed."""
+        if not self.keys:
+            self.reload()
+            return
+        self.generation += 1
+        generation = self.generation
+        self.loading = True
+        # At the top of the list, rows that now sort above the first one
+        # (a new booking further in the future) belong in the window too
+        start = None if self.at_start else self.keys[0]
+        sql, params = self.page_sql('next', start, inclusive=True,
+                                    limit=max(len(self.keys), self.page_size))
+
+        def fetch_window(conn):
+            return conn.execute(sql, params).fetchall()
+
+        def on_error(e):
+            self.loading = False
+            if self.on_error:
+                self.on_error(e)
+            else:
+                print(f"Error refreshing rows: {str(e)}")
+
+        self.worker.submit(
+            fetch_window,
+            lambda rows: self._on_window(generation, rows, params[-1]),
+            on_error)
+
+    def _on_window(self, generation, rows, limit):
+        """Tk thread: apply a refreshed window as a diff."""
+        if generation != self.generation or not self.tree.winfo_exists():
+            return
+        self.loading = False
+        n = len(self.key_columns)
+        self.binding.update(rows)
+        self.keys = [tuple(row[:n]) for row in rows]
+        self.at_end = len(rows) < limit
+        if not self.keys and self.on_empty:
+            self.on_empty()
+
+    def page_sql(self, direction, key, inclusive=False, limit=None):
+        """SQL and parameters for the page after (next) or before (prev) key."""
+        forward = direction == 'next'
+        # "next" walks in display order, "prev" walks backwards from the top row
+        descending = self.descending == forward
+        conditions = [self.where] if self.where else []
+        params = list(self.params)
+        if key is not None:
+            columns = ", ".join(self.key_columns)
+            marks = ", ".join("?" * len(self.key_columns))
+            operator = '<' if descending else '>'
+            if inclusive:
+                operator += '='
+            conditions.append(f"({columns}) {operator} ({marks})")
+            params.extend(key)
+
+        sql = self.select_sql
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        order = " DESC" if descending else " ASC"
+        sql += " ORDER BY " + ", ".join(column + order for column in self.key_columns)
+        sql += " LIMIT ?"
+        params.append(limit or self.page_size)
+        return sql, params
+
+    def _fetch(self, direction, key):
+        """Ask the worker for one page; _on_page adds it to the tree."""
+        self.loading = True
+        generation = self.generation
+        sql, params = self.page_sql(direction, key)
+
+        def fetch_page(conn):
+            return conn.execute(sql, params).fetchall()
+
+        def on_error(e):
+            self.loading = False
+            if self.on_error:
+                self.on_error(e)
+            else:
+                print(f"Error loading page: {str(e)}")
+
+        self.worker.submit(
+            fetch_page,
+            lambda rows: self._on_page(generation, direction, rows),
+            on_error)
+
+    def _on_page(self, generation, direction, rows):
+        """Tk thread: add a fetched page and trim the far end of the window."""
+        if generation != self.generation or not self.tree.winfo_exists():
+            return
+        self.loading = False
+        n = len(self.key_columns)
+        first_visible = self._first_visible()
+
+        if direction == 'next':
+            if len(rows) < self.page_size:
+                self.at_end = True
+            for row in rows:
+                if self.binding.insert(row) is not None:
+                    self.keys.append(tuple(row[:n]))
+
+            if not self.keys and self.on_empty:
+                self.on_empty()
+
+            # Forget rows far above the view
+            excess = len(self.keys) - self.max_rows
+            if excess > 0:
+                self.binding.delete(*self.tree.get_children()[:excess])
+                del self.keys[:excess]
+                self.at_start = False
+                self._scroll_to(first_visible - excess)
+        else:
+            if len(rows) < self.page_size:
+                self.at_start = True
+            # Rows come back nearest-first; insert them above the top row
+            for row in rows:
+                if self.binding.insert(row, 0) is not None:
+                    self.keys.insert(0, tuple(row[:n]))
+
+            # Forget rows far below the view
+            excess = len(self.keys) - self.max_rows
+            if excess > 0:
+                self.binding.delete(*self.tree.get_children()[-excess:])
+                del self.keys[-excess:]
+                self.at_end = False
+            self._scroll_to(first_visible + len(rows))
+
+    def _first_visible(self):
+        """Index of the top visible row."""
+        return round(self.tree.yview()[0] * len(self.keys))
+
+    def _scroll_to(self, index):
+        """Keep the rows the user was looking at in place after a trim."""
+        if self.keys:
+            self.tree.yview_moveto(max(index, 0) / len(self.keys))
+
+    def _on_yscroll(self, first, last):
+        """Update the scrollbar and load more rows near either end."""
+        if self.scrollbar:
+            self.scrollbar.set(first, last)
+        if self.loading or not self.keys:
+            return
+
+        # Prefetch when within half a page of the materialized edge
+        margin = (self.page_size / 2) / len(self.keys)
+        if float(last) >= 1 - margin and not self.at_end:
+            self._fetch('next', self.keys[-1])
+        elif float(first) <= margin and not self.at_start:
+            self._fetch('prev', self.keys[0])
@@ -0,0 +1,394 @@
+"""Data access shared by the three front-ends.
+
+Every statement the apps run lives here as a fixed SQL string, so
+sqlite3's per-connection statement cache compiles each one once and
+reuses it.  The repositories work on whichever connection they are
+given: the app's main connection for writes, or the background
+worker's connection for listings.
+
+    rooms = RoomRepository(conn)
+    bookings = BookingRepository(conn, availability)
+    booking_id = bookings.book("Asha Rao", 101, "2025-01-01", "2025-01-03", 2, "No")
+
+Validation that depends on the database (duplicate rooms, room
+capacity, overlapping stays) raises ValueError with a message the
+front-ends can show as it is.  Capacity, dates and overlapping stays are
+enforced by triggers on bookings (schema.TRIGGERS), so a booking is one
+INSERT that SQLite accepts or rejects under its write lock; no other
+desk can slip a booking in between a check and the insert.
+
+Whether a room is occupied is worked out from its active bookings for
+the date in question (ROOM_STATUS_SQL); rooms.status only records rooms
+taken out for maintenance, so booking and cancelling never touch rooms.
+"""
+
+import hashlib
+import hmac
+import re
+import sqlite3
+
+from troe import changes, db, search
+from troe.dates import day_number, iso_sql
+
+# Sample rooms added to an empty database so the apps have something to show
+SAMPLE_ROOMS = (
+    (101, 'Deluxe', 'AC', 2500, 2, 1, 'available'),
+    (102, 'Normal', 'Non-AC', 1500, 2, 1, 'available'),
+    (103, 'Premium', 'AC', 3500, 3, 1, 'available'),
+    (104, 'Suite', 'AC', 5000, 4, 1, 'available'),
+    (201, 'Deluxe', 'AC', 2800, 2, 1, 'available'),
+    (202, 'Premium', 'AC', 3800, 3, 1, 'available'),
+)
+
+
+# Messages raised by the booking rule triggers in troe.schema
+OVERLAP_ERROR = "This room is already booked for the selected dates."
+CAPACITY_ERROR = "Too many persons for the room capacity"
+DATES_ERROR = "Check-out date must be after check-in date"
+
+
+# A room's status on one date: rooms.status only says 'maintenance',
+# occupancy comes from the booked night of day number {day} (troe.nights)
+ROOM_STATUS_SQL = """
+    CASE WHEN r.status = 'maintenance' THEN 'maintenance'
+         WHEN EXISTS (
+             SELECT 1 FROM room_nights n
+             WHERE n.room_number = r.room_number AND n.night = {day}
+         ) THEN 'occupied'
+         ELSE 'available' END
+"""
+
+
+class BookingConflict(ValueError):
+    """The room already has an active booking for some of the nights."""
+
+
+class RoomRepository:
+    """Adding, listing and searching rooms."""
+
+    EXISTS_SQL = "SELECT 1 FROM rooms WHERE room_number = ?"
+    COUNT_SQL = "SELECT COUNT(*) FROM rooms"
+    CAPACITY_SQL = "SELECT capacity FROM rooms WHERE room_number = ?"
+    INSERT_SQL = """
+        INSERT INTO rooms (room_number, room_type, ac_type, price, capacity, wifi, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # Every room, cheapest first within each type
+    ALL_SQL = """
+        SELECT room_number, room_type, ac_type, price, capacity, wifi, status
+        FROM rooms
+        ORDER BY room_type, price
+    """
+
+    # Bookable rooms of one type, with how many active bookings each has;
+    # the dates are checked separately, so only maintenance is left out here
+    AVAILABLE_BY_TYPE_SQL = """
+        SELECT r.room_number, r.room_type, r.ac_type, r.price, r.capacity, r.wifi,
+               (SELECT COUNT(*) FROM bookings b
+                WHERE b.room_number = r.room_number AND b.status = 'active') as booked
+        FROM rooms r
+        WHERE r.room_type = ?
+        AND r.status != 'maintenance'
+        ORDER BY r.price, r.room_number
+    """
+
+    # Bookable rooms matching the TROE3 search form
+    MATCHING_SQL = """
+        SELECT r.room_number, r.room_type, r.ac_type, r.price, r.capacity, r.wifi
+        FROM rooms r
+        WHERE r.room_type = ?
+        AND r.ac_type = ?
+        AND r.price <= ?
+        AND r.capacity >= ?
+        AND r.status != 'maintenance'
+        ORDER BY r.price ASC
+    """
+
+    # Room list with today's status (schema.VIEWS['room_occupancy'])
+    LISTING_SQL = """
+        SELECT room_number, room_type, ac_type, price, capacity, status
+        FROM room_occupancy
+        ORDER BY room_type, price
+    """
+
+    # Every room's status on the night of :day
+    STATUS_ON_SQL = f"""
+        SELECT r.room_number, {ROOM_STATUS_SQL.format(day=':day')} AS status
+        FROM rooms r
+    """
+
+    # PagedTreeview query for the room list: key column, then display columns
+    PAGE_SELECT = """
+        SELECT room_number,
+               room_number, room_type, ac_type, price, capacity,
+               CASE WHEN wifi = 1 THEN 'Yes' ELSE 'No' END as wifi,
+               status
+        FROM room_occupancy
+    """
+    PAGE_KEYS = ('room_number',)
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def exists(self, room_number):
+        return self.conn.execute(self.EXISTS_SQL, (room_number,)).fetchone() is not None
+
+    def count(self):
+        return self.conn.execute(self.COUNT_SQL).fetchone()[0]
+
+    def capacity(self, room_number):
+        row = self.conn.execute(self.CAPACITY_SQL, (room_number,)).fetchone()
+        if row is None:
+            raise ValueError(f"Room {room_number} does not exist")
+        return row[0]
+
+    def add(self, room_number, room_type, ac_type, price, capacity, wifi, status='available'):
+        """Insert one room and commit."""
+        try:
+            self.conn.execute(self.INSERT_SQL, (room_number, room_type, ac_type, price,
+                                                capacity, 1 if wifi else 0, status))
+            self.conn.commit()
+        except sqlite3.IntegrityError as e:
+            self.conn.rollback()
+            if self.exists(room_number):
+                raise ValueError("Room number already exists")
+            raise ValueError(f"Invalid room details: {str(e)}")
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def add_sample_rooms(self):
+        """Add SAMPLE_ROOMS if there are no rooms yet; return how many were added."""
+        if self.count():
+            return 0
+        self.conn.executemany(self.INSERT_SQL, SAMPLE_ROOMS)
+        self.conn.commit()
+        return len(SAMPLE_ROOMS)
+
+    def all(self):
+        return self.conn.execute(self.ALL_SQL).fetchall()
+
+    def available_by_type(self, room_type):
+        return self.conn.execute(self.AVAILABLE_BY_TYPE_SQL, (room_type,)).fetchall()
+
+    def matching(self, room_type, ac_type, max_price, min_capacity):
+        return self.conn.execute(
+            self.MATCHING_SQL, (room_type, ac_type, max_price, min_capacity)).fetchall()
+
+    def listing(self):
+        return self.conn.execute(self.LISTING_SQL).fetchall()
+
+    def status_on(self, day):
+        """{room_number: 'available' | 'occupied' | 'maintenance'} for the night of day."""
+        return dict(self.conn.execute(self.STATUS_ON_SQL, {'day': day_number(day)}))
+
+
+class BookingRepository:
+    """Booking, cancelling and listing stays.
+
+    If an AvailabilityEngine is given it is kept up to date after each
+    committed booking or cancellation.
+    """
+
+    INSERT_SQL = """
+        INSERT INTO bookings (person_name, room_number, check_in_date, check_out_date,
+                              num_persons, children, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'active')
+    """
+    CANCEL_SQL = """
+        UPDATE bookings SET status = 'cancelled'
+        WHERE booking_id = ? AND status = 'active'
+    """
+
+    # Customer information: every active stay with its room price
+    ACTIVE_CUSTOMERS_SQL = f"""
+        SELECT b.booking_id, b.person_name, b.room_number, r.price,
+               {iso_sql('b.check_in_date')}, {iso_sql('b.check_out_date')}, b.status
+        FROM bookings b
+        JOIN rooms r ON b.room_number = r.room_number
+        WHERE b.status = 'active'
+        ORDER BY b.check_in_date
+    """
+    # Guest names through the FTS5 index (troe.search), which only holds active stays
+    SEARCH_SQL = f"""
+        SELECT b.booking_id, b.person_name, b.room_number, r.price,
+               {iso_sql('b.check_in_date')}, {iso_sql('b.check_out_date')}, b.status
+        FROM guest_search s
+        JOIN bookings b ON b.booking_id = s.rowid
+        JOIN rooms r ON b.room_number = r.room_number
+        WHERE guest_search MATCH ? AND b.status = 'active'
+        ORDER BY b.check_in_date
+        LIMIT ?
+    """
+    # Substring match for SQLite builds without FTS5
+    LIKE_SEARCH_SQL = f"""
+        SELECT b.booking_id, b.person_name, b.room_number, r.price,
+               {iso_sql('b.check_in_date')}, {iso_sql('b.check_out_date')}, b.status
+        FROM bookings b
+        JOIN rooms r ON b.room_number = r.room_number
+        WHERE b.person_name LIKE ? AND b.status = 'active'
+        ORDER BY b.check_in_date
+        LIMIT ?
+    """
+
+    # PagedTreeview query for the booking history: key columns, then display columns
+    PAGE_SELECT = f"""
+        SELECT b.check_in_date, b.booking_id,
+               b.booking_id, b.person_name, b.room_number,
+               {iso_sql('b.check_in_date')}, {iso_sql('b.check_out_date')}, b.status
+        FROM bookings b
+    """
+    PAGE_KEYS = ('b.check_in_date', 'b.booking_id')
+
+    def __init__(self, conn, availability=None):
+        self.conn = conn
+        self.availability = availability
+
+    def book(self, person_name, room_number, check_in, check_out, num_persons, children):
+        """Insert the booking and commit; return its id.
+
+        Raises BookingConflict if the nights are taken and ValueError if
+        the dates or number of persons do not fit the room.
+        """
+        check_in, check_out = day_number(check_in), day_number(check_out)
+
+        def insert(conn):
+            before = changes.version(conn, 'bookings')
+            booking_id = BookingRepository(conn).insert(
+                person_name, room_number, check_in, check_out, num_persons, children)
+            return booking_id, (before, changes.version(conn, 'bookings'))
+
+        booking_id, versions = db.write_transaction(self.conn, insert)
+        if self.availability:
+            self.availability.add_booking(booking_id, room_number, check_in, check_out, versions)
+        return booking_id
+
+    def insert(self, person_name, room_number, check_in, check_out, num_persons, children):
+        """Insert the booking in the caller's transaction; return its id.
+
+        Raises the same errors as book().  A rejected booking only fails
+        its own statement, so the transaction can carry on.
+        """
+        check_in, check_out = day_number(check_in), day_number(check_out)
+        try:
+            num_persons = int(num_persons)
+        except (TypeError, ValueError):
+            raise ValueError("Please enter a valid number of persons")
+
+        try:
+            booking_id = self.conn.execute(
+                self.INSERT_SQL,
+                (person_name, room_number, check_in, check_out, num_persons, children)
+            ).lastrowid
+        except sqlite3.IntegrityError as e:
+            message = str(e)
+            if message == OVERLAP_ERROR:
+                raise BookingConflict(message) from None
+            if message == CAPACITY_ERROR:
+                capacity = RoomRepository(self.conn).capacity(room_number)
+                raise ValueError(f"Selected room has a capacity of {capacity} persons only") from None
+            if message == DATES_ERROR:
+                raise ValueError(message) from None
+            if 'FOREIGN KEY' in message:
+                raise ValueError(f"Room {room_number} does not exist") from None
+            raise
+        # New words for the fuzzy guest search, so searching never has to write
+        search.add_words(self.conn, person_name)
+        return booking_id
+
+    def cancel(self, booking_id):
+        """Cancel an active booking and commit; return False if it was not active."""
+        def cancel(conn):
+            before = changes.version(conn, 'bookings')
+            cancelled = conn.execute(self.CANCEL_SQL, (booking_id,)).rowcount
+            return cancelled, (before, changes.version(conn, 'bookings'))
+
+        cancelled, versions = db.write_transaction(self.conn, cancel)
+        if not cancelled:
+            return False
+        if self.availability:
+            self.availability.remove_booking(booking_id, versions)
+        return True
+
+    def active_customers(self):
+        return self.conn.execute(self.ACTIVE_CUSTOMERS_SQL).fetchall()
+
+    def search(self, query, limit=500):
+        """Active stays whose guest name has words starting with each word of query.
+
+        If nothing starts that way the query is treated as misspelt and
+        the closest names are returned instead, best match first.
+        """
+        words = search.match_query(query)
+        if words is not None:
+            try:
+                rows = self.conn.execute(self.SEARCH_SQL, (words, limit)).fetchall()
+                return rows or self.fuzzy_search(query, limit)
+            except sqlite3.OperationalError:
+                pass  # No guest_search table: this SQLite has no FTS5
+        return self.conn.execute(self.LIKE_SEARCH_SQL, (f"%{query}%", limit)).fetchall()
+
+    def fuzzy_search(self, query, limit=500):
+        """Active stays with names resembling query, most similar first."""
+        fuzzy = search.fuzzy_query(self.conn, query)
+        if fuzzy is None:
+            return []
+        match, scores = fuzzy
+        rows = self.conn.execute(self.SEARCH_SQL, (match, limit)).fetchall()
+        rows.sort(key=lambda row: -search.score_name(row[1], scores))
+        return rows
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def is_password_hash(value):
+    """True if a stored password is a SHA-256 hex digest rather than plain text."""
+    return re.fullmatch(r"[0-9a-f]{64}", value or '') is not None
+
+
+class EmployeeRepository:
+    """Staff logins.  Passwords are stored as SHA-256 hex digests."""
+
+    INSERT_SQL = "INSERT INTO emp (username, password) VALUES (?, ?)"
+    PASSWORD_SQL = "SELECT password FROM emp WHERE username = ?"
+    SET_PASSWORD_SQL = "UPDATE emp SET password = ? WHERE username = ?"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def create(self, username, password):
+        """Add a user and commit; sqlite3.IntegrityError if the name is taken."""
+        try:
+            self.conn.execute(self.INSERT_SQL, (username, hash_password(password)))
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def verify(self, username, password):
+        """True if the password matches.
+
+        Accounts created by older versions of TROE2/TROE3 stored the plain
+        password; they are upgraded to a hash on their first good login.
+        A stored hash is never compared as plain text, so typing the hash
+        itself does not log in.
+        """
+        row = self.conn.execute(self.PASSWORD_SQL, (username,)).fetchone()
+        if row is None:
+            return False
+        hashed = hash_password(password)
+        if is_password_hash(row[0]):
+            return hmac.compare_digest(row[0], hashed)
+        if hmac.compare_digest(row[0].encode(), password.encode()):
+            self.conn.execute(self.SET_PASSWORD_SQL, (hashed, username))
+            self.conn.commit()
+            return True
+        return False
+
+    def ensure_admin(self, username='admin', password='admin123'):
+        """Create the default admin account if it does not exist."""
+        if self.conn.execute(self.PASSWORD_SQL, (username,)).fetchone() is None:
+            self.create(username, password)
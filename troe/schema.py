@@ -0,0 +1,411 @@
+"""Tables, migrations, index set and query-plan check for the hotel database.
+
+All three front-ends call create_tables() on startup.  The schema is
+versioned with PRAGMA user_version: MIGRATIONS lists the steps in order
+and migrate() applies the ones a database has not had yet, all in one
+transaction, so an upgrade either completes or leaves the file as it
+was.  A database that is already current costs one PRAGMA read.  To
+change the schema, add a step to the end of MIGRATIONS; never edit one
+that has shipped.
+
+The indexes mean the availability and overlap lookups never have to
+read the whole bookings table.  check_query_plans() runs EXPLAIN QUERY
+PLAN over the hot queries and reports any that fall back to a table scan.
+
+Booking dates are stored as integer day numbers (troe.dates).  The
+first migration converts databases written with text dates and moves
+bookings whose dates cannot be read to bookings_quarantine.
+"""
+
+import re
+import sqlite3
+import sys
+
+from troe import audit, availability, changes, db, exporter, nights, occupancy, search
+from troe.dates import TODAY_SQL, day_number
+from troe.repository import (
+    CAPACITY_ERROR, DATES_ERROR, OVERLAP_ERROR, ROOM_STATUS_SQL, BookingRepository,
+    RoomRepository)
+
+# Tables shared by the three front-ends, in creation order
+TABLES = {
+    'emp': """
+        CREATE TABLE IF NOT EXISTS emp (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL
+        )
+    """,
+    'rooms': """
+        CREATE TABLE IF NOT EXISTS rooms (
+            room_number INTEGER PRIMARY KEY,
+            room_type TEXT NOT NULL,
+            ac_type TEXT NOT NULL,
+            price REAL NOT NULL CHECK (price > 0),
+            capacity INTEGER NOT NULL CHECK (capacity > 0 AND capacity <= 4),
+            wifi INTEGER NOT NULL,
+            status TEXT DEFAULT 'available'
+            CHECK (status IN ('available', 'maintenance'))
+        )
+    """,
+    'bookings': """
+        CREATE TABLE IF NOT EXISTS bookings (
+            booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_name TEXT NOT NULL,
+            room_number INTEGER NOT NULL,
+            check_in_date INTEGER NOT NULL,
+            check_out_date INTEGER NOT NULL,
+            num_persons INTEGER NOT NULL CHECK (num_persons > 0),
+            children TEXT NOT NULL,
+            status TEXT DEFAULT 'active'
+            CHECK (status IN ('active', 'completed', 'cancelled')),
+            booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (room_number) REFERENCES rooms(room_number)
+            ON DELETE RESTRICT
+            ON UPDATE CASCADE
+        )
+    """,
+}
+
+# Occupancy derived from the bookings rather than stored on rooms
+VIEWS = {
+    'room_occupancy': f"""
+        CREATE VIEW IF NOT EXISTS room_occupancy AS
+        SELECT r.room_number, r.room_type, r.ac_type, r.price, r.capacity, r.wifi,
+               {ROOM_STATUS_SQL.format(day=TODAY_SQL)} AS status
+        FROM rooms r
+    """,
+}
+
+# Older versions marked rooms 'booked' while they had a booking
+RESET_BOOKED_SQL = "UPDATE rooms SET status = 'available' WHERE status = 'booked'"
+
+# Bookings set aside by convert_dates(), exactly as they were stored
+QUARANTINE_SQL = """
+    CREATE TABLE IF NOT EXISTS bookings_quarantine (
+        booking_id INTEGER PRIMARY KEY,
+        person_name TEXT,
+        room_number INTEGER,
+        check_in_date,
+        check_out_date,
+        num_persons INTEGER,
+        children TEXT,
+        status TEXT,
+        booking_date TIMESTAMP,
+        reason TEXT NOT NULL,
+        quarantined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# ISO text dates converted in one statement; other formats go through Python
+ISO_TO_DAYS_SQL = """
+    UPDATE bookings SET
+        check_in_date = CAST(julianday(check_in_date) - 2440587.5 AS INTEGER),
+        check_out_date = CAST(julianday(check_out_date) - 2440587.5 AS INTEGER)
+    WHERE typeof(check_in_date) = 'text' AND date(check_in_date) = check_in_date
+    AND typeof(check_out_date) = 'text' AND date(check_out_date) = check_out_date
+"""
+TEXT_DATES_SQL = """
+    SELECT booking_id, check_in_date, check_out_date FROM bookings
+    WHERE typeof(check_in_date) != 'integer' OR typeof(check_out_date) != 'integer'
+"""
+QUARANTINE_BOOKING_SQL = """
+    INSERT INTO bookings_quarantine (booking_id, person_name, room_number,
+                                     check_in_date, check_out_date, num_persons,
+                                     children, status, booking_date, reason)
+    SELECT booking_id, person_name, room_number, check_in_date, check_out_date,
+           num_persons, children, status, booking_date, ?
+    FROM bookings WHERE booking_id = ?
+"""
+
+# Managed indexes, created alongside the tables
+INDEXES = {
+    # Room type filter used by every availability search
+    'idx_rooms_type_status':
+        "CREATE INDEX IF NOT EXISTS idx_rooms_type_status "
+        "ON rooms (room_type, status)",
+    # Per-room probes: overlap check before booking, booked counts
+    'idx_bookings_room_status':
+        "CREATE INDEX IF NOT EXISTS idx_bookings_room_status "
+        "ON bookings (room_number, status, check_in_date, check_out_date)",
+    # Date-range probes: NOT IN (...) subqueries and active listings
+    'idx_bookings_status_dates':
+        "CREATE INDEX IF NOT EXISTS idx_bookings_status_dates "
+        "ON bookings (status, check_in_date, check_out_date, room_number)",
+    # Keyset pages of the booking history, newest check-in first
+    'idx_bookings_checkin_id':
+        "CREATE INDEX IF NOT EXISTS idx_bookings_checkin_id "
+        "ON bookings (check_in_date, booking_id)",
+}
+
+# Booking rules, checked by SQLite itself on every write to an active
+# booking.  RAISE(ABORT) fails the statement with the message, which
+# BookingRepository turns back into the matching Python exception.
+# Dates must be day numbers, so text can never slip into the comparisons.
+_BOOKING_RULES = f"""
+            SELECT RAISE(ABORT, 'Booking dates must be day numbers')
+            WHERE typeof(NEW.check_in_date) != 'integer'
+            OR typeof(NEW.check_out_date) != 'integer';
+            SELECT RAISE(ABORT, '{DATES_ERROR}')
+            WHERE NEW.check_out_date <= NEW.check_in_date;
+            SELECT RAISE(ABORT, '{CAPACITY_ERROR}')
+            WHERE NEW.num_persons > (
+                SELECT capacity FROM rooms WHERE room_number = NEW.room_number);
+            SELECT RAISE(ABORT, '{OVERLAP_ERROR}')
+            WHERE EXISTS (
+                SELECT 1 FROM bookings
+                WHERE room_number = NEW.room_number
+                AND status = 'active'
+                AND check_in_date < NEW.check_out_date
+                AND check_out_date > NEW.check_in_date
+                AND booking_id IS NOT NEW.booking_id
+            );
+"""
+
+TRIGGERS = {
+    'trg_bookings_insert_rules': f"""
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_insert_rules
+        BEFORE INSERT ON bookings
+        WHEN NEW.status = 'active'
+        BEGIN{_BOOKING_RULES}        END
+    """,
+    'trg_bookings_update_rules': f"""
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_update_rules
+        BEFORE UPDATE OF room_number, check_in_date, check_out_date, num_persons, status
+        ON bookings
+        WHEN NEW.status = 'active'
+        BEGIN{_BOOKING_RULES}        END
+    """,
+}
+
+# Queries run on every search or booking, with sample parameters
+HOT_QUERIES = {
+    'RoomRepository.available_by_type': (
+        RoomRepository.AVAILABLE_BY_TYPE_SQL, ('Normal',)),
+    'RoomRepository.matching': (
+        RoomRepository.MATCHING_SQL, ('Normal', 'AC', 5000, 2)),
+    'AvailabilityEngine.load': ("""
+        SELECT booking_id, room_number, check_in_date, check_out_date
+        FROM bookings
+        WHERE status = 'active'
+    """, ()),
+    'AvailabilityEngine.free_rooms_sql': (
+        availability.BUSY_ROOMS_SQL, (day_number('2025-01-05'), day_number('2025-01-01'))),
+    'OccupancyBitmap.signature': (occupancy.SIGNATURE_SQL, ()),
+    'trg_bookings_insert_rules overlap probe': ("""
+        SELECT 1 FROM bookings
+        WHERE room_number = ?
+        AND status = 'active'
+        AND check_in_date < ?
+        AND check_out_date > ?
+        AND booking_id IS NOT ?
+    """, (101, day_number('2025-01-05'), day_number('2025-01-01'), None)),
+    'BookingRepository.active_customers': (
+        BookingRepository.ACTIVE_CUSTOMERS_SQL, ()),
+    'PagedTreeview booking page': ("""
+        SELECT b.check_in_date, b.booking_id, b.booking_id, b.person_name,
+               b.room_number, b.check_in_date, b.check_out_date, b.status
+        FROM bookings b
+        WHERE (b.check_in_date, b.booking_id) < (?, ?)
+        ORDER BY b.check_in_date DESC, b.booking_id DESC LIMIT ?
+    """, (day_number('2025-01-01'), 100, 100)),
+    'PagedTreeview booking page (scrolling up)': ("""
+        SELECT b.check_in_date, b.booking_id, b.booking_id, b.person_name,
+               b.room_number, b.check_in_date, b.check_out_date, b.status
+        FROM bookings b
+        WHERE (b.check_in_date, b.booking_id) > (?, ?)
+        ORDER BY b.check_in_date ASC, b.booking_id ASC LIMIT ?
+    """, (day_number('2025-01-01'), 100, 100)),
+    'BookingRepository.search': (
+        BookingRepository.SEARCH_SQL, ('"smi"*', 500)),
+    'search.similar_words': (
+        search.SIMILAR_WORDS_SQL, ('["  j", " jh", "hon", "jho", "on "]', 5, 50)),
+    'search.similar_words same shape': (search.SAME_SHAPE_WORDS_SQL, ('j', 3, 5)),
+    'nights.in_house': (nights.IN_HOUSE_SQL, (day_number('2025-01-01'),)),
+    'nights.occupancy': (
+        nights.OCCUPANCY_SQL, (day_number('2025-01-01'), day_number('2025-01-08'))),
+    'nights.busy_rooms': (
+        nights.BUSY_ROOMS_SQL, (day_number('2025-01-01'), day_number('2025-01-05'))),
+    'exporter.export_query': exporter.export_query('2025-01-01', '2025-02-01', ['active']),
+    'audit.run complete': (audit.COMPLETE_SQL, {'day': day_number('2025-01-01')}),
+    'audit.run night': (audit.NIGHT_SQL, {'day': day_number('2025-01-01')}),
+}
+
+# "SCAN bookings" / "SCAN TABLE bookings AS b" without any index
+_TABLE_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+
+
+def create_tables(conn, backup=None):
+    """Bring the database up to the current schema; return its version.
+
+    backup, a BackupManager already start()ed on the file, is waited for
+    before an upgrade, so a copy from before the upgrade always exists.
+    """
+    return migrate(conn, backup)
+
+
+def schema_version(conn):
+    """The PRAGMA user_version of the database (0 if never migrated)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, backup=None):
+    """Apply the MIGRATIONS a database has not had yet, in one transaction.
+
+    Returns the schema version.  The version is read again once the write
+    lock is held, so two apps starting together do not both upgrade.
+    backup is as for create_tables().
+    """
+    version = schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+    if backup is not None:
+        # The first migration rewrites every booking date
+        backup.wait()
+
+    def upgrade(conn):
+        version = schema_version(conn)
+        for number, description, step in MIGRATIONS:
+            if number > version:
+                # stderr, so it does not end up in the output of the CLI commands
+                print(f"Upgrading database to version {number}: {description}", file=sys.stderr)
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                version = number
+        return version
+
+    return db.write_transaction(conn, upgrade)
+
+
+def convert_dates(conn):
+    """Store booking dates as day numbers; return how many were quarantined.
+
+    The booking rule and room night triggers, the room nights and the
+    indexes on the dates are dropped first; the next migration rebuilds
+    them from the converted dates.
+    """
+    for name in list(TRIGGERS) + list(nights.TRIGGERS):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DROP TABLE IF EXISTS room_nights")
+    conn.execute("DROP TABLE IF EXISTS calendar")
+    for name in ('idx_bookings_room_status', 'idx_bookings_status_dates',
+                 'idx_bookings_checkin_id'):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute(ISO_TO_DAYS_SQL)
+
+    converted, unreadable = [], []
+    for booking_id, check_in, check_out in conn.execute(TEXT_DATES_SQL).fetchall():
+        try:
+            converted.append((day_number(check_in), day_number(check_out), booking_id))
+        except ValueError as e:
+            unreadable.append((str(e), booking_id))
+    conn.executemany(
+        "UPDATE bookings SET check_in_date = ?, check_out_date = ? WHERE booking_id = ?",
+        converted)
+    if unreadable:
+        conn.execute(QUARANTINE_SQL)
+        conn.executemany(QUARANTINE_BOOKING_SQL, unreadable)
+        conn.executemany("DELETE FROM bookings WHERE booking_id = ?",
+                         [(booking_id,) for _, booking_id in unreadable])
+        print(f"Moved {len(unreadable)} bookings with unreadable dates to bookings_quarantine",
+              file=sys.stderr)
+    return len(unreadable)
+
+
+def create_views(conn):
+    """(Re)create the views; they hold no data, so this picks up any change."""
+    for name, sql in VIEWS.items():
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
+        conn.execute(sql)
+
+
+def create_indexes(conn):
+    """Create every managed index that does not exist yet."""
+    for sql in INDEXES.values():
+        conn.execute(sql)
+
+
+def create_triggers(conn):
+    """Create the booking rule triggers that do not exist yet."""
+    for sql in TRIGGERS.values():
+        conn.execute(sql)
+
+
+def _base_tables(conn):
+    """Version 1: the shared tables, with booking dates as day numbers."""
+    for sql in TABLES.values():
+        conn.execute(sql)
+    conn.execute(RESET_BOOKED_SQL)
+    convert_dates(conn)
+
+
+def _derived_objects(conn):
+    """Version 2: indexes, booking rules, room nights, views and change counters."""
+    create_indexes(conn)
+    create_triggers(conn)
+    nights.install(conn)
+    create_views(conn)
+    changes.install(conn)
+
+
+def _guest_search(conn):
+    """Version 3: the full-text guest index, where SQLite has FTS5."""
+    search.install(conn)
+
+
+def _night_audits(conn):
+    """Version 4: the night_audits log."""
+    audit.install(conn)
+
+
+def _guest_word_index(conn):
+    """Version 5: guest search words by first letter and length."""
+    search.install_word_index(conn)
+
+
+# (PRAGMA user_version, description, step) in the order they are applied.
+# Each step runs inside migrate()'s transaction and must not commit.
+MIGRATIONS = (
+    (1, "shared tables, booking dates as day numbers", _base_tables),
+    (2, "indexes, booking rules, room nights and views", _derived_objects),
+    (3, "full-text guest search", _guest_search),
+    (4, "night audit log", _night_audits),
+    (5, "guest search words by first letter and length", _guest_word_index),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def check_query_plans(conn, queries=None):
+    """Return (name, plan step) for each hot query that scans a table."""
+    offenders = []
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[-1]
+            if _TABLE_SCAN.match(detail):
+                offenders.append((name, detail))
+    return offenders
+
+
+def main(argv=None):
+    """Upgrade a database file (default: the app's) and check the hot queries."""
+    argv = sys.argv[1:] if argv is None else argv
+    db_file = argv[0] if argv else "hotel_management.db"
+    conn = db.connect(db_file)
+    try:
+        print(f"Schema version {migrate(conn)}")
+        offenders = check_query_plans(conn)
+    except sqlite3.OperationalError as e:
+        print(f"Cannot check {db_file}: {str(e)} (start one of the apps first)")
+        return 2
+    finally:
+        conn.close()
+
+    if offenders:
+        for name, detail in offenders:
+            print(f"Table scan in {name}: {detail}")
+        return 1
+    print(f"All {len(HOT_QUERIES)} hot queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""Full-text guest search.
+
+install() adds guest_search, an FTS5 index over the guest names on
+active bookings.  Triggers on bookings keep it in step: a name goes in
+when a booking becomes active and comes out when it is cancelled,
+completed, renamed or deleted, so the index stays the size of the
+current guest list rather than the whole history.  The names themselves
+are read back from bookings (an external content table), so the index
+only stores tokens.
+
+match_query() turns what the user typed into an FTS5 query where every
+word is a prefix: "jo sm" finds "John Smith" and "Joanna Smythe".
+
+Misspellings are handled one level up, on the words rather than the
+bookings.  guest_terms lists every distinct word in the index, and
+guest_trigrams maps each of those words' trigrams back to the word.
+fuzzy_query() looks up words that share the largest part of their
+trigrams with each typed word, and the words with the same first letter
+and about the same length, indexed in guest_words.  The second lookup
+finds swapped letters: "jhon" and "john" share only one trigram.  It
+keeps the words that are similar enough and returns an FTS5 query for
+any of them plus the scores to rank the rows by.  "Jhon Smtih" finds
+"John Smith".  There are far fewer distinct names than bookings, so the
+cost stays flat as the history grows.
+
+Searching never writes.  The trigram tables are kept up on the write
+path: add_words() runs with every new booking, and sync_words(), which
+also drops words no active booking has any more, runs in the night
+audit and after a rebuild.
+
+    python -m troe.search hotel_management.db "jo sm"
+"""
+
+import json
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+
+from troe import db
+
+# Word characters only, so user input can never form FTS5 syntax
+_WORD = re.compile(r"\w+")
+
+# Prefix indexes make one- to three-letter prefixes (typed first) cheap
+GUEST_INDEX_SQL = """
+    CREATE VIRTUAL TABLE guest_search USING fts5(
+        person_name,
+        content='bookings',
+        content_rowid='booking_id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3'
+    )
+"""
+
+POPULATE_SQL = """
+    INSERT INTO guest_search (rowid, person_name)
+    SELECT booking_id, person_name FROM bookings WHERE status = 'active'
+"""
+
+# FTS5 removes a row by being told the exact values it indexed
+TRIGGERS = {
+    'trg_bookings_insert_search': """
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_insert_search
+        AFTER INSERT ON bookings
+        WHEN new.status = 'active'
+        BEGIN
+            INSERT INTO guest_search (rowid, person_name)
+            VALUES (new.booking_id, new.person_name);
+        END
+    """,
+    'trg_bookings_update_search': """
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_update_search
+        AFTER UPDATE OF person_name, status ON bookings
+        BEGIN
+            INSERT INTO guest_search (guest_search, rowid, person_name)
+            SELECT 'delete', old.booking_id, old.person_name
+            WHERE old.status = 'active';
+            INSERT INTO guest_search (rowid, person_name)
+            SELECT new.booking_id, new.person_name
+            WHERE new.status = 'active';
+        END
+    """,
+    'trg_bookings_delete_search': """
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_delete_search
+        AFTER DELETE ON bookings
+        WHEN old.status = 'active'
+        BEGIN
+            INSERT INTO guest_search (guest_search, rowid, person_name)
+            VALUES ('delete', old.booking_id, old.person_name);
+        END
+    """,
+}
+
+
+# Distinct words of the guest index, maintained by FTS5 itself
+GUEST_TERMS_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS guest_terms
+    USING fts5vocab(guest_search, 'row')
+"""
+
+# Words already split into trigrams, and the trigram -> word lookup
+TRIGRAM_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS guest_words (
+        word TEXT PRIMARY KEY
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS guest_trigrams (
+        trigram TEXT NOT NULL,
+        word TEXT NOT NULL,
+        PRIMARY KEY (trigram, word)
+    ) WITHOUT ROWID
+    """,
+)
+
+NEW_WORDS_SQL = """
+    SELECT term FROM guest_terms
+    WHERE term NOT IN (SELECT word FROM guest_words)
+"""
+GONE_WORDS_SQL = """
+    SELECT word FROM guest_words
+    WHERE word NOT IN (SELECT term FROM guest_terms)
+"""
+
+# Words sharing the largest part of their trigrams with the typed word
+# (shared / all of both; a word has length + 1 padded trigrams); fixed
+# text via json_each
+SIMILAR_WORDS_SQL = """
+    SELECT word, COUNT(*) AS shared
+    FROM guest_trigrams
+    WHERE trigram IN (SELECT value FROM json_each(?))
+    GROUP BY word
+    ORDER BY COUNT(*) * 1.0 / (? + length(word) + 1 - COUNT(*)) DESC
+    LIMIT ?
+"""
+
+# Words by first letter and length, for the edit distance lookup
+WORD_SHAPE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_guest_words_shape
+    ON guest_words (substr(word, 1, 1), length(word))
+"""
+SAME_SHAPE_WORDS_SQL = """
+    SELECT word FROM guest_words
+    WHERE substr(word, 1, 1) = ? AND length(word) BETWEEN ? AND ?
+"""
+
+# Typed words scoring below this against every indexed word are ignored
+MIN_SIMILARITY = 0.6
+
+
+def available(conn):
+    """True if this SQLite has the FTS5 module."""
+    try:
+        return conn.execute(
+            "SELECT 1 FROM pragma_module_list WHERE name = 'fts5'").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+
+
+def install(conn):
+    """Create and fill the guest index if needed; False if FTS5 is missing.
+
+    Runs inside the caller's transaction, which commits.
+    """
+    if not available(conn):
+        print("Full-text guest search unavailable: this SQLite has no FTS5")
+        return False
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'guest_search'").fetchone()
+    if not exists:
+        conn.execute(GUEST_INDEX_SQL)
+        conn.execute(POPULATE_SQL)
+    for sql in TRIGGERS.values():
+        conn.execute(sql)
+    conn.execute(GUEST_TERMS_SQL)
+    for sql in TRIGRAM_TABLES:
+        conn.execute(sql)
+    sync_words(conn)
+    install_word_index(conn)
+    return True
+
+
+def install_word_index(conn):
+    """Index guest_words by first letter and length, if the table exists."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'guest_words'").fetchone()
+    if exists:
+        conn.execute(WORD_SHAPE_INDEX_SQL)
+
+
+def rebuild(conn):
+    """Refill the guest index from the active bookings."""
+    conn.execute("INSERT INTO guest_search (guest_search) VALUES ('delete-all')")
+    conn.execute(POPULATE_SQL)
+    conn.commit()
+    sync_trigrams(conn)
+
+
+def normalize(text):
+    """Lower-case words without accents, as the unicode61 tokenizer stores them."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+def trigrams(word):
+    """Trigrams of a word padded like pg_trgm: 'jo' -> '  j', ' jo', 'jo '."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    """Insertions, deletions, substitutions and adjacent swaps from a to b."""
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[len(b)]
+
+
+def similarity(a, b):
+    """0..1 likeness of two words; 'jhon' and 'john' are one swap apart."""
+    if a == b:
+        return 1.0
+    if b.startswith(a):
+        return 0.9  # still being typed
+    shared = trigrams(a) & trigrams(b)
+    jaccard = len(shared) / len(trigrams(a) | trigrams(b))
+    return max(jaccard, 1 - edit_distance(a, b) / max(len(a), len(b)))
+
+
+def sync_trigrams(conn):
+    """Add trigrams for new index words and drop words no guest has any more."""
+    try:
+        changed = sync_words(conn)
+        if changed:
+            conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return changed
+
+
+def sync_words(conn):
+    """sync_trigrams() in the caller's transaction; return how many words changed."""
+    new = [row[0] for row in conn.execute(NEW_WORDS_SQL)]
+    gone = [row[0] for row in conn.execute(GONE_WORDS_SQL)]
+    if not new and not gone:
+        return 0
+    conn.executemany("DELETE FROM guest_words WHERE word = ?", [(w,) for w in gone])
+    conn.executemany("DELETE FROM guest_trigrams WHERE word = ? AND trigram = ?",
+                     [(w, t) for w in gone for t in trigrams(w)])
+    conn.executemany("INSERT OR IGNORE INTO guest_words (word) VALUES (?)",
+                     [(w,) for w in new])
+    conn.executemany("INSERT OR IGNORE INTO guest_trigrams (trigram, word) VALUES (?, ?)",
+                     [(t, w) for w in new for t in trigrams(w)])
+    return len(new) + len(gone)
+
+
+def add_words(conn, name):
+    """Add the trigrams of a new guest name's words, in the caller's transaction."""
+    words = normalize(name)
+    try:
+        conn.executemany("INSERT OR IGNORE INTO guest_words (word) VALUES (?)",
+                         [(w,) for w in words])
+        conn.executemany("INSERT OR IGNORE INTO guest_trigrams (trigram, word) VALUES (?, ?)",
+                         [(t, w) for w in words for t in trigrams(w)])
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise  # Without FTS5 there is no fuzzy search to feed
+
+
+def similar_words(conn, word, limit=50):
+    """{indexed word: similarity} for the limit words closest to word, if close enough."""
+    grams = trigrams(word)
+    candidates = {row[0] for row in conn.execute(
+        SIMILAR_WORDS_SQL, (json.dumps(sorted(grams)), len(grams), limit))}
+    # One letter more, less or swapped, which may share no trigram but the first
+    candidates.update(row[0] for row in conn.execute(
+        SAME_SHAPE_WORDS_SQL, (word[0], len(word) - 1, len(word) + 1)))
+    scores = {}
+    for candidate in candidates:
+        score = similarity(word, candidate)
+        if score >= MIN_SIMILARITY:
+            scores[candidate] = score
+    best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return dict(best)
+
+
+def fuzzy_query(conn, text):
+    """(FTS5 query, per-word scores) for names resembling text, or None.
+
+    The query matches bookings having a close match for every typed word
+    that has one; score_name() ranks them with the scores.
+    """
+    groups = []
+    scores = []
+    for word in normalize(text):
+        matches = similar_words(conn, word)
+        if matches:
+            groups.append("(" + " OR ".join(f'"{m}"' for m in matches) + ")")
+            scores.append(matches)
+    if not groups:
+        return None
+    return " AND ".join(groups), scores
+
+
+def score_name(name, scores):
+    """Average over typed words of the best match among the name's words."""
+    words = normalize(name)
+    total = 0.0
+    for matches in scores:
+        total += max((matches.get(w, 0.0) for w in words), default=0.0)
+    return total / len(scores)
+
+
+def match_query(text):
+    """FTS5 query matching every word of text as a prefix; None if no words."""
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def main(argv=None):
+    """Search the guest index of a database file and time the query."""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print("usage: python -m troe.search DB_FILE QUERY | --rebuild")
+        return 2
+    from troe.repository import BookingRepository
+
+    conn = db.connect(argv[0])
+    try:
+        if argv[1] == '--rebuild':
+            rebuild(conn)
+            count = conn.execute("SELECT COUNT(*) FROM guest_search").fetchone()[0]
+            print(f"Indexed {count} active bookings")
+            return 0
+        started = time.perf_counter()
+        rows = BookingRepository(conn).search(" ".join(argv[1:]))
+        elapsed = (time.perf_counter() - started) * 1000
+    except sqlite3.OperationalError as e:
+        print(f"Cannot search {argv[0]}: {str(e)}")
+        return 2
+    finally:
+        conn.close()
+
+    for row in rows[:20]:
+        print(f"{row[0]:>8}  {row[1]:<30} room {row[2]:<6} {row[4]} - {row[5]}")
+    print(f"{len(rows)} matches in {elapsed:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
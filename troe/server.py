@@ -0,0 +1,605 @@
+"""Booking server: one process owns the database, the desks send it JSON.
+
+Without it every desk opens hotel_management.db itself and the desks
+take turns at SQLite's write lock, retrying whenever it is busy.  The
+server is an asyncio process that keeps the file to itself:
+
+- Bookings and cancellations are queued for a single writer task.
+  Everything that queued up while the last transaction was committing
+  goes in the next one: one BEGIN IMMEDIATE and one commit for the
+  batch, with each request in its own SAVEPOINT so a rejected booking
+  does not undo the others.  The booking rule triggers still check
+  every insert.
+- Reads run on a small pool of threads, each with its own connection.
+  In WAL mode they never wait for the writer.
+- The rarer writes that manage their own transaction (adding rooms, an
+  import, the night audit, logins) run on the writer's thread between
+  batches.
+
+The API is JSON over HTTP/1.1 with keep-alive:
+
+    GET    /health
+    GET    /rooms[?on=DATE]
+    GET    /available?check_in=DATE&check_out=DATE[&type=T&ac=AC&persons=N&max_price=P]
+    GET    /bookings[?q=NAME]
+    GET    /history[?q=NAME]
+    POST   /bookings        {"name", "room", "check_in", "check_out", "persons", "children"}
+    DELETE /bookings/ID
+    POST   /rooms           {"room_number", "room_type", "ac_type", "price", "capacity", "wifi", "status"}
+    POST   /rooms/samples
+    POST   /rooms/import    {"name", "text"}
+    POST   /audit           {"day"}
+    POST   /login           {"username", "password"}
+    POST   /employees       {"username", "password"}
+    POST   /query           {"sql", "params"}
+
+/query runs one SELECT on a reader and returns its columns and rows;
+it is how the front-ends read when TROE_SERVER is set (troe.desk).  The
+reader connections are query_only, so nothing sent there can write, and
+an authorizer turns away schema changes, ATTACH, pragmas and the emp
+table's password hashes, which only /login checks.
+
+Dates are YYYY-MM-DD.  Errors come back as {"error": message}: 400 for
+bad input, 403 for a query that does more than read, 409 for a room
+already taken, a booking that is not active or a user name in use, 404
+for an unknown path and 500 for a database error.  There is no login,
+so it listens on localhost only unless told otherwise.  troe.client
+talks to it, and so do the front-ends when TROE_SERVER is set.
+
+The server migrates the database when it starts and takes a backup
+into the backups directory next to it, as the apps do when they open
+the file themselves; an upgrade waits for that backup to finish.
+
+    python -m troe.server hotel_management.db [--host 127.0.0.1] [--port 8765] [--readers 4]
+                          [--backup-dir DIR | --no-backup]
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qsl, urlsplit
+
+from troe import archive, audit, db, importer, schema
+from troe.availability import free_matching
+from troe.backup import BackupManager
+from troe.dates import as_date
+from troe.repository import (
+    BookingConflict, BookingRepository, EmployeeRepository, RoomRepository,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+READERS = 4
+MAX_BATCH = 256
+MAX_BODY = 64 * 1024
+MAX_IMPORT = 16 * 1024 * 1024
+
+# What a /query statement may be made of.  FTS5 prepares an UPDATE of
+# sqlite_master and reads data_version when a search opens its index;
+# the reader connections are query_only, so no write can run
+QUERY_ACTIONS = (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                 sqlite3.SQLITE_RECURSIVE, sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE,
+                 sqlite3.SQLITE_DELETE)
+QUERY_PRAGMAS = ('data_version',)
+# Tables /query may not read
+PRIVATE_TABLES = ('emp',)
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    """A request answered with an error status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Writer:
+    """The one write connection, and the queue of writes waiting for it."""
+
+    def __init__(self, db_file, max_batch=MAX_BATCH):
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        # One thread, so the connection is only ever used from it
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="troe-writer")
+        self.conn = None
+        self.task = None
+        self.batches = 0
+        self.writes = 0
+
+    async def start(self, backup=None):
+        """Open the connection, bring the schema up to date and start the writer task.
+
+        backup, a started BackupManager, finishes before any upgrade.
+        """
+        loop = asyncio.get_running_loop()
+        self.conn = await loop.run_in_executor(self.executor, self._open, backup)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop taking writes and close the connection."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.conn:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.conn.close)
+        self.executor.shutdown()
+
+    async def submit(self, func):
+        """Queue func(conn) for the next batch; return its result or raise its error."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((func, future))
+        return await future
+
+    async def run(self, func):
+        """Run func(conn), which commits for itself, on the writer thread between batches."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, func)
+
+    def _call(self, func):
+        try:
+            return func(self.conn)
+        finally:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+
+    def _open(self, backup=None):
+        conn = db.connect(self.db_file)
+        schema.create_tables(conn, backup)
+        return conn
+
+    async def _run(self):
+        """Commit whatever has queued up, one transaction at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self._commit, [func for func, _ in batch])
+            except Exception as e:
+                # The transaction itself failed, so none of the batch was written
+                print(f"Write batch of {len(batch)} failed: {str(e)}")
+                results = [(None, e)] * len(batch)
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, future), (result, error) in zip(batch, results):
+                if future.done():
+                    continue  # The client went away
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def _commit(self, funcs):
+        """Writer thread: run funcs in one transaction; return (result, error) for each."""
+        def apply(conn):
+            results = []
+            for func in funcs:
+                conn.execute("SAVEPOINT request")
+                try:
+                    results.append((func(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO request")
+                    results.append((None, e))
+                conn.execute("RELEASE request")
+            return results
+
+        return db.write_transaction(self.conn, apply)
+
+
+class Readers:
+    """A pool of threads, each reading through a connection of its own."""
+
+    def __init__(self, db_file, size=READERS):
+        self.db_file = db_file
+        self.executor = ThreadPoolExecutor(size, thread_name_prefix="troe-reader")
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    async def submit(self, func):
+        """Run func(conn) on a reader thread; return its result."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, func)
+
+    def close(self):
+        self.executor.shutdown()
+        for conn in self.connections:
+            conn.close()
+
+    def _call(self, func):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # Closed from the main thread at shutdown, hence check_same_thread off
+            conn = self.local.conn = db.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            with self.lock:
+                self.connections.append(conn)
+        try:
+            return func(conn)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+
+def room_dict(row, status=None):
+    """JSON for a RoomRepository.all() row."""
+    room_number, room_type, ac_type, price, capacity, wifi, room_status = row
+    return {'room_number': room_number, 'room_type': room_type, 'ac_type': ac_type,
+            'price': price, 'capacity': capacity, 'wifi': bool(wifi),
+            'status': status or room_status}
+
+
+def booking_dict(row):
+    """JSON for an active_customers() or search() row."""
+    booking_id, name, room_number, price, check_in, check_out, status = row
+    return {'booking_id': booking_id, 'name': name, 'room_number': room_number,
+            'price': price, 'check_in': check_in, 'check_out': check_out, 'status': status}
+
+
+def required(data, name):
+    """data[name], or a 400 if it is missing."""
+    value = data.get(name)
+    if value is None or value == '':
+        raise HttpError(400, f"{name} is required")
+    return value
+
+
+def number(data, name, kind, default=None):
+    """data[name] converted with kind, default if it is missing, or a 400."""
+    value = data.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"{name} must be a number")
+
+
+def list_rooms(conn, on=None):
+    repo = RoomRepository(conn)
+    status = repo.status_on(as_date(on) if on else date.today())
+    return [room_dict(row, status[row[0]]) for row in repo.all()]
+
+
+def list_available(conn, query):
+    rows = free_matching(conn, required(query, 'check_in'), required(query, 'check_out'),
+                         query.get('type'), query.get('ac'),
+                         number(query, 'persons', int, 1), number(query, 'max_price', float))
+    return [room_dict(row) for row in rows]
+
+
+def list_bookings(conn, name=None):
+    repo = BookingRepository(conn)
+    rows = repo.search(name) if name else repo.active_customers()
+    return [booking_dict(row) for row in rows]
+
+
+def health(conn):
+    return {'status': 'ok', 'schema_version': schema.schema_version(conn)}
+
+
+def run_query(conn, sql, params):
+    """{"columns", "rows"} of one statement, which may only read."""
+    if not isinstance(params, (list, dict)):
+        raise HttpError(400, "params must be a list or an object")
+    denied = []
+
+    def read_only(action, table, column, database, trigger):
+        if action == sqlite3.SQLITE_PRAGMA and table in QUERY_PRAGMAS:
+            return sqlite3.SQLITE_OK
+        if action not in QUERY_ACTIONS or (action == sqlite3.SQLITE_READ
+                                           and table in PRIVATE_TABLES):
+            denied.append(table or f"action {action}")
+            return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+
+    conn.set_authorizer(read_only)
+    try:
+        cursor = conn.execute(sql, params)
+        return {'columns': [column[0] for column in cursor.description or ()],
+                'rows': cursor.fetchall()}
+    except sqlite3.DatabaseError:
+        if denied:
+            raise HttpError(403, f"A query may only read ({denied[0]} is not allowed)")
+        raise
+    finally:
+        conn.set_authorizer(None)
+
+
+def json_body(body):
+    """The JSON object sent as body, or a 400."""
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HttpError(400, "Body must be a JSON object")
+    if not isinstance(data, dict):
+        raise HttpError(400, "Body must be a JSON object")
+    return data
+
+
+class BookingServer:
+    """The HTTP front of a Writer and a pool of Readers on one database file."""
+
+    def __init__(self, db_file, readers=READERS, max_batch=MAX_BATCH, backup_dir=None):
+        self.db_file = db_file
+        self.backup_dir = backup_dir
+        self.writer = Writer(db_file, max_batch)
+        self.readers = Readers(db_file, readers)
+        self.server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Open the database and start listening; return the (host, port) bound."""
+        backup = None
+        if self.backup_dir:
+            # Started first, so there is a copy from before any upgrade
+            backup = BackupManager(self.db_file, self.backup_dir, keep=10)
+            backup.start()
+        await self.writer.start(backup)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+        await self.writer.stop()
+        self.readers.close()
+
+    async def handle(self, reader, writer):
+        """Answer the requests of one connection until it closes."""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, target, keep_alive, body = request
+                    status, payload = await self.dispatch(method, target, body)
+                except HttpError as e:
+                    # The request could not be read, so the connection cannot be reused
+                    status, payload, keep_alive = e.status, {'error': str(e)}, False
+                self.send(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Shutting down with the connection open and idle
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """(method, target, keep-alive, body) of the next request, or None at end of stream."""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+        length = number(headers, 'content-length', int, 0)
+        limit = MAX_IMPORT if target.startswith('/rooms/import') else MAX_BODY
+        if length < 0:
+            raise HttpError(400, "content-length must not be negative")
+        if length > limit:
+            raise HttpError(413, f"Request body over {limit} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, keep_alive, body
+
+    def send(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n".encode('latin-1') + body)
+
+    async def dispatch(self, method, target, body):
+        """Run one request; return (status, JSON payload)."""
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        path = url.path.strip('/').split('/')
+        try:
+            if path == ['bookings'] and method == 'POST':
+                return 201, await self.book(body)
+            if path[0] == 'bookings' and len(path) == 2 and method == 'DELETE':
+                return 200, await self.cancel(path[1])
+            if path == ['query'] and method == 'POST':
+                data = json_body(body)
+                sql, params = str(required(data, 'sql')), data.get('params') or []
+                return 200, await self.readers.submit(lambda conn: run_query(conn, sql, params))
+            if path == ['rooms'] and method == 'POST':
+                return 201, await self.add_room(body)
+            if path == ['rooms', 'samples'] and method == 'POST':
+                added = await self.writer.run(lambda conn: RoomRepository(conn).add_sample_rooms())
+                return 200, {'added': added}
+            if path == ['rooms', 'import'] and method == 'POST':
+                return 200, await self.import_rooms(body)
+            if path == ['audit'] and method == 'POST':
+                day = json_body(body).get('day')
+                return 200, await self.writer.run(
+                    lambda conn: audit.run(conn, as_date(day) if day else None))
+            if path == ['login'] and method == 'POST':
+                return 200, await self.login(body)
+            if path == ['employees'] and method == 'POST':
+                return 201, await self.add_employee(body)
+            if method != 'GET':
+                raise HttpError(405 if path[0] in ('health', 'rooms', 'available', 'bookings',
+                                                   'history', 'query', 'audit', 'login',
+                                                   'employees')
+                                else 404, f"{method} /{'/'.join(path)} is not supported")
+            if path == ['health']:
+                payload = await self.readers.submit(health)
+                payload.update(batches=self.writer.batches, writes=self.writer.writes)
+                return 200, payload
+            if path == ['rooms']:
+                return 200, await self.readers.submit(lambda conn: list_rooms(conn, query.get('on')))
+            if path == ['available']:
+                return 200, await self.readers.submit(lambda conn: list_available(conn, query))
+            if path == ['bookings']:
+                return 200, await self.readers.submit(lambda conn: list_bookings(conn, query.get('q')))
+            if path == ['history']:
+                # The archive is attached on the reader for this query only
+                archive_file = archive.archive_path(self.db_file)
+                return 200, await self.readers.submit(
+                    lambda conn: archive.history(conn, archive_file, query.get('q')))
+            raise HttpError(404, f"No such resource: /{'/'.join(path)}")
+        except HttpError as e:
+            return e.status, {'error': str(e)}
+        except BookingConflict as e:
+            return 409, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except sqlite3.Error as e:
+            print(f"Database error on {method} {target}: {str(e)}")
+            return 500, {'error': f"Database error: {str(e)}"}
+
+    async def book(self, body):
+        data = json_body(body)
+        name = str(required(data, 'name')).strip()
+        room_number = number(data, 'room', int)
+        if not name or room_number is None:
+            raise HttpError(400, "name and room are required")
+        stay = (name, room_number, required(data, 'check_in'), required(data, 'check_out'),
+                data.get('persons', 1), data.get('children', 'No'))
+        booking_id = await self.writer.submit(lambda conn: BookingRepository(conn).insert(*stay))
+        return {'booking_id': booking_id}
+
+    async def cancel(self, booking_id):
+        try:
+            booking_id = int(booking_id)
+        except ValueError:
+            raise HttpError(404, f"No such booking: {booking_id}")
+        cancelled = await self.writer.submit(
+            lambda conn: conn.execute(BookingRepository.CANCEL_SQL, (booking_id,)).rowcount)
+        if not cancelled:
+            raise HttpError(409, f"Booking {booking_id} is not active")
+        return {'booking_id': booking_id, 'status': 'cancelled'}
+
+    async def add_room(self, body):
+        data = json_body(body)
+        room = (number(data, 'room_number', int), str(required(data, 'room_type')),
+                str(required(data, 'ac_type')), number(data, 'price', float),
+                number(data, 'capacity', int), bool(data.get('wifi')),
+                data.get('status') or 'available')
+        if None in room:
+            raise HttpError(400, "room_number, price and capacity are required")
+        await self.writer.run(lambda conn: RoomRepository(conn).add(*room))
+        return {'room_number': room[0]}
+
+    async def import_rooms(self, body):
+        data = json_body(body)
+        name, text = str(required(data, 'name')), str(required(data, 'text'))
+        records = importer.parse_records(io.StringIO(text, newline=''), name)
+        try:
+            imported, rejected = await self.writer.run(
+                lambda conn: importer.import_records(conn, records))
+        except csv.Error as e:
+            raise HttpError(400, f"Cannot read {name}: {str(e)}")
+        return {'imported': imported, 'rejected': rejected}
+
+    async def login(self, body):
+        data = json_body(body)
+        username, password = str(required(data, 'username')), str(required(data, 'password'))
+        # On the writer: a first login with a plain-text password stores its hash
+        valid = await self.writer.run(
+            lambda conn: EmployeeRepository(conn).verify(username, password))
+        return {'valid': valid}
+
+    async def add_employee(self, body):
+        data = json_body(body)
+        username, password = str(required(data, 'username')), str(required(data, 'password'))
+        try:
+            await self.writer.run(lambda conn: EmployeeRepository(conn).create(username, password))
+        except sqlite3.IntegrityError:
+            raise HttpError(409, "Username already exists")
+        return {'username': username}
+
+
+async def serve(db_file, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=READERS,
+                max_batch=MAX_BATCH, backup_dir=None):
+    """Run a BookingServer until cancelled."""
+    server = BookingServer(db_file, readers, max_batch, backup_dir)
+    try:
+        # Stop cleanly on SIGTERM too (not available on Windows)
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        host, port = await server.start(host, port)
+        print(f"Serving {db_file} on http://{host}:{port}", flush=True)
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """Serve a database file until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('db_file')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument('--readers', type=int, default=READERS, help="read connections")
+    parser.add_argument('--batch', type=int, default=MAX_BATCH,
+                        help="most writes committed in one transaction")
+    parser.add_argument('--backup-dir', help="default: backups next to the database")
+    parser.add_argument('--no-backup', action='store_true', help="do not back up on start")
+    args = parser.parse_args(argv)
+    backup_dir = None
+    if not args.no_backup:
+        backup_dir = args.backup_dir or os.path.join(
+            os.path.dirname(os.path.abspath(args.db_file)), "backups")
+
+    try:
+        asyncio.run(serve(args.db_file, args.host, args.port, args.readers, args.batch,
+                          backup_dir))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except (OSError, sqlite3.Error) as e:
+        print(f"Cannot serve {args.db_file}: {str(e)}")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Background database worker for the Tk front-ends.
+
+Slow reads (booking lists, customer searches, reports) are handed to a
+single worker thread that owns its own SQLite connection.  Results are
+put on a queue and delivered back on the Tk thread by polling it with
+root.after(), so callbacks can touch widgets safely and the window keeps
+repainting while a query runs.
+
+connect, if given, opens the worker's connection instead of
+db.connect(db_file); troe.desk passes client.RemoteConnection so that
+a desk using the booking server does its requests here too.  If the
+connection cannot be opened, every request fails with that error, so
+the errbacks report it and the busy indicator goes off.
+"""
+
+import queue
+import threading
+
+from troe import db
+
+
+class DatabaseWorker:
+    """Run functions of a connection on a background thread."""
+
+    def __init__(self, db_file, root, on_busy=None, poll_ms=50, profile=None, connect=None):
+        self.db_file = db_file
+        self.profile = profile
+        self.connect = connect
+        self.root = root
+        self.on_busy = on_busy
+        self.poll_ms = poll_ms
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0
+        self._polling = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Start the worker thread."""
+        self.thread.start()
+
+    def stop(self):
+        """Ask the worker thread to finish and close its connection."""
+        if self.thread.is_alive():
+            self.requests.put(None)
+            self.thread.join(timeout=5)
+
+    def submit(self, func, callback=None, errback=None):
+        """Queue func(conn); callback(result) or errback(error) runs on the Tk thread."""
+        self.pending += 1
+        if self.pending == 1 and self.on_busy:
+            self.on_busy(True)
+        self.requests.put((func, callback, errback))
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _run(self):
+        """Worker thread: execute queued requests in order."""
+        try:
+            if self.connect:
+                conn = self.connect()
+            else:
+                conn = db.connect(self.db_file, self.profile)
+        except Exception as e:
+            print(f"Database worker cannot connect: {str(e)}")
+            self._fail_all(e)
+            return
+        try:
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    break
+                func, callback, errback = request
+                try:
+                    result = func(conn)
+                    conn.commit()
+                    self.results.put((callback, result, None, errback))
+                except Exception as e:
+                    conn.rollback()
+                    self.results.put((callback, None, e, errback))
+        finally:
+            conn.close()
+
+    def _fail_all(self, error):
+        """Worker thread: answer every request with error until stopped."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            func, callback, errback = request
+            self.results.put((callback, None, error, errback))
+
+    def _poll(self):
+        """Tk thread: deliver finished results, reschedule while work is pending."""
+        while True:
+            try:
+                callback, result, error, errback = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            try:
+                if error is not None:
+                    if errback:
+                        errback(error)
+                    else:
+                        print(f"Database worker error: {str(error)}")
+                elif callback:
+                    callback(result)
+            except Exception as e:
+                print(f"Error in database worker callback: {str(e)}")
+
+        if self.pending == 0 and self.on_busy:
+            self.on_busy(False)
+
+        if self.pending > 0:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False